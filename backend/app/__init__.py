@@ -6,6 +6,18 @@ from flask_mail import Mail
 from config import Config
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from app.services.label_cache import label_cache
+from app.services.label_index import label_index
+from app.services.outbound import outbound
+from app.services.openai_client import openai_clients
+from app.services.embeddings import embeddings
+from app.services.retrieval import retriever
+from app.services.answer_cache import answer_cache
+from app.services.single_flight import single_flight
+from app.services.passwords import password_policy
+from app.services.rate_limit import rate_limiter
+from app.services.tracing import tracer
+from app.services import db_pool
 
 # open database connection
 db = SQLAlchemy()
@@ -19,6 +31,9 @@ migrate = Migrate()
 # for password-reset emails
 mail = Mail()
 
+# frontends allowed to call the API with cookies (also used by the ASGI /prompt in app/asgi.py)
+CORS_ORIGINS = ["http://localhost:5173"]
+
 def create_app():
     app = Flask(__name__)
     
@@ -31,7 +46,7 @@ def create_app():
     '''
     # allows the front end to talk to the backend
     # http://localhost:5173
-    CORS(app, supports_credentials=True, origins=["http://localhost:5173"])
+    CORS(app, supports_credentials=True, origins=CORS_ORIGINS)
     
     # load the configuration settings from the Config class
     '''
@@ -51,20 +66,62 @@ def create_app():
     mail.init_app(app)
     # initialize jwt
     jwt = JWTManager(app)
+    # per-stage request timings (TRACING), first so its hooks wrap everything else
+    tracer.init_app(app)
+    # password hashing method for signup / login
+    password_policy.init_app(app)
+    # connection pool settings (DB_POOL_*) for the engine db builds
+    db_pool.init_app(app)
     # initialize db
     db.init_app(app)
     # initialize migration
     migrate.init_app(app, db)
+    # initialize the openFDA label cache
+    label_cache.init_app(app)
+    # initialize the offline label index (flask labels ingest)
+    label_index.init_app(app)
+    # initialize the pooled client used for openFDA and OpenAI calls
+    outbound.init_app(app)
+    # initialize the OpenAI SDK clients (built on the outbound pool when first used)
+    openai_clients.init_app(app)
+    # initialize the chunk embedding cache
+    embeddings.init_app(app)
+    # initialize the chunk vector store used for retrieval
+    retriever.init_app(app)
+    # initialize the generated answer cache
+    answer_cache.init_app(app)
+    # initialize request coalescing for concurrent identical prompts
+    single_flight.init_app(app)
+    # initialize the /prompt and /auth/login rate limits
+    rate_limiter.init_app(app)
     
     with app.app_context():
         # import blueprints
         from app.routes.auth import auth_blueprint
         from app.routes.prompt import prompt_blueprint
         from app.routes.conversation import conversation_blueprint
+        from app.routes.metrics import metrics_blueprint
+        from app.routes.jobs import jobs_blueprint
 
         # Register the blueprints with the app
         app.register_blueprint(auth_blueprint, url_prefix='/auth')
         app.register_blueprint(prompt_blueprint, url_prefix='/')
         app.register_blueprint(conversation_blueprint, url_prefix='/')
+        app.register_blueprint(metrics_blueprint, url_prefix='/metrics')
+        app.register_blueprint(jobs_blueprint, url_prefix='/')
+        
+        # initialize the background prompt job workers (started on first use)
+        from app.services.jobs import job_queue
+        job_queue.init_app(app)
+        # a user's queued and running background prompts count against PROMPT_CONCURRENCY_PER_USER
+        rate_limiter.in_progress['prompt'] = job_queue.in_progress
+        
+        # tables of the shared rate limit backend (RATE_LIMIT_BACKEND=database)
+        from app.models.rate_limit import RateLimitBucket, RateLimitSlot
+        
+        # register the flask CLI commands
+        from app.cli import labels_cli, jobs_cli
+        app.cli.add_command(labels_cli)
+        app.cli.add_command(jobs_cli)
         
     return app
\ No newline at end of file
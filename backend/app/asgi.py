@@ -0,0 +1,294 @@
+import asyncio
+import json
+from http.cookies import SimpleCookie
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask import current_app
+from flask_jwt_extended import decode_token
+from app import CORS_ORIGINS, db
+from app.routes.prompt import sse
+from app.services.history import load_history
+from app.services.jobs import job_queue
+from app.services.llm import stream_response_async
+from app.services.openai_client import openai_api_key
+from app.services.outbound import outbound
+from app.services.rate_limit import RateLimited, rate_limiter
+from app.services.tracing import tracer
+from app.services.pipeline import (
+    PromptError, resolve_prompt_label_async, retrieve_context_async, cached_answer_async, remember_answer_async,
+    answer_question_async, save_chat
+)
+
+'''
+    ASGI front for the Flask app (see asgi.py).
+
+    POST /prompt runs here on the event loop: the openFDA lookup, the
+    embedding calls and the chat completion are awaited on AsyncOpenAI /
+    httpx.AsyncClient, so an in-flight prompt costs a coroutine instead of
+    a worker thread. Local SQLite work and saving the chat run in worker
+    threads. Every other route goes to the Flask app through WsgiToAsgi.
+'''
+
+
+class _WsgiInstance(WsgiToAsgiInstance):
+    '''
+        asgiref runs the WSGI app "thread sensitive" by default: every request
+        on one shared thread, and a finished request's executor can leak into
+        the next one on a kept-alive connection ("CurrentThreadExecutor already
+        quit or is broken" -> 500). Flask is thread-safe, so the app runs on
+        the loop's thread pool instead. The body is asgiref's own
+        run_wsgi_app (3.12, pinned in requirements.txt) on top of the
+        instance's build_environ / start_response / sync_send.
+    '''
+
+    async def run_wsgi_app(self, body):
+        await sync_to_async(self._run_wsgi_app, thread_sensitive=False)(body)
+
+    def _run_wsgi_app(self, body):
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            # too many duplicate headers
+            self.sync_send({'type': 'http.response.start', 'status': 400, 'headers': [(b'content-type', b'text/plain')]})
+            self.sync_send({'type': 'http.response.body', 'body': b'Bad Request: Too many duplicate headers'})
+            return
+
+        bytes_sent = 0
+        for output in self.wsgi_application(environ, self.start_response):
+            if not self.response_started:
+                self.response_started = True
+                self.sync_send(self.response_start)
+            # never more than the Content-Length the app declared
+            if self.response_content_length is not None:
+                output = output[:self.response_content_length - bytes_sent]
+            self.sync_send({'type': 'http.response.body', 'body': output, 'more_body': True})
+            bytes_sent += len(output)
+            if bytes_sent == self.response_content_length:
+                break
+
+        if not self.response_started:
+            self.response_started = True
+            self.sync_send(self.response_start)
+        self.sync_send({'type': 'http.response.body'})
+
+
+class _WsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await _WsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+async def read_body(receive):
+    """The request body, or None if the client went away first"""
+    body, more = b'', True
+    while more:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        body += message.get('body', b'')
+        more = message.get('more_body', False)
+    return body
+
+
+def response_headers(scope, content_type):
+    headers = [(b'content-type', content_type.encode())]
+    # the same CORS answer flask_cors gives the Flask routes
+    origin = dict(scope['headers']).get(b'origin', b'').decode()
+    if origin in CORS_ORIGINS:
+        headers += [(b'access-control-allow-origin', origin.encode()), (b'access-control-allow-credentials', b'true'), (b'vary', b'Origin')]
+    # stage timings up to the moment the response starts
+    timing = tracer.server_timing()
+    if timing:
+        headers.append((b'server-timing', timing.encode()))
+    return headers
+
+
+async def send_json(scope, send, data, status=200, headers=()):
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers(scope, 'application/json') + list(headers)})
+    await send({'type': 'http.response.body', 'body': json.dumps(data).encode()})
+
+
+def request_identity(scope):
+    """JWT identity from the access token cookie, None without a valid one"""
+    config = current_app.config
+    cookies = SimpleCookie()
+    for name, value in scope['headers']:
+        if name == b'cookie':
+            cookies.load(value.decode('latin-1'))
+    morsel = cookies.get(config['JWT_ACCESS_COOKIE_NAME'])
+    if not morsel:
+        return None
+    try:
+        claims = decode_token(morsel.value)
+    except Exception:
+        return None
+    if claims.get('type') != 'access':
+        return None
+    return str(claims[config['JWT_IDENTITY_CLAIM']])
+
+
+def _save_chat(*args):
+    # runs in a worker thread; hand the connection back to the pool when done
+    try:
+        return save_chat(*args)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def _load_history(user_id, conversation_id):
+    # worker thread too (and a completion call when older turns are folded into the summary)
+    try:
+        return load_history(user_id, conversation_id)
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_answer_async(scope, receive, send, user_id, conversation_id, user_prompt, question, tokens, on_complete=None, medication=None):
+    """The async stream_answer(): SSE `delta` events, then `done`; a disconnect closes the upstream stream"""
+    await send({
+        'type': 'http.response.start', 'status': 200,
+        'headers': response_headers(scope, 'text/event-stream') + [(b'cache-control', b'no-cache'), (b'x-accel-buffering', b'no')]
+    })
+
+    async def emit(text):
+        await send({'type': 'http.response.body', 'body': text.encode(), 'more_body': True})
+
+    disconnected = asyncio.create_task(_wait_for_disconnect(receive))
+    parts = []
+    finished = False
+    try:
+        async for delta in tokens:
+            if disconnected.done():
+                break
+            parts.append(delta)
+            await emit(sse({'delta': delta}))
+        else:
+            finished = True
+
+        if not finished:
+            print("==== Client disconnected, saving the question without an answer ====")
+            await asyncio.to_thread(_save_chat, user_id, conversation_id, user_prompt, question, None, medication)
+            return
+
+        answer = "".join(parts)
+        if on_complete:
+            await on_complete(answer)
+        conversation_id = await asyncio.to_thread(_save_chat, user_id, conversation_id, user_prompt, question, answer, medication)
+        await emit(sse({'response': answer, 'conversation_id': conversation_id}, event='done'))
+
+    except Exception as e:
+        print(f"Error while streaming prompt response: {str(e)}")
+        await emit(sse({'error': f'An error occurred: {str(e)}'}, event='error'))
+
+    finally:
+        disconnected.cancel()
+        if hasattr(tokens, 'aclose'):
+            await tokens.aclose()
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+async def prompt_async(scope, receive, send):
+    """POST /prompt, the same contract as app.routes.prompt.prompt()"""
+    body = await read_body(receive)
+    if body is None:
+        return
+
+    try:
+        logged_in_user = request_identity(scope)
+        if not logged_in_user:
+            return await send_json(scope, send, {'error': 'Authentication required'}, 401)
+
+        # the same per-user token bucket and in-flight cap as the Flask route
+        try:
+            release = await asyncio.to_thread(rate_limiter.admit, 'prompt', logged_in_user)
+        except RateLimited as e:
+            return await send_json(scope, send, {'error': e.message}, 429, headers=[(b'retry-after', str(e.retry_after).encode())])
+
+        try:
+            data = json.loads(body or b'{}')
+            user_prompt = data.get('user_prompt')
+            conversation_id = data.get('conversation_id')
+
+            if not openai_api_key or openai_api_key == 'your-openai-api-key-here':
+                return await send_json(scope, send, {
+                    'error': 'OpenAI API key not configured. Please add your API key to backend/.env file.'
+                }, 500)
+
+            if data.get('background'):
+                job = await asyncio.to_thread(job_queue.enqueue, logged_in_user, user_prompt, conversation_id)
+                return await send_json(scope, send, {
+                    'job_id': job.id,
+                    'status': job.status,
+                    'status_url': f'/jobs/{job.id}',
+                    'events_url': f'/jobs/{job.id}/events'
+                }, 202)
+
+            history = await asyncio.to_thread(_load_history, logged_in_user, conversation_id)
+            label, medication = await resolve_prompt_label_async(user_prompt, history)
+            question = user_prompt.lower()
+            stream = data.get('stream')
+
+            answer = await cached_answer_async(label, question) if not history else None
+            if answer is not None:
+                if stream:
+                    async def cached_tokens():
+                        yield answer
+                    return await stream_answer_async(scope, receive, send, logged_in_user, conversation_id, user_prompt, question, cached_tokens(), medication=medication)
+                conversation_id = await asyncio.to_thread(_save_chat, logged_in_user, conversation_id, user_prompt, question, answer, medication)
+                return await send_json(scope, send, {'response': answer, 'conversation_id': conversation_id})
+
+            if stream:
+                return await stream_answer_async(
+                    scope, receive, send, logged_in_user, conversation_id, user_prompt, question,
+                    stream_response_async(question, await retrieve_context_async(label, question), history),
+                    on_complete=None if history else lambda answer: remember_answer_async(label, question, answer),
+                    medication=medication
+                )
+
+            answer = await answer_question_async(label, question, history)
+            conversation_id = await asyncio.to_thread(_save_chat, logged_in_user, conversation_id, user_prompt, question, answer, medication)
+            return await send_json(scope, send, {'response': answer, 'conversation_id': conversation_id})
+        finally:
+            await asyncio.to_thread(release)
+
+    except PromptError as e:
+        return await send_json(scope, send, {'error': e.message}, e.status_code)
+
+    except Exception as e:
+        print(f"Error in prompt endpoint: {str(e)}")
+        return await send_json(scope, send, {'error': f'An error occurred: {str(e)}'}, 500)
+
+
+def create_asgi_app(app):
+    """ASGI application: async POST /prompt, the rest of `app` through WsgiToAsgi"""
+    wsgi = _WsgiToAsgi(app)
+
+    async def application(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await outbound.aclose()
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        if scope['type'] == 'http' and scope['method'] == 'POST' and scope['path'].rstrip('/') == '/prompt':
+            # Flask's app context (config, db session) for this request, carried across awaits and into worker threads
+            with app.app_context():
+                token = tracer.begin()
+                try:
+                    return await prompt_async(scope, receive, send)
+                finally:
+                    tracer.end(token, route='POST /prompt')
+
+        return await wsgi(scope, receive, send)
+
+    return application
@@ -0,0 +1,104 @@
+import json
+import time
+import zipfile
+import click
+from flask.cli import AppGroup
+from app.services.label_cache import label_cache
+from app.services.label_index import label_index
+
+# flask labels ...
+labels_cli = AppGroup('labels', help='Manage the local openFDA label stores.')
+# flask jobs ...
+jobs_cli = AppGroup('jobs', help='Run background prompt jobs.')
+
+
+def _label_records(data):
+    # a bare list like app/data.json, or an API response / bulk dump with "results"
+    if isinstance(data, dict):
+        data = data.get('results', [])
+    return data
+
+
+def load_label_file(path):
+    """Read label records from an openFDA label JSON file or a zipped bulk download (drug-label-*.json.zip)"""
+    if zipfile.is_zipfile(path):
+        records = []
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.namelist():
+                if member.endswith('.json'):
+                    with archive.open(member) as file:
+                        records.extend(_label_records(json.load(file)))
+        return records
+
+    with open(path, 'r', encoding='utf-8') as file:
+        return _label_records(json.load(file))
+
+
+@labels_cli.command('seed-cache')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def seed_cache(paths):
+    """Pre-load the label cache from openFDA label JSON files."""
+    for path in paths:
+        count = label_cache.seed(load_label_file(path))
+        click.echo(f'{path}: cached {count} labels')
+
+
+@labels_cli.command('clear-cache')
+def clear_cache():
+    """Drop every cached label."""
+    label_cache.invalidate()
+    click.echo('Label cache cleared')
+
+
+@labels_cli.command('ingest')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def ingest(paths):
+    """Load openFDA label dumps into the offline label index."""
+    for path in paths:
+        count = label_index.ingest(load_label_file(path))
+        click.echo(f'{path}: indexed {count} labels')
+    click.echo(f'Label index now holds {len(label_index)} labels')
+
+
+@labels_cli.command('warm')
+@click.argument('names', nargs=-1)
+@click.option('--file', 'paths', multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help='openFDA label JSON file or zipped bulk download (repeatable), e.g. app/data.json.')
+@click.option('--names-file', type=click.File('r'), help='Drug names to look up, one per line.')
+@click.option('--processes', type=int, default=None, help='Worker processes for cleaning and chunking (default: CPU count).')
+def warm(names, paths, names_file, processes):
+    """Precompute cleaned, chunked and embedded labels so first prompts start warm."""
+    from app.services.warmup import warm as warm_stores
+
+    names = list(names)
+    if names_file:
+        names.extend(line.strip() for line in names_file if line.strip())
+    labels = [label for path in paths for label in load_label_file(path)]
+    if not names and not labels:
+        raise click.UsageError('Give drug names, --names-file or --file.')
+
+    stats = warm_stores(names=names, labels=labels, processes=processes)
+    click.echo(
+        f"Indexed {stats['indexed']} labels ({stats['chunks']} chunks), "
+        f"{stats['skipped']} already warm, {stats['empty']} without usable text "
+        f"in {stats['seconds']}s"
+    )
+    if stats['missing']:
+        click.echo(f"No label found for: {', '.join(stats['missing'])}")
+
+
+@jobs_cli.command('work')
+@click.option('--workers', type=int, default=None, help='Worker threads (default JOB_WORKERS).')
+def work(workers):
+    """Work off queued prompt jobs in this process until interrupted."""
+    from app.services.jobs import job_queue
+
+    if workers is not None:
+        job_queue.workers = workers
+    job_queue.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        click.echo('Stopping job workers')
+        job_queue.stop()
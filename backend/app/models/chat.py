@@ -9,10 +9,22 @@ class Conversation(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     title = db.Column(db.String(255), nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
-    updated_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # keyset pagination cursors need a timestamp on every row
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+    # the name the conversation's label was resolved from, reused by follow-up prompts
+    medication = db.Column(db.String(255), nullable=True)
+    # rolling summary of the turns up to and including chat `summarized_through`
+    # (only read when prompting, not with the conversation lists)
+    summary = db.deferred(db.Column(db.Text, nullable=True))
+    summarized_through = db.Column(db.Integer, nullable=True)
     
     # Relationship to messages
     messages = db.relationship('Chat', backref='conversation', lazy=True, cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        # a user's conversations, newest first
+        db.Index('ix_conversations_user_id_updated_at', 'user_id', 'updated_at', 'id'),
+    )
 
 class Chat(db.Model):
     __tablename__ = 'chats'
@@ -21,4 +33,11 @@ class Chat(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     user_prompt = db.Column(db.Text, nullable=False)
     llm_response = db.Column(db.Text, nullable=True)
-    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
\ No newline at end of file
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), server_default=func.now())
+    
+    __table_args__ = (
+        # a conversation's chats in order (first chat = preview)
+        db.Index('ix_chats_conversation_id_created_at', 'conversation_id', 'created_at', 'id'),
+        # a user's chats (and the ON DELETE CASCADE from users)
+        db.Index('ix_chats_user_id_created_at', 'user_id', 'created_at'),
+    )
\ No newline at end of file
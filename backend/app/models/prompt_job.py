@@ -0,0 +1,42 @@
+from datetime import datetime, timezone
+from app import db
+from sqlalchemy.sql import func
+import uuid
+
+class PromptJob(db.Model):
+    __tablename__ = 'prompt_jobs'
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    # conversation to add the chat to, or the one created for it once done
+    conversation_id = db.Column(db.String(36), nullable=True)
+    user_prompt = db.Column(db.Text, nullable=False)
+    # queued -> running -> done | failed
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    response = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    # HTTP status the synchronous /prompt would have answered with
+    status_code = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), server_default=func.now())
+    started_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        # workers claim the oldest queued job
+        db.Index('ix_prompt_jobs_status_created_at', 'status', 'created_at'),
+        db.Index('ix_prompt_jobs_user_id', 'user_id'),
+    )
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'response': self.response,
+            'error': self.error,
+            'status_code': self.status_code,
+            'conversation_id': self.conversation_id,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
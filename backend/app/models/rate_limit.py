@@ -0,0 +1,17 @@
+from app import db
+
+class RateLimitBucket(db.Model):
+    __tablename__ = 'rate_limit_buckets'
+    # "<limit name>:<user id or client IP>"
+    key = db.Column(db.String(255), primary_key=True)
+    # tokens left as of updated_at (unix seconds); refilled lazily on the next hit
+    tokens = db.Column(db.Float, nullable=False)
+    updated_at = db.Column(db.Float, nullable=False)
+
+class RateLimitSlot(db.Model):
+    __tablename__ = 'rate_limit_slots'
+    # one row per request in flight; the (key, slot) primary key is what caps them
+    key = db.Column(db.String(255), primary_key=True)
+    slot = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # unix seconds, slots held longer than RATE_LIMIT_SLOT_TTL are reclaimed
+    acquired_at = db.Column(db.Float, nullable=False)
@@ -1,8 +1,11 @@
 from app import db
 from app.models.chat import Chat
 from app.models.user import User
+from app.services.passwords import password_policy
+from app.services.rate_limit import rate_limited
 from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
 from flask_jwt_extended import create_access_token, create_refresh_token, set_refresh_cookies, set_access_cookies, jwt_required, get_jwt_identity
 
 # create auth blueprint
@@ -23,16 +26,17 @@ def register():
         if not all([first_name, last_name, email, password]):
             return jsonify({'error': 'Missing required fields'}), 400
         
-        # check for user existance using the given email
-        if User.query.filter_by(email=email.lower()).first():
-            return jsonify({'error': 'An account with this email already exists. Please try logging in or use a different email.'}), 409
-        
         # create a user
-        user = User(first_name=first_name, last_name=last_name, email=email.lower(), password_hash=generate_password_hash(password))
+        user = User(first_name=first_name, last_name=last_name, email=email.lower(), password_hash=password_policy.hash(password))
         
-        # add user to the database
+        # add user to the database; the unique email index rejects an existing account
+        # (no separate existence query, and no race between checking and inserting)
         db.session.add(user)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'error': 'An account with this email already exists. Please try logging in or use a different email.'}), 409
         
         # redirect to the login page
         return jsonify({'message': 'User registered successfully'}), 201
@@ -42,36 +46,36 @@ def register():
 
 # API endpoint for login
 @auth_blueprint.route('/login', methods=['GET', 'POST'])
+@rate_limited('login', by='ip')
 def login():
     # get form data
     form_data = request.get_json()
     email = form_data.get('email')
     password = form_data.get('password')
     
-    # get the user using email if exists
-    user = User.query.filter_by(email=email.lower()).first()
+    # get the user using email if exists (only the columns login needs)
+    user = User.query.options(load_only(User.id, User.password_hash)).filter_by(email=email.lower()).first()
     
-    # check if the user exists and password is correct
-    if user and check_password_hash(user.password_hash, password):
-        access_token = create_access_token(identity=str(user.id))
-        refresh_token = create_refresh_token(identity=str(user.id))
-        
-        # redirect to the landing page
-        response = jsonify({'message': 'Login successful', 'access_token': access_token})
-        
-        set_access_cookies(response, access_token)
-        set_refresh_cookies(response, refresh_token)
-        
-        return response, 200
-    else:
-        # The user with email address does not exist
-        # a user associated with the given email does not exist     
-        if not user:
-            return jsonify({'error': 'Oops! That email doesn\'t match our records.'}), 401
-        
-         # the given password with the password in the database does not match
-        if not check_password_hash(user.password_hash, password):
-            return jsonify({'error': 'Oops! That password doesn\'t match our records.'}), 401
+    # a user associated with the given email does not exist
+    if not user:
+        return jsonify({'error': 'Oops! That email doesn\'t match our records.'}), 401
+    
+    # the given password with the password in the database does not match
+    # (hashed once per attempt; an outdated hash is upgraded on success)
+    if not password_policy.verify(user, password):
+        return jsonify({'error': 'Oops! That password doesn\'t match our records.'}), 401
+    db.session.commit()
+    
+    access_token = create_access_token(identity=str(user.id))
+    refresh_token = create_refresh_token(identity=str(user.id))
+    
+    # redirect to the landing page
+    response = jsonify({'message': 'Login successful', 'access_token': access_token})
+    
+    set_access_cookies(response, access_token)
+    set_refresh_cookies(response, refresh_token)
+    
+    return response, 200
 
 @auth_blueprint.route('/refresh', methods=["POST"])
 @jwt_required(refresh=True)
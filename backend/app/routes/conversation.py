@@ -1,27 +1,86 @@
 from app import db
 from app.models.chat import Chat, Conversation
 from app.models.user import User
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func, tuple_
+import base64
+import binascii
+import json
 import uuid
 from datetime import datetime, timezone
 
 conversation_blueprint = Blueprint('conversation', __name__)
 
+
+class CursorError(ValueError):
+    """Raised for a ?cursor= this API did not hand out"""
+
+
+def encode_cursor(timestamp, id):
+    """Opaque cursor for the (timestamp, id) position of the last row on a page"""
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), id
+    except (binascii.Error, ValueError, TypeError):
+        raise CursorError('Invalid cursor')
+
+
+def page_args():
+    """(limit, position) from ?limit= and ?cursor=, limit clamped to PAGE_SIZE_MAX"""
+    try:
+        limit = int(request.args.get('limit', current_app.config.get('PAGE_SIZE', 50)))
+    except ValueError:
+        raise CursorError('limit must be a number')
+    limit = max(1, min(limit, current_app.config.get('PAGE_SIZE_MAX', 200)))
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor) if cursor else None
+
+
 @conversation_blueprint.route('/conversations', methods=['GET'])
 @jwt_required()
 def get_conversations():
-    """Get all conversations for the logged-in user"""
+    """Get a page of the logged-in user's conversations, most recently updated first"""
     try:
         user_id = str(get_jwt_identity())
+        limit, position = page_args()
+        
+        # first chat of each conversation as a correlated subquery, so the
+        # whole listing is one query (51 chars is enough to tell if it needs '...')
+        first_prompt = (
+            db.session.query(func.substr(Chat.user_prompt, 1, 51))
+            .filter(Chat.conversation_id == Conversation.id)
+            .order_by(Chat.created_at.asc(), Chat.id.asc())
+            .limit(1)
+            .correlate(Conversation)
+            .scalar_subquery()
+        )
         
-        conversations = Conversation.query.filter_by(user_id=user_id).order_by(Conversation.updated_at.desc()).all()
+        # keyset pagination: continue after the (updated_at, id) of the previous
+        # page's last row, straight off ix_conversations_user_id_updated_at
+        query = db.session.query(Conversation, first_prompt).filter(Conversation.user_id == user_id)
+        if position:
+            query = query.filter(tuple_(Conversation.updated_at, Conversation.id) < position)
+        conversations = (
+            query
+            .order_by(Conversation.updated_at.desc(), Conversation.id.desc())
+            .limit(limit + 1)
+            .all()
+        )
+        
+        # the extra row only tells whether there is another page
+        has_more = len(conversations) > limit
+        conversations = conversations[:limit]
         
         result = []
-        for conv in conversations:
-            # Get the first message to use as preview
-            first_message = Chat.query.filter_by(conversation_id=conv.id).first()
-            preview = first_message.user_prompt[:50] + '...' if first_message and len(first_message.user_prompt) > 50 else (first_message.user_prompt if first_message else '')
+        for conv, first_message in conversations:
+            preview = first_message[:50] + '...' if first_message and len(first_message) > 50 else (first_message or '')
             
             result.append({
                 'id': conv.id,
@@ -31,8 +90,13 @@ def get_conversations():
                 'updated_at': conv.updated_at.isoformat() if conv.updated_at else None
             })
         
-        return jsonify({'conversations': result}), 200
+        last = conversations[-1][0] if conversations else None
+        next_cursor = encode_cursor(last.updated_at, last.id) if has_more else None
         
+        return jsonify({'conversations': result, 'next_cursor': next_cursor}), 200
+        
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error fetching conversations: {str(e)}")
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
@@ -40,16 +104,28 @@ def get_conversations():
 @conversation_blueprint.route('/conversations/<conversation_id>', methods=['GET'])
 @jwt_required()
 def get_conversation(conversation_id):
-    """Get a specific conversation with all its messages"""
+    """
+    Get a specific conversation with a page of its messages: the latest chats
+    in order, next_cursor pages back towards the start of the conversation
+    """
     try:
         user_id = str(get_jwt_identity())
+        limit, position = page_args()
         
         conversation = Conversation.query.filter_by(id=conversation_id, user_id=user_id).first()
         
         if not conversation:
             return jsonify({'error': 'Conversation not found'}), 404
         
-        messages = Chat.query.filter_by(conversation_id=conversation_id).order_by(Chat.created_at.asc()).all()
+        query = Chat.query.filter_by(conversation_id=conversation_id)
+        if position:
+            query = query.filter(tuple_(Chat.created_at, Chat.id) < position)
+        messages = query.order_by(Chat.created_at.desc(), Chat.id.desc()).limit(limit + 1).all()
+        
+        has_more = len(messages) > limit
+        # newest page first from the index, shown oldest to newest
+        messages = list(reversed(messages[:limit]))
+        next_cursor = encode_cursor(messages[0].created_at, messages[0].id) if has_more else None
         
         message_list = []
         for msg in messages:
@@ -72,9 +148,12 @@ def get_conversation(conversation_id):
                 'created_at': conversation.created_at.isoformat() if conversation.created_at else None,
                 'updated_at': conversation.updated_at.isoformat() if conversation.updated_at else None
             },
-            'messages': message_list
+            'messages': message_list,
+            'next_cursor': next_cursor
         }), 200
         
+    except CursorError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         print(f"Error fetching conversation: {str(e)}")
         return jsonify({'error': f'An error occurred: {str(e)}'}), 500
@@ -0,0 +1,76 @@
+import time
+from app import db
+from app.models.prompt_job import PromptJob
+from app.routes.prompt import sse
+from app.services.jobs import job_queue
+from flask import Blueprint, current_app, jsonify, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+jobs_blueprint = Blueprint('jobs', __name__)
+
+@jobs_blueprint.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    """Status of a background prompt job, with the answer once it is done"""
+    try:
+        user_id = str(get_jwt_identity())
+        
+        job = PromptJob.query.filter_by(id=job_id, user_id=user_id).first()
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+        
+        # jobs queued before a restart are picked up again
+        job_queue.start()
+        return jsonify({'job': job.to_dict()}), 200
+        
+    except Exception as e:
+        print(f"Error fetching job: {str(e)}")
+        return jsonify({'error': f'An error occurred: {str(e)}'}), 500
+
+@jobs_blueprint.route('/jobs/<job_id>/events', methods=['GET'])
+@jwt_required()
+def job_events(job_id):
+    """
+    Server-sent `status` events whenever the job changes, ending with `done`
+    or `failed`, or with `timeout` after JOB_EVENTS_MAX_SECONDS (reconnect or
+    poll /jobs/<id>). A `: ping` comment goes out between changes.
+    """
+    user_id = str(get_jwt_identity())
+    if not PromptJob.query.filter_by(id=job_id, user_id=user_id).first():
+        return jsonify({'error': 'Job not found'}), 404
+    job_queue.start()
+    ping_interval = current_app.config.get('JOB_EVENTS_PING_INTERVAL', 15)
+    max_seconds = current_app.config.get('JOB_EVENTS_MAX_SECONDS', 600)
+    
+    def events():
+        last_status = None
+        started = last_write = time.monotonic()
+        while True:
+            # a fresh read each time, the worker thread commits through its own session
+            db.session.expire_all()
+            job = db.session.get(PromptJob, job_id)
+            if job is None:
+                yield sse({'error': 'Job not found'}, event='failed')
+                return
+            if job.status != last_status:
+                last_status = job.status
+                event = job.status if job.status in ('done', 'failed') else 'status'
+                yield sse({'job': job.to_dict()}, event=event)
+                last_write = time.monotonic()
+                if event != 'status':
+                    return
+            if time.monotonic() - started >= max_seconds:
+                yield sse({'job': job.to_dict()}, event='timeout')
+                return
+            if time.monotonic() - last_write >= ping_interval:
+                yield ": ping\n\n"
+                last_write = time.monotonic()
+            # give the connection back while waiting
+            db.session.rollback()
+            time.sleep(0.5)
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
@@ -0,0 +1,34 @@
+from flask import Blueprint, Response, jsonify
+from app import db
+from app.services.db_pool import pool_metrics
+from app.services.outbound import outbound
+from app.services.rate_limit import rate_limiter
+from app.services.single_flight import single_flight
+from app.services.tracing import tracer
+
+metrics_blueprint = Blueprint('metrics', __name__)
+
+@metrics_blueprint.route('', methods=['GET'])
+def prometheus_metrics():
+    """Per-stage and per-route latency histograms for Prometheus to scrape (empty unless TRACING is on)"""
+    return Response(tracer.prometheus(), mimetype='text/plain; version=0.0.4')
+
+@metrics_blueprint.route('/outbound', methods=['GET'])
+def outbound_metrics():
+    """Connection-pool reuse, retries, breaker state and latency per upstream host"""
+    return jsonify({'upstreams': outbound.metrics()}), 200
+
+@metrics_blueprint.route('/db-pool', methods=['GET'])
+def db_pool_metrics():
+    """Database connections checked out, idle and in overflow, and time spent waiting for one"""
+    return jsonify({'db_pool': pool_metrics(db.engine)}), 200
+
+@metrics_blueprint.route('/single-flight', methods=['GET'])
+def single_flight_metrics():
+    """Coalesced executions: leaders ran the pipeline, followers shared a leader's result"""
+    return jsonify({'single_flight': single_flight.metrics()}), 200
+
+@metrics_blueprint.route('/rate-limits', methods=['GET'])
+def rate_limit_metrics():
+    """Requests turned away with 429 by this worker, per limit"""
+    return jsonify({'rate_limits': {'backend': type(rate_limiter.store).__name__, 'rejected': rate_limiter.rejected}}), 200
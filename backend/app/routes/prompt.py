@@ -1,44 +1,19 @@
-import os
+import json
 from app import db
-from app.models.chat import Chat, Conversation
-from app.models.user import User
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from bs4 import BeautifulSoup
-import requests
-# import chromadb
-# from chromadb.utils import embedding_functions
-from openai import OpenAI
-from dotenv import load_dotenv
-import os
-
-# load environment variables
-load_dotenv()
-
-# get OpenAI API Key
-openai_api_key = os.getenv('OPENAI_API_KEY')
-
-# encode text into numeric vectors
-# openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-#     # embedding model = text-embedding-3-small
-#     api_key=openai_api_key, model_name="text-embedding-3-small"
-# )
-
-# Initialize the Chroma client with persistence
-# chromadb_client = chromadb.PersistentClient(path="./chroma_persistent_storage")
-# collection_name = "document_qa_collection"
-# collection = chromadb_client.get_or_create_collection(
-#     name=collection_name, embedding_function=openai_ef
-# )
-
-client = OpenAI(api_key=openai_api_key)
-
-
+from app.services.history import load_history
+from app.services.jobs import job_queue
+from app.services.llm import stream_response
+from app.services.openai_client import openai_api_key
+from app.services.rate_limit import rate_limited
+from app.services.pipeline import PromptError, resolve_prompt_label, retrieve_context, cached_answer, remember_answer, answer_question, save_chat
 
 prompt_blueprint = Blueprint('prompt', __name__)
 
 @prompt_blueprint.route('/prompt', methods=['GET', 'POST', 'OPTIONS'])
 @jwt_required(optional=True)
+@rate_limited('prompt', by='user')
 def prompt():
     # Handle OPTIONS request for CORS preflight
     if request.method == 'OPTIONS':
@@ -61,122 +36,54 @@ def prompt():
                 'error': 'OpenAI API key not configured. Please add your API key to backend/.env file.'
             }), 500
         
-        # Try multiple search strategies for better medication matching
-        search_terms = [
-            f'openfda.brand_name:"{user_prompt.lower()}"',
-            f'openfda.generic_name:"{user_prompt.lower()}"',
-            f'openfda.brand_name:{user_prompt.lower()}',
-            f'openfda.generic_name:{user_prompt.lower()}'
-        ]
-        
-        response = None
-        for search_term in search_terms:
-            url = f'https://api.fda.gov/drug/label.json?search={search_term}&limit=1'
-            try:
-                temp_response = requests.get(url=url)
-                if temp_response.status_code == 200 and temp_response.json().get('results'):
-                    response = temp_response
-                    break
-            except:
-                continue
-        
-        if not response or response.status_code != 200:
-            return jsonify({'error': f"Medication information for '{user_prompt}' not found. Please check the spelling or try the generic name."}), 404
-        
-        # Check if we actually got results
-        response_data = response.json()
-        if not response_data.get('results'):
-            return jsonify({'error': f"Medication information for '{user_prompt}' not found. Please check the spelling or try the generic name."}), 404
-        
-        result = ''
-        for data in response_data['results']:
-            flat = [item for sublist in data.values() for item in sublist]  # flatten nested list
-            result += " ".join(flat)
-        
-        # Check if we got any meaningful data
-        if not result or len(result.strip()) < 50:
-            return jsonify({'error': f"Insufficient medication information found for '{user_prompt}'. The FDA database may not have detailed information for this medication."}), 404
-            
-        soup = BeautifulSoup(result, "html.parser")
-        clean_text = soup.get_text(separator="\n", strip=True)
-            
-        # write data to text file
-        files_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'files')
-        os.makedirs(files_dir, exist_ok=True)
-        file_path = os.path.join(files_dir, f'{user_prompt.lower()}.txt')
-        
-        with open(file_path, mode='w', encoding="utf-8") as file:
-            file.write(clean_text)
-            
-        # Load documents from the directory
-        directory_path = files_dir
-        documents = load_documents_from_directory(directory_path)
-
-        print(f"Loaded {len(documents)} documents")
-        # Split documents into chunks
-        chunked_documents = []
-        for doc in documents:
-            chunks = split_text(doc["text"])
-            print("==== Splitting docs into chunks ====")
-            for i, chunk in enumerate(chunks):
-                chunked_documents.append({"id": f"{doc['id']}_chunk{i+1}", "text": chunk})
-                
-        # Generate embeddings for the document chunks
-        for doc in chunked_documents:
-            print("==== Generating embeddings... ====")
-            doc["embedding"] = get_openai_embedding(doc["text"])
-            
+        # hand the whole prompt to a job worker and answer 202 with where to follow it
+        if data.get('background'):
+            job = job_queue.enqueue(logged_in_user, user_prompt, conversation_id)
+            return jsonify({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': f'/jobs/{job.id}',
+                'events_url': f'/jobs/{job.id}/events'
+            }), 202
+        
+        # earlier turns of the conversation, and the medication follow-ups are about
+        history = load_history(logged_in_user, conversation_id)
+        label, medication = resolve_prompt_label(user_prompt, history)
         question = user_prompt.lower()
-        # Only query the current medication file, not all files
-        relevant_chunks = query_documents(question, file_path)
-        
-        # Validate we have enough context
-        if not relevant_chunks or len("\n\n".join(relevant_chunks).strip()) < 50:
-            return jsonify({'error': f"Unable to generate response. Insufficient medication data retrieved from FDA."}), 500
-        
-        answer = generate_response(question, relevant_chunks)
-        
-        # Create or get conversation
-        if not conversation_id:
-            # Create a new conversation with the first prompt as title
-            import uuid
-            from datetime import datetime, timezone
-            title = user_prompt[:50] + '...' if len(user_prompt) > 50 else user_prompt
-            conversation = Conversation(
-                id=str(uuid.uuid4()),
-                user_id=logged_in_user,
-                title=title,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc)
+        stream = data.get('stream')
+        
+        # the same question about the same label version was answered before
+        # (only a conversation's first question, later answers depend on the conversation)
+        answer = cached_answer(label, question) if not history else None
+        if answer is not None:
+            if stream:
+                return stream_answer(logged_in_user, conversation_id, user_prompt, question, [answer], medication=medication)
+            conversation_id = save_chat(logged_in_user, conversation_id, user_prompt, question, answer, medication)
+            return jsonify({
+                'response': answer,
+                'conversation_id': conversation_id
+            }), 200
+        
+        # forward tokens as server-sent events while the model writes them
+        if stream:
+            tokens = stream_response(question, retrieve_context(label, question), history)
+            return stream_answer(
+                logged_in_user, conversation_id, user_prompt, question, tokens, medication=medication,
+                on_complete=None if history else lambda answer: remember_answer(label, question, answer)
             )
-            db.session.add(conversation)
-            db.session.flush()  # Get the ID without committing
-            conversation_id = conversation.id
-        else:
-            # Update existing conversation's updated_at
-            conversation = Conversation.query.filter_by(id=conversation_id, user_id=logged_in_user).first()
-            if conversation:
-                from datetime import datetime, timezone
-                conversation.updated_at = datetime.now(timezone.utc)
         
-        # Save the chat message
-        chat = Chat(
-            user_id=logged_in_user,
-            conversation_id=conversation_id,
-            user_prompt=question,
-            llm_response=answer.content
-        )
-        db.session.add(chat)
-        db.session.commit()
-            
-        # delete the text file
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # identical questions arriving together share one generation
+        answer = answer_question(label, question, history)
+        conversation_id = save_chat(logged_in_user, conversation_id, user_prompt, question, answer, medication)
+        
         return jsonify({
-            'response': answer.content,
+            'response': answer,
             'conversation_id': conversation_id
         }), 200
         
+    except PromptError as e:
+        return jsonify({'error': e.message}), e.status_code
+    
     except Exception as e:
         print(f"Error in prompt endpoint: {str(e)}")
         return jsonify({
@@ -184,106 +91,49 @@ def prompt():
         }), 500
 
 
-
-# Function to load documents from a directory
-def load_documents_from_directory(directory_path):
-    print("==== Loading documents from directory ====")
-    documents = []
-    for filename in os.listdir(directory_path):
-        if filename.endswith(".txt"):
-            with open(
-                os.path.join(directory_path, filename), "r", encoding="utf-8"
-            ) as file:
-                documents.append({"id": filename, "text": file.read()})
-    return documents
-
-# Function to split text into chunks
-def split_text(text, chunk_size=1000, chunk_overlap=20):
-    chunks = []
-    start = 0
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start = end - chunk_overlap
-    return chunks
-        
-# Function to generate embeddings using OpenAI API
-def get_openai_embedding(text):
-    response = client.embeddings.create(input=text, model="text-embedding-3-small")
-    embedding = response.data[0].embedding
-    print("==== Generating embeddings... ====")
-    return embedding
-
-
-# Function to query documents
-def query_documents(question, file_path, n_results=5):
-    # Read only the specific medication file
-    if not os.path.exists(file_path):
-        return []
-    
-    with open(file_path, 'r', encoding='utf-8') as file:
-        text = file.read()
-    
-    if not text or len(text.strip()) < 50:
-        return []
-    
-    # Split into chunks and return the most relevant ones
-    chunks = split_text(text, chunk_size=2000, chunk_overlap=200)
+def sse(data, event=None):
+    # one server-sent event
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+def stream_answer(user_id, conversation_id, user_prompt, question, tokens, on_complete=None, medication=None):
+    """
+    SSE response of `delta` events, then a `done` event once the answer is
+    saved. If the client goes away mid-answer the upstream stream is closed
+    and the question is saved without an answer.
+    """
+    def events(conversation_id):
+        parts = []
+        finished = False
+        try:
+            for delta in tokens:
+                parts.append(delta)
+                yield sse({'delta': delta})
+            finished = True
+            
+            answer = "".join(parts)
+            if on_complete:
+                on_complete(answer)
+            conversation_id = save_chat(user_id, conversation_id, user_prompt, question, answer, medication)
+            yield sse({'response': answer, 'conversation_id': conversation_id}, event='done')
+        
+        except GeneratorExit:
+            # client disconnected
+            if hasattr(tokens, 'close'):
+                tokens.close()
+            if not finished:
+                print("==== Client disconnected, saving the question without an answer ====")
+                save_chat(user_id, conversation_id, user_prompt, question, None, medication)
+            raise
+        
+        except Exception as e:
+            print(f"Error while streaming prompt response: {str(e)}")
+            db.session.rollback()
+            yield sse({'error': f'An error occurred: {str(e)}'}, event='error')
     
-    print(f"==== Returning {min(n_results, len(chunks))} relevant chunks ====")
-    return chunks[:n_results] if chunks else []
-
-
-# Function to generate a response from OpenAI
-def generate_response(question, relevant_chunks):
-    context = "\n\n".join(relevant_chunks)
-    prompt = (
-        "You are a medical assistant specialized in medications. Using the following pieces of "
-        "retrieved context, answer the question accurately. Include the following details if they are present in the context: "
-        "1. Side effects\n"
-        "2. Warnings\n"
-        "3. Dosage & administration\n"
-        "4. Missed dose instructions\n"
-        "5. Contraindications\n"
-        "6. Interactions with other medications, foods, or substances\n"
-        "7. Indications / Uses\n"
-        "8. Pregnancy & breastfeeding notes\n"
-        "9. Storage instructions\n"
-        "10. Administration route\n\n"
-        "If the information is not present in the context, say that you don't know. "
-        "Format your answer in clear sections like this:\n\n"
-        "Medication: <name>\n"
-        "Side Effects:\n- ...\n"
-        "Warnings:\n- ...\n"
-        "Dosage & Administration:\n\n- ...\n"
-        "Missed Dose:\n- ...\n"
-        "Contraindications:\n- ...\n"
-        "Interactions:\n- ...\n"
-        "Indications / Uses:\n- ...\n"
-        "Pregnancy & Breastfeeding Notes:\n- ...\n"
-        "Storage Instructions:\n- ...\n"
-        "Administration Route:\n- ...\n"
-        "At the end, include a line stating: "
-        "'The information provided is solely based on the content available in the context provided.'\n\n"
-        "Keep the answer concise, using a maximum of three sentences per section, "
-        "and avoid giving medical advice beyond the provided information.\n\n"
-        "At the end of your answer, clearly state which information came from the provided context "
-        "and whether the answer is based solely on that content or external knowledge.\n\n"
-        "Context:\n" + context + "\n\nQuestion:\n" + question
+    return Response(
+        stream_with_context(events(conversation_id)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
     )
-
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {
-                "role": "system",
-                "content": prompt,
-            },
-            {
-                "role": "user",
-                "content": question,
-            },
-        ],
-    )
-    
-    return response.choices[0].message
\ No newline at end of file
@@ -0,0 +1,4 @@
+'''
+    helpers that sit between the routes and the outside world
+    (openFDA, OpenAI, local caches and indexes)
+'''
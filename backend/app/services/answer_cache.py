@@ -0,0 +1,160 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from app.services.label_cache import normalize_name
+
+
+def template_hash(template):
+    """Short fingerprint of a prompt template, so editing the template retires old answers"""
+    return hashlib.sha256(template.encode('utf-8')).hexdigest()[:16]
+
+
+def _cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = (sum(x * x for x in a) ** 0.5) * (sum(y * y for y in b) ** 0.5)
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    '''
+        generated answers keyed on normalized question + label set_id and
+        version + model + prompt template hash.
+
+        - an optional similarity tier returns the answer of a near-duplicate
+          question (cosine >= `similarity` between question embeddings)
+          for the same label version, model and template
+        - the first answer about a newer revision of a label (by its
+          `effective_time`) drops the answers built on older revisions;
+          answers about older versions still in use elsewhere (say, the
+          offline index's copy) are kept until then
+        - past `max_entries` answers the least recently used are evicted
+    '''
+
+    def __init__(self, path=None, max_entries=2000, similarity=0.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def init_app(self, app):
+        self.path = app.config.get('ANSWER_CACHE_PATH') or os.path.join(app.instance_path, 'answers.sqlite3')
+        self.max_entries = app.config.get('ANSWER_CACHE_MAX_ENTRIES', self.max_entries)
+        self.similarity = app.config.get('ANSWER_CACHE_SIMILARITY', self.similarity)
+        self._ready = False
+        app.extensions['answer_cache'] = self
+
+    @property
+    def enabled(self):
+        return bool(self.path) and self.max_entries != 0
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            if not self._ready:
+                conn.executescript('''
+                    CREATE TABLE IF NOT EXISTS answers (
+                        key TEXT PRIMARY KEY,
+                        set_id TEXT NOT NULL,
+                        version TEXT,
+                        model TEXT NOT NULL,
+                        template TEXT NOT NULL,
+                        question TEXT NOT NULL,
+                        effective_time TEXT,
+                        vector BLOB,
+                        answer TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        last_used REAL NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS ix_answers_scope ON answers (set_id, version, model, template);
+                    CREATE INDEX IF NOT EXISTS ix_answers_last_used ON answers (last_used);
+                ''')
+                # stores created before answers were tagged with their label revision
+                if 'effective_time' not in [column[1] for column in conn.execute('PRAGMA table_info(answers)')]:
+                    conn.execute('ALTER TABLE answers ADD COLUMN effective_time TEXT')
+                self._ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def key(question, set_id, version, model, template):
+        raw = '\0'.join([normalize_name(question), set_id or '', version or '', model, template])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, question, set_id, version, model, template, vector=None):
+        """Cached answer for this exact question, else for a near-duplicate when `vector` is given"""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            key = self.key(question, set_id, version, model, template)
+            row = conn.execute('SELECT answer FROM answers WHERE key = ?', (key,)).fetchone()
+
+            if not row and vector is not None and self.similarity:
+                best, best_score = None, self.similarity
+                candidates = conn.execute(
+                    'SELECT key, vector, answer FROM answers '
+                    'WHERE set_id = ? AND version IS ? AND model = ? AND template = ? AND vector IS NOT NULL',
+                    (set_id, version, model, template)
+                ).fetchall()
+                for candidate_key, blob, answer in candidates:
+                    score = _cosine(vector, array('f', blob))
+                    if score >= best_score:
+                        best, best_score = (candidate_key, answer), score
+                if best:
+                    key, row = best[0], (best[1],)
+
+            if not row:
+                return None
+            conn.execute('UPDATE answers SET last_used = ? WHERE key = ?', (now, key))
+            return row[0]
+
+    def put(self, question, set_id, version, model, template, answer, vector=None, effective_time=None):
+        """Store an answer about label `set_id` revision `version` (`effective_time`, openFDA's YYYYMMDD)"""
+        if not self.enabled or not answer:
+            return
+        now = time.time()
+        effective_time = effective_time or ''
+        with self._lock, self._connect() as conn:
+            newest = conn.execute('SELECT MAX(effective_time) FROM answers WHERE set_id = ?', (set_id,)).fetchone()[0]
+            if newest is not None and effective_time > newest:
+                print(f"==== Label {set_id} revised ({effective_time}), dropping answers about older revisions ====")
+                conn.execute('DELETE FROM answers WHERE set_id = ? AND effective_time < ?', (set_id, effective_time))
+
+            conn.execute(
+                'INSERT OR REPLACE INTO answers '
+                '(key, set_id, version, model, template, question, effective_time, vector, answer, created_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    self.key(question, set_id, version, model, template), set_id, version, model, template,
+                    normalize_name(question), effective_time, array('f', vector).tobytes() if vector is not None else None,
+                    answer, now, now
+                )
+            )
+            if self.max_entries:
+                conn.execute(
+                    'DELETE FROM answers WHERE key IN '
+                    '(SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                    (self.max_entries,)
+                )
+
+    def invalidate(self, set_id=None):
+        """Forget the answers about one label, or all of them"""
+        with self._lock, self._connect() as conn:
+            if set_id is None:
+                conn.execute('DELETE FROM answers')
+            else:
+                conn.execute('DELETE FROM answers WHERE set_id = ?', (set_id,))
+
+
+# shared answer cache, configured in create_app()
+answer_cache = AnswerCache()
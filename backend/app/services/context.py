@@ -0,0 +1,95 @@
+import math
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # fall back to the ~4 characters per token rule of thumb
+    tiktoken = None
+
+
+@lru_cache(maxsize=8)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding('cl100k_base')
+        except Exception:
+            return None
+
+
+def count_tokens(text, model='gpt-3.5-turbo'):
+    """Tokens `text` costs with `model`; exact with tiktoken installed, estimated otherwise"""
+    if not text:
+        return 0
+    encoding = _encoding(model) if tiktoken is not None else None
+    if encoding is None:
+        return math.ceil(len(text) / 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def token_budget(config, model):
+    """
+    System prompt token budget for `model`: PROMPT_TOKEN_BUDGETS ("model=tokens,...")
+    overrides the PROMPT_TOKEN_BUDGET default
+    """
+    for entry in (config.get('PROMPT_TOKEN_BUDGETS') or '').split(','):
+        name, _, tokens = entry.partition('=')
+        if name.strip() == model and tokens.strip().isdigit():
+            return int(tokens)
+    return config.get('PROMPT_TOKEN_BUDGET', 2500)
+
+
+def _overlap(previous, text, minimum=10):
+    # longest suffix of `previous` that `text` starts with (the chunker's carried sentences)
+    for size in range(min(len(previous), len(text)), minimum - 1, -1):
+        if previous.endswith(text[:size]):
+            return size
+    return 0
+
+
+def dedupe_chunks(chunks):
+    """
+    Drop repeated chunks and trim the text a chunk shares with a neighbouring
+    chunk of the same section, so overlapping sentences are only sent once
+    """
+    result = []
+    for chunk in chunks:
+        text = chunk['text'].strip()
+        for kept in result:
+            if kept.get('section') != chunk.get('section'):
+                continue
+            # kept chunk comes right before this one in the label
+            size = _overlap(kept['text'], text)
+            if size:
+                text = text[size:].lstrip()
+            # or right after it
+            size = _overlap(text, kept['text'])
+            if size:
+                text = text[:-size].rstrip()
+        if text and not any(text in kept['text'] for kept in result):
+            result.append({**chunk, 'text': text})
+    return result
+
+
+def format_chunk(chunk):
+    # label sections in their own headed blocks so the model can tell dosage from storage
+    return f"[{(chunk.get('section') or 'label').replace('_', ' ').title()}]\n{chunk['text']}"
+
+
+def build_context(chunks, budget, model='gpt-3.5-turbo'):
+    """
+    Rank chunks by retrieval score, drop overlapping text and keep the best
+    ones that fit in `budget` tokens. Returns (context, tokens used).
+    """
+    ranked = sorted(chunks, key=lambda chunk: chunk.get('score', 0.0), reverse=True)
+    used, blocks = 0, []
+    for chunk in dedupe_chunks(ranked):
+        block = format_chunk(chunk)
+        cost = count_tokens(block + "\n\n", model)
+        if used + cost > budget:
+            # a smaller chunk further down may still fit
+            continue
+        blocks.append(block)
+        used += cost
+    return "\n\n".join(blocks), used
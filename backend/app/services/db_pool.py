@@ -0,0 +1,103 @@
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from app.services.metrics import Histogram
+
+# seconds; waiting on the pool should be ~0, anything in the upper buckets means too few connections
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)
+
+
+class PoolStats:
+    def __init__(self):
+        self.wait = Histogram(WAIT_BUCKETS)
+        self.connects = 0
+        self.invalidated = 0
+        self.timeouts = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            counts = {'connects': self.connects, 'invalidated': self.invalidated, 'timeouts': self.timeouts}
+        return {**counts, 'wait_seconds': self.wait.snapshot()}
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a usable connection"""
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            pool_stats.add(timeouts=1)
+            raise
+        finally:
+            pool_stats.wait.observe(time.perf_counter() - started)
+
+
+@event.listens_for(TimedQueuePool, 'connect')
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.add(connects=1)
+
+
+@event.listens_for(TimedQueuePool, 'invalidate')
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    # dropped by the server (caught by pre-ping) or broken mid-query
+    pool_stats.add(invalidated=1)
+
+
+def engine_options(config):
+    '''
+        SQLALCHEMY_ENGINE_OPTIONS built from the DB_POOL_* settings; an
+        explicit SQLALCHEMY_ENGINE_OPTIONS in the config wins
+    '''
+    url = make_url(config.get('SQLALCHEMY_DATABASE_URI') or 'sqlite://')
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # in-memory SQLite lives in one connection, keep SQLAlchemy's default pool
+        return {}
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+    statement_timeout = config.get('DB_STATEMENT_TIMEOUT', 0)
+    if statement_timeout and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+
+def init_app(app):
+    """Call before db.init_app(app), the engine is built from these options"""
+    options = engine_options(app.config)
+    options.update(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def pool_metrics(engine):
+    """Checked-out / idle / overflow connections right now, plus checkout waits since start"""
+    pool = engine.pool
+    current = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        current.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            # negative while the pool has not yet opened `size` connections
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+        })
+    return {**current, **pool_stats.snapshot()}
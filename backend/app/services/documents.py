@@ -0,0 +1,245 @@
+import re
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+# bump when chunk boundaries change so stored vectors get rebuilt
+CHUNKER_VERSION = 'sections-2'
+
+# label record keys that are identifiers, not label text
+METADATA_FIELDS = {'set_id', 'id', 'version', 'effective_time', 'openfda'}
+
+# topic of the label sections no other topic lists (description, overdosage, ...), so every section is indexed
+OTHER_TOPIC = 'other'
+
+# prompt topics (the sections generate_response asks for) -> openFDA fields that answer them,
+# prescription (PLR) fields first, then the OTC drug facts ones
+SECTION_TOPICS = {
+    'side_effects': ('adverse_reactions', 'stop_use', 'when_using'),
+    'warnings': (
+        'boxed_warning', 'warnings_and_cautions', 'warnings', 'precautions', 'general_precautions',
+        'ask_doctor', 'stop_use', 'when_using', 'keep_out_of_reach_of_children',
+    ),
+    'dosage': ('dosage_and_administration', 'dosage_forms_and_strengths', 'directions'),
+    'missed_dose': ('information_for_patients', 'spl_patient_package_insert', 'spl_medguide'),
+    'contraindications': ('contraindications', 'do_not_use'),
+    'interactions': ('drug_interactions', 'ask_doctor_or_pharmacist'),
+    'indications': ('indications_and_usage', 'purpose', 'active_ingredient'),
+    'pregnancy': ('pregnancy', 'lactation', 'nursing_mothers', 'use_in_specific_populations', 'pregnancy_or_breast_feeding'),
+    'storage': ('storage_and_handling', 'how_supplied'),
+    'route': ('route',),
+    OTHER_TOPIC: (),
+}
+
+# words in a question that narrow it to a few topics
+TOPIC_KEYWORDS = {
+    'side_effects': ('side effect', 'adverse', 'reaction', 'stop using'),
+    'warnings': ('warning', 'risk', 'danger', 'safe', 'child'),
+    'dosage': ('dose', 'dosage', 'how much', 'how often', 'take', 'direction'),
+    'missed_dose': ('miss', 'forgot', 'skip'),
+    'contraindications': ('contraindicat', 'should not', 'who can'),
+    'interactions': ('interact', 'alcohol', 'food', 'together', 'with other'),
+    'indications': ('used for', 'use for', 'treat', 'indicat', 'what is', 'purpose', 'ingredient', 'contain'),
+    'pregnancy': ('pregnan', 'breastfeed', 'breast-feed', 'breast feed', 'nursing', 'lactat'),
+    'storage': ('store', 'storage', 'fridge', 'temperature'),
+    'route': ('route', 'inject', 'oral', 'by mouth'),
+    OTHER_TOPIC: ('overdos', 'too much', 'how does it work', 'how it works', 'mechanism'),
+}
+
+_TOPIC_SECTIONS = {section for sections in SECTION_TOPICS.values() for section in sections}
+
+
+def in_topic(section, topic):
+    """Whether chunks of label `section` answer prompt `topic`; OTHER_TOPIC takes every section no topic lists"""
+    if topic == OTHER_TOPIC:
+        return section not in _TOPIC_SECTIONS
+    return section in SECTION_TOPICS[topic]
+
+
+def section_name(field):
+    """'adverse_reactions_table' -> 'adverse_reactions'; tables belong to their section"""
+    return field[:-len('_table')] if field.endswith('_table') else field
+
+
+class TextExtractor(HTMLParser):
+    '''
+        streaming tag stripper: collects the text between tags as it parses,
+        without building a tree. Gives the same text as BeautifulSoup's
+        html.parser get_text() with strip=True and a newline separator
+        (script / style / template contents, comments and declarations
+        dropped, entities decoded) at a fraction of the cost.
+    '''
+
+    SKIPPED_TAGS = {'script', 'style', 'template'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._pending = []
+        self._skipping = 0
+
+    def _flush(self):
+        # a tag (or comment) ends the current text node
+        if self._pending:
+            text = ''.join(self._pending).strip()
+            if text and not self._skipping:
+                self.parts.append(text)
+            self._pending = []
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in self.SKIPPED_TAGS:
+            self._skipping += 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in self.SKIPPED_TAGS and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def unknown_decl(self, data):
+        self._flush()
+        if data.startswith('CDATA[') and not self._skipping:
+            text = data[len('CDATA['):].strip()
+            if text:
+                self.parts.append(text)
+
+    def text(self, value, separator="\n"):
+        self.feed(value)
+        self.close()
+        self._flush()
+        return separator.join(self.parts)
+
+
+def clean_html(value):
+    """Text of an HTML fragment, one line per text node; plain text only has its ends stripped"""
+    # most openFDA fields are plain text, only tables and a few sections carry markup
+    if '<' not in value and '&' not in value:
+        return value.strip()
+    return TextExtractor().text(value)
+
+
+def _clean_sections(label):
+    sections = {}
+    for field, values in label.items():
+        if field in METADATA_FIELDS or not isinstance(values, list):
+            continue
+        text = clean_html(" ".join(value for value in values if isinstance(value, str)))
+        if text:
+            name = section_name(field)
+            sections[name] = f'{sections[name]}\n{text}' if name in sections else text
+
+    route = (label.get('openfda') or {}).get('route')
+    if route:
+        sections['route'] = 'Route of administration: ' + ', '.join(route)
+    return list(sections.items())
+
+
+# cleaned sections of the most recently used label versions, keyed by label id + version
+SECTIONS_CACHE_SIZE = 32
+_sections_cache = OrderedDict()
+_sections_lock = threading.Lock()
+
+
+def label_sections(label):
+    """[(section, cleaned text)] for every text field of an openFDA label record, in label order"""
+    key = (label.get('id'), label.get('version'))
+    if key[0] is None:
+        return _clean_sections(label)
+
+    with _sections_lock:
+        if key in _sections_cache:
+            _sections_cache.move_to_end(key)
+            return list(_sections_cache[key])
+
+    sections = _clean_sections(label)
+    with _sections_lock:
+        _sections_cache[key] = sections
+        while len(_sections_cache) > SECTIONS_CACHE_SIZE:
+            _sections_cache.popitem(last=False)
+    return list(sections)
+
+
+# Function to split text into chunks
+def split_text(text, chunk_size=1000, chunk_overlap=20):
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + chunk_size
+        chunks.append(text[start:end])
+        start = end - chunk_overlap
+    return chunks
+
+
+def split_section(text, chunk_size=800, chunk_overlap=150):
+    """
+    Pack whole sentences into chunks of at most `chunk_size` characters,
+    repeating up to `chunk_overlap` characters of trailing sentences at the
+    start of the next chunk. Sentences longer than a chunk are cut with split_text().
+    """
+    sentences = []
+    for sentence in re.split(r'(?<=[.!?])\s+|\n+', text):
+        sentence = sentence.strip()
+        if len(sentence) > chunk_size:
+            sentences.extend(split_text(sentence, chunk_size, chunk_overlap))
+        elif sentence:
+            sentences.append(sentence)
+
+    chunks, current = [], []
+    for sentence in sentences:
+        if current and len(' '.join(current + [sentence])) > chunk_size:
+            chunks.append(' '.join(current))
+            carried = []
+            for previous in reversed(current):
+                if len(' '.join([previous] + carried)) > chunk_overlap:
+                    break
+                carried.insert(0, previous)
+            if len(' '.join(carried + [sentence])) > chunk_size:
+                carried = []
+            current = carried
+        current.append(sentence)
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+
+def topics_for_question(question):
+    """Prompt topics a question is about; every topic when it names none in particular"""
+    question = (question or '').lower()
+    topics = [topic for topic, words in TOPIC_KEYWORDS.items() if any(word in question for word in words)]
+    return topics or list(SECTION_TOPICS)
+
+
+class Document:
+    '''
+        a cleaned label handed from one pipeline stage to the next as
+        (section, text) pairs
+    '''
+
+    def __init__(self, id, sections, metadata=None):
+        self.id = id
+        self.metadata = metadata or {}
+        self.sections = sections
+
+    @property
+    def text(self):
+        return "\n".join(text for _, text in self.sections)
+
+    def chunks(self, chunk_size=800, chunk_overlap=150):
+        """The document as [{"id", "section", "text"}] chunks that never cross a section boundary"""
+        chunks = []
+        for section, text in self.sections:
+            for i, chunk in enumerate(split_section(text, chunk_size, chunk_overlap)):
+                chunks.append({"id": f"{self.id}_{section}_{i+1}", "section": section, "text": chunk})
+        return chunks
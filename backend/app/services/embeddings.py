@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from app.services.tracing import tracer
+
+
+def content_key(model, text):
+    """Cache key of one chunk: the same text embedded by the same model always maps here"""
+    return hashlib.sha256(f'{model}\0{text}'.encode('utf-8')).hexdigest()
+
+
+class OpenAIEmbedder:
+    '''
+        embeds many texts per API call, `batch_size` inputs at a time
+    '''
+
+    def __init__(self, model='text-embedding-3-small', batch_size=256):
+        self.model = model
+        self.batch_size = batch_size
+
+    def embed(self, texts):
+        from app.services.openai_client import openai_clients
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = openai_clients.client.embeddings.create(input=batch, model=self.model)
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return vectors
+
+    async def embed_async(self, texts):
+        from app.services.openai_client import openai_clients
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            response = await openai_clients.async_client.embeddings.create(input=batch, model=self.model)
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return vectors
+
+
+class HashingEmbedder:
+    '''
+        deterministic local embedder (feature hashing of word unigrams and
+        bigrams); no network, so tests and offline deployments can run the
+        whole retrieval path
+    '''
+
+    def __init__(self, dimensions=512):
+        self.dimensions = dimensions
+        self.model = f'hashing-{dimensions}'
+
+    def _vector(self, text):
+        vector = [0.0] * self.dimensions
+        words = re.findall(r'[a-z0-9]+', text.lower())
+        for feature in words + [f'{a} {b}' for a, b in zip(words, words[1:])]:
+            digest = hashlib.md5(feature.encode('utf-8')).digest()
+            index = int.from_bytes(digest[:4], 'little') % self.dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        return [x / norm for x in vector]
+
+    def embed(self, texts):
+        return [self._vector(text) for text in texts]
+
+    async def embed_async(self, texts):
+        return self.embed(texts)
+
+
+# EMBEDDING_BACKEND values
+EMBEDDERS = {
+    'openai': lambda config: OpenAIEmbedder(
+        model=config.get('EMBEDDING_MODEL', 'text-embedding-3-small'),
+        batch_size=config.get('EMBEDDING_BATCH_SIZE', 256)
+    ),
+    'hashing': lambda config: HashingEmbedder(),
+}
+
+
+class EmbeddingCache:
+    '''
+        content-addressed embedding store persisted in SQLite, vectors are
+        kept as packed float32 so a label's chunks cost a few KB each
+    '''
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            if not self._ready:
+                conn.execute('CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)')
+                self._ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get_many(self, keys):
+        found = {}
+        if not self.path or not keys:
+            return found
+        with self._connect() as conn:
+            # stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                rows = conn.execute(
+                    f'SELECT key, vector FROM embeddings WHERE key IN ({",".join("?" * len(batch))})',
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array('f', blob).tolist()
+        return found
+
+    def put_many(self, items):
+        if not self.path or not items:
+            return
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)',
+                [(key, array('f', vector).tobytes()) for key, vector in items]
+            )
+
+
+class Embeddings:
+    '''
+        embed texts through the cache: only chunks never seen before for
+        the configured model reach the embedder, and those go out in batches
+    '''
+
+    def __init__(self):
+        self.cache = EmbeddingCache()
+        self.embedder = OpenAIEmbedder()
+
+    def init_app(self, app):
+        self.cache = EmbeddingCache(app.config.get('EMBEDDING_CACHE_PATH') or os.path.join(app.instance_path, 'embeddings.sqlite3'))
+        self.embedder = EMBEDDERS[app.config.get('EMBEDDING_BACKEND', 'openai')](app.config)
+        app.extensions['embeddings'] = self
+
+    def _cached(self, texts):
+        # (keys, vectors found in the cache, {key: text} still to embed)
+        keys = [content_key(self.embedder.model, text) for text in texts]
+        with tracer.span('embed_cache'):
+            vectors = self.cache.get_many(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            print(f"==== Generating embeddings for {len(missing)} of {len(texts)} chunks ====")
+        return keys, vectors, missing
+
+    def embed(self, texts):
+        keys, vectors, missing = self._cached(texts)
+        if missing:
+            with tracer.span('embed'):
+                fresh = list(zip(missing.keys(), self.embedder.embed(list(missing.values()))))
+            self.cache.put_many(fresh)
+            vectors.update(fresh)
+        return [vectors[key] for key in keys]
+
+    async def embed_async(self, texts):
+        """embed() with the cache in a worker thread and the API call on the event loop"""
+        keys, vectors, missing = await asyncio.to_thread(self._cached, texts)
+        if missing:
+            with tracer.span('embed'):
+                fresh = list(zip(missing.keys(), await self.embedder.embed_async(list(missing.values()))))
+            await asyncio.to_thread(self.cache.put_many, fresh)
+            vectors.update(fresh)
+        return [vectors[key] for key in keys]
+
+    def embed_chunks(self, chunks):
+        """Attach an "embedding" to every {"id", "text"} chunk"""
+        for chunk, vector in zip(chunks, self.embed([chunk["text"] for chunk in chunks])):
+            chunk["embedding"] = vector
+        return chunks
+
+    async def embed_chunks_async(self, chunks):
+        for chunk, vector in zip(chunks, await self.embed_async([chunk["text"] for chunk in chunks])):
+            chunk["embedding"] = vector
+        return chunks
+
+
+# shared embeddings service, configured in create_app()
+embeddings = Embeddings()
@@ -0,0 +1,230 @@
+import asyncio
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+import httpx
+from flask import current_app
+from app.services.label_cache import label_cache
+from app.services.label_index import label_index, label_name_index
+from app.services.outbound import outbound
+from app.services.tracing import tracer
+
+FDA_LABEL_URL = 'https://api.fda.gov/drug/label.json'
+
+# shared by every lookup so a burst of prompts cannot spawn unbounded threads (see _pool)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def search_terms(medication, exact=False):
+    """openFDA search strategies, best match first; `exact` keeps the whole-name matches only"""
+    medication = medication.lower()
+    terms = [
+        f'openfda.brand_name:"{medication}"',
+        f'openfda.generic_name:"{medication}"',
+        f'openfda.brand_name:{medication}',
+        f'openfda.generic_name:{medication}'
+    ]
+    return terms[:2] if exact else terms
+
+
+def _words(text):
+    return ' ' + ' '.join(re.findall(r'[a-z0-9]+', text.lower())) + ' '
+
+
+def names_label(text, label):
+    """Whether a name the label is known by (brand, generic, substance, salt-free) appears as whole words in `text`"""
+    return any(_words(name) in _words(text) for name, _ in label_name_index(label))
+
+
+def _pool(base_url):
+    """
+    The lookup pool: a thread for every strategy of each lookup that may run
+    at once, which is the openFDA host's OUTBOUND_CONCURRENCY limit or else
+    as many as the outbound connection pool serves. Further lookups queue
+    for threads while their deadline runs, and a strategy that lost keeps
+    its thread until openFDA answers or FDA_REQUEST_TIMEOUT passes (a sync
+    request cannot be cancelled).
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                strategies = len(search_terms(''))
+                lookups = outbound.concurrency.get(httpx.URL(base_url).host) or max(1, outbound.max_connections // strategies)
+                _executor = ThreadPoolExecutor(max_workers=lookups * strategies, thread_name_prefix='fda-lookup')
+    return _executor
+
+
+def _search(base_url, search_term, timeout):
+    # one strategy, one request; any failure just counts as a miss
+    try:
+        response = outbound.client.get(f'{base_url}?search={search_term}&limit=1', timeout=timeout)
+        if response.status_code == 200:
+            results = response.json().get('results')
+            if results:
+                return results[0]
+    except (httpx.HTTPError, ValueError):
+        pass
+    return None
+
+
+def fetch_label(medication, base_url=FDA_LABEL_URL, timeout=5.0, deadline=8.0, exact=False):
+    """
+    Ask openFDA for the label of `medication`, running every search strategy
+    concurrently. The hit from the best-ranked strategy wins as soon as all
+    better-ranked strategies have missed; the rest are cancelled. `timeout`
+    bounds each request and `deadline` the whole lookup, after which the best
+    hit seen so far (if any) is returned. `exact` only tries whole-name matches.
+    """
+    terms = search_terms(medication, exact)
+    futures = {
+        _pool(base_url).submit(_search, base_url, term, timeout): rank
+        for rank, term in enumerate(terms)
+    }
+    results = [None] * len(terms)
+    finished = [False] * len(terms)
+
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            rank = futures[future]
+            results[rank] = future.result()
+            finished[rank] = True
+
+            for better in range(len(terms)):
+                if results[better]:
+                    return results[better]
+                if not finished[better]:
+                    break
+    except FuturesTimeoutError:
+        print(f"==== openFDA lookup for '{medication}' hit the {deadline}s deadline ====")
+    finally:
+        for future in futures:
+            future.cancel()
+
+    return next((result for result in results if result), None)
+
+
+async def _search_async(base_url, search_term, timeout):
+    try:
+        response = await outbound.async_client.get(f'{base_url}?search={search_term}&limit=1', timeout=timeout)
+        if response.status_code == 200:
+            results = response.json().get('results')
+            if results:
+                return results[0]
+    except (httpx.HTTPError, ValueError):
+        pass
+    return None
+
+
+async def fetch_label_async(medication, base_url=FDA_LABEL_URL, timeout=5.0, deadline=8.0, exact=False):
+    """fetch_label() on the event loop: the strategies are tasks instead of pool threads"""
+    terms = search_terms(medication, exact)
+    tasks = [asyncio.create_task(_search_async(base_url, term, timeout)) for term in terms]
+    results = [None] * len(terms)
+    finished = [False] * len(terms)
+    loop = asyncio.get_running_loop()
+    ends_at = loop.time() + deadline
+
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, timeout=ends_at - loop.time(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                print(f"==== openFDA lookup for '{medication}' hit the {deadline}s deadline ====")
+                break
+            for task in done:
+                rank = tasks.index(task)
+                results[rank] = task.result()
+                finished[rank] = True
+
+            for better in range(len(terms)):
+                if results[better]:
+                    return results[better]
+                if not finished[better]:
+                    break
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return next((result for result in results if result), None)
+
+
+def _local_label(medication, mode):
+    # (found, label) from the offline index and the label cache, without touching the network
+    if mode != 'network':
+        label = label_index.lookup(medication)
+        if label:
+            return True, label
+        if mode == 'offline':
+            return True, None
+
+    label = label_cache.get(medication)
+    if label:
+        print(f"==== Label cache hit for '{medication}' ====")
+        return True, label
+    return False, None
+
+
+def find_label(medication, named=False):
+    """
+    Return the label for `medication` from the offline index or the label
+    cache, falling back to openFDA unless LABEL_LOOKUP_MODE is 'offline'.
+
+    With `named` (a follow-up prompt that may or may not name a drug) only
+    a label whose brand or generic name appears in `medication` counts, and
+    openFDA is only asked for whole-name matches.
+    """
+    config = current_app.config
+    with tracer.span('label_local'):
+        found, label = _local_label(medication, config.get('LABEL_LOOKUP_MODE', 'local-first'))
+    if found:
+        if named and label and not names_label(medication, label):
+            return None
+        return label
+
+    started = time.monotonic()
+    with tracer.span('openfda'):
+        label = fetch_label(
+            medication,
+            base_url=config.get('FDA_LABEL_URL', FDA_LABEL_URL),
+            timeout=config.get('FDA_REQUEST_TIMEOUT', 5.0),
+            deadline=config.get('FDA_LOOKUP_DEADLINE', 8.0),
+            exact=named
+        )
+    print(f"==== openFDA lookup for '{medication}' took {time.monotonic() - started:.2f}s ====")
+    if label and named and not names_label(medication, label):
+        print(f"==== openFDA matched '{medication}' to a label it does not name, ignored ====")
+        return None
+    if label:
+        label_cache.put(label, names=[medication])
+    return label
+
+
+async def find_label_async(medication, named=False):
+    """find_label() for the async /prompt path; the local SQLite lookups run in a worker thread"""
+    config = current_app.config
+    with tracer.span('label_local'):
+        found, label = await asyncio.to_thread(_local_label, medication, config.get('LABEL_LOOKUP_MODE', 'local-first'))
+    if found:
+        if named and label and not names_label(medication, label):
+            return None
+        return label
+
+    started = time.monotonic()
+    with tracer.span('openfda'):
+        label = await fetch_label_async(
+            medication,
+            base_url=config.get('FDA_LABEL_URL', FDA_LABEL_URL),
+            timeout=config.get('FDA_REQUEST_TIMEOUT', 5.0),
+            deadline=config.get('FDA_LOOKUP_DEADLINE', 8.0),
+            exact=named
+        )
+    print(f"==== openFDA lookup for '{medication}' took {time.monotonic() - started:.2f}s ====")
+    if label and named and not names_label(medication, label):
+        print(f"==== openFDA matched '{medication}' to a label it does not name, ignored ====")
+        return None
+    if label:
+        await asyncio.to_thread(label_cache.put, label, names=[medication])
+    return label
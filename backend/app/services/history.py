@@ -0,0 +1,131 @@
+from flask import current_app
+from sqlalchemy.orm import load_only
+from app import db
+from app.models.chat import Chat, Conversation
+from app.services.context import count_tokens, token_budget
+from app.services.openai_client import openai_clients
+from app.services.tracing import tracer
+
+# most unsummarized chats read (and folded) per prompt; a long conversation from
+# before summaries existed starts its summary from its latest turns
+UNSUMMARIZED_LIMIT = 20
+
+SUMMARY_INSTRUCTIONS = (
+    "You keep a running summary of a conversation between a user and a medication assistant. "
+    "Rewrite the summary so it also covers the new turns. Keep the medications discussed, what "
+    "the user said about themselves (conditions, pregnancy, other medications) and the facts "
+    "already given; leave out formatting and repetition. Reply with the summary only."
+)
+
+
+class History:
+    '''
+        what the model is shown of a conversation's earlier turns: the
+        medication its label came from, a rolling summary of the older
+        turns and the latest turns verbatim
+    '''
+
+    def __init__(self, medication=None, summary=None, turns=()):
+        self.medication = medication
+        self.summary = summary
+        # (question, answer), oldest first
+        self.turns = list(turns)
+
+    def __bool__(self):
+        return bool(self.summary or self.turns)
+
+    def messages(self):
+        """The recent turns as chat messages"""
+        messages = []
+        for question, answer in self.turns:
+            messages += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+        return messages
+
+
+def load_history(user_id, conversation_id):
+    """
+    The History of one of the user's conversations (empty for a new one).
+    Turns beyond CONVERSATION_HISTORY_TURNS / CONVERSATION_HISTORY_TOKENS
+    are folded into the conversation's stored summary first.
+    """
+    if not conversation_id:
+        return History()
+
+    config = current_app.config
+    model = config.get('OPENAI_CHAT_MODEL', 'gpt-3.5-turbo')
+    with tracer.span('history'):
+        conversation = (
+            Conversation.query
+            .options(load_only(Conversation.id, Conversation.medication, Conversation.summary, Conversation.summarized_through))
+            .filter_by(id=conversation_id, user_id=user_id)
+            .first()
+        )
+        if conversation is None:
+            return History()
+
+        query = db.session.query(Chat.id, Chat.user_prompt, Chat.llm_response).filter(Chat.conversation_id == conversation_id)
+        if conversation.summarized_through is not None:
+            query = query.filter(Chat.id > conversation.summarized_through)
+        chats = query.order_by(Chat.created_at.desc(), Chat.id.desc()).limit(UNSUMMARIZED_LIMIT).all()
+        chats.reverse()
+
+        # the newest turns that fit stay verbatim
+        kept, used = 0, 0
+        for _, question, answer in reversed(chats):
+            cost = count_tokens(question, model) + count_tokens(answer or '', model)
+            if kept == config.get('CONVERSATION_HISTORY_TURNS', 4) or used + cost > config.get('CONVERSATION_HISTORY_TOKENS', 1000):
+                break
+            kept, used = kept + 1, used + cost
+        older, recent = chats[:len(chats) - kept], chats[len(chats) - kept:]
+
+        summary = conversation.summary
+        if older:
+            summary = _fold(conversation, older, model)
+        else:
+            # end the read transaction, the connection goes back to the pool while the model answers
+            db.session.commit()
+
+    # a question the client went away from has no answer to show
+    return History(conversation.medication, summary, [(question, answer) for _, question, answer in recent if answer])
+
+
+def _fold(conversation, chats, model):
+    # summary of the conversation's stored summary plus `chats` (oldest first), stored on it
+    config = current_app.config
+    turns, used = [], 0
+    for _, question, answer in reversed(chats):
+        if not answer:
+            continue
+        turn = f"User: {question}\nAssistant: {answer}"
+        used += count_tokens(turn, model)
+        if used > token_budget(config, model):
+            break
+        turns.insert(0, turn)
+
+    summary = conversation.summary
+    if turns:
+        try:
+            with tracer.span('summarize'):
+                response = openai_clients.client.chat.completions.create(
+                    model=model,
+                    max_tokens=config.get('CONVERSATION_SUMMARY_TOKENS', 250),
+                    messages=[
+                        {"role": "system", "content": SUMMARY_INSTRUCTIONS},
+                        {"role": "user", "content": f"Summary so far:\n{summary or '(none)'}\n\nNew turns:\n" + "\n\n".join(turns)},
+                    ]
+                )
+            summary = response.choices[0].message.content.strip()
+        except Exception as e:
+            # answer with the summary we have, fold again on the next prompt
+            print(f"Error summarizing conversation {conversation.id}: {str(e)}")
+            db.session.commit()
+            return summary
+
+    # another prompt in this conversation may have folded these turns meanwhile
+    Conversation.query.filter_by(id=conversation.id, summarized_through=conversation.summarized_through).update(
+        {'summary': summary, 'summarized_through': chats[-1][0]},
+        synchronize_session=False
+    )
+    db.session.commit()
+    print(f"==== Folded {len(chats)} turns into the summary of conversation {conversation.id} ====")
+    return summary
@@ -0,0 +1,160 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from app import db
+from app.models.prompt_job import PromptJob
+from app.services.history import load_history
+from app.services.pipeline import PromptError, resolve_prompt_label, answer_question, save_chat
+
+
+def run_prompt_job(job):
+    """fetch -> retrieve -> generate -> persist the Chat for one job, recording the outcome on it"""
+    try:
+        history = load_history(str(job.user_id), job.conversation_id)
+        label, medication = resolve_prompt_label(job.user_prompt, history)
+        question = job.user_prompt.lower()
+        answer = answer_question(label, question, history)
+        job.conversation_id = save_chat(str(job.user_id), job.conversation_id, job.user_prompt, question, answer, medication)
+        job.status, job.response, job.status_code = 'done', answer, 200
+    except PromptError as e:
+        db.session.rollback()
+        job.status, job.error, job.status_code = 'failed', e.message, e.status_code
+    except Exception as e:
+        print(f"Error in prompt job {job.id}: {str(e)}")
+        db.session.rollback()
+        job.status, job.error, job.status_code = 'failed', f'An error occurred: {str(e)}', 500
+    job.finished_at = datetime.now(timezone.utc)
+    db.session.commit()
+
+
+class JobQueue:
+    '''
+        prompt jobs persisted in the prompt_jobs table and worked off by a
+        pool of `workers` threads, so a slow upstream call no longer holds
+        an HTTP request open and a restart does not lose queued work.
+
+        - workers claim the oldest queued job with a conditional UPDATE,
+          which is safe with several processes polling the same table
+        - enqueue() wakes a worker at once, otherwise they poll every
+          `poll_interval` seconds (jobs queued by other processes)
+        - a job left running for `stale_after` seconds (its worker died)
+          is queued again, up to `max_attempts` tries
+    '''
+
+    def __init__(self):
+        self.app = None
+        self.workers = 4
+        self.poll_interval = 1.0
+        self.stale_after = 600
+        self.max_attempts = 3
+        self._threads = []
+        self._last_sweep = 0.0
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('JOB_WORKERS', self.workers)
+        self.poll_interval = app.config.get('JOB_POLL_INTERVAL', self.poll_interval)
+        self.stale_after = app.config.get('JOB_STALE_AFTER', self.stale_after)
+        self.max_attempts = app.config.get('JOB_MAX_ATTEMPTS', self.max_attempts)
+        app.extensions['jobs'] = self
+
+    def start(self):
+        """Start the worker threads (once); called on first use rather than at import or CLI time"""
+        with self._lock:
+            if self._threads or not self.workers:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'prompt-job-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        print(f"==== Started {self.workers} prompt job workers ====")
+
+    def stop(self):
+        self._stopping = True
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def enqueue(self, user_id, user_prompt, conversation_id=None):
+        job = PromptJob(user_id=user_id, user_prompt=user_prompt, conversation_id=conversation_id)
+        db.session.add(job)
+        db.session.commit()
+        self.start()
+        with self._wakeup:
+            self._wakeup.notify()
+        return job
+
+    def in_progress(self, user_id):
+        """How many of the user's jobs are queued or running"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return 0
+        with self.app.app_context():
+            return PromptJob.query.filter(PromptJob.user_id == user_id, PromptJob.status.in_(('queued', 'running'))).count()
+
+    def _requeue_stale(self):
+        # one sweep per minute is plenty for jobs stale after minutes
+        if time.monotonic() - self._last_sweep < 60:
+            return
+        self._last_sweep = time.monotonic()
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.stale_after)
+        stale = PromptJob.query.filter(PromptJob.status == 'running', PromptJob.started_at < cutoff)
+        stale.filter(PromptJob.attempts >= self.max_attempts).update(
+            {'status': 'failed', 'error': 'The job was interrupted too many times.', 'status_code': 500,
+             'finished_at': datetime.now(timezone.utc)},
+            synchronize_session=False
+        )
+        stale.update({'status': 'queued'}, synchronize_session=False)
+        db.session.commit()
+
+    def claim(self):
+        """The oldest queued job, now marked running by this worker, or None"""
+        while True:
+            job_id = (
+                db.session.query(PromptJob.id)
+                .filter(PromptJob.status == 'queued')
+                .order_by(PromptJob.created_at.asc())
+                .limit(1)
+                .scalar()
+            )
+            if job_id is None:
+                return None
+            # only one worker's UPDATE still sees it queued
+            claimed = PromptJob.query.filter_by(id=job_id, status='queued').update(
+                {'status': 'running', 'started_at': datetime.now(timezone.utc), 'attempts': PromptJob.attempts + 1},
+                synchronize_session=False
+            )
+            db.session.commit()
+            if claimed:
+                return db.session.get(PromptJob, job_id)
+
+    def work_once(self):
+        """Run one queued job if there is one; returns whether it did"""
+        job = self.claim()
+        if job is None:
+            return False
+        run_prompt_job(job)
+        return True
+
+    def _work(self):
+        while not self._stopping:
+            try:
+                with self.app.app_context():
+                    self._requeue_stale()
+                    while not self._stopping and self.work_once():
+                        pass
+            except Exception as e:
+                print(f"Error in prompt job worker: {str(e)}")
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+
+
+# shared prompt job queue, configured in create_app()
+job_queue = JobQueue()
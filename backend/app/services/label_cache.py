@@ -0,0 +1,179 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+def normalize_name(name):
+    """Normalize a brand/generic name so 'Xarelto ', '"XARELTO"' and 'xarelto' share a key"""
+    if not name:
+        return ''
+    name = name.strip().strip('"\'').lower()
+    return re.sub(r'\s+', ' ', name)
+
+
+def label_names(label):
+    """Every brand and generic name an openFDA label record is known by"""
+    openfda = label.get('openfda') or {}
+    names = openfda.get('brand_name', []) + openfda.get('generic_name', [])
+    return {normalize_name(name) for name in names if normalize_name(name)}
+
+
+class LabelCache:
+    '''
+        persistent cache of openFDA label records keyed by normalized
+        brand/generic name.
+
+        - entries expire `ttl` seconds after they were fetched
+        - a label is never replaced by one with an older `effective_time`
+        - once more than `max_entries` labels are stored the least
+          recently used ones are evicted
+    '''
+
+    def __init__(self, path=None, ttl=7 * 24 * 3600, max_entries=500):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def init_app(self, app):
+        self.path = app.config.get('LABEL_CACHE_PATH') or os.path.join(app.instance_path, 'label_cache.sqlite3')
+        self.ttl = app.config.get('LABEL_CACHE_TTL', self.ttl)
+        self.max_entries = app.config.get('LABEL_CACHE_MAX_ENTRIES', self.max_entries)
+        self._ready = False
+        app.extensions['label_cache'] = self
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            if not self._ready:
+                self._create_tables(conn)
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_tables(self, conn):
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS labels (
+                set_id TEXT PRIMARY KEY,
+                effective_time TEXT,
+                label TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS label_keys (
+                name TEXT PRIMARY KEY,
+                set_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ix_labels_last_used ON labels (last_used);
+            CREATE INDEX IF NOT EXISTS ix_label_keys_set_id ON label_keys (set_id);
+        ''')
+        self._ready = True
+
+    def get(self, name):
+        """Return the cached label for `name`, or None on a miss or an expired entry"""
+        key = normalize_name(name)
+        if not key or not self.path:
+            return None
+
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                'SELECT l.set_id, l.label, l.fetched_at FROM label_keys k '
+                'JOIN labels l ON l.set_id = k.set_id WHERE k.name = ?',
+                (key,)
+            ).fetchone()
+            if not row:
+                return None
+
+            set_id, label, fetched_at = row
+            if self.ttl and now - fetched_at > self.ttl:
+                self._delete(conn, set_id)
+                return None
+
+            conn.execute('UPDATE labels SET last_used = ? WHERE set_id = ?', (now, set_id))
+            return json.loads(label)
+
+    def put(self, label, names=()):
+        """
+        Store a label under its own brand/generic names plus any extra `names`
+        (e.g. the text the user searched for). Returns False if a newer
+        version of the same label is already cached.
+        """
+        set_id = label.get('set_id')
+        if not set_id or not self.path:
+            return False
+
+        effective_time = label.get('effective_time') or ''
+        keys = label_names(label) | {normalize_name(name) for name in names if normalize_name(name)}
+        now = time.time()
+
+        with self._lock, self._connect() as conn:
+            row = conn.execute('SELECT effective_time FROM labels WHERE set_id = ?', (set_id,)).fetchone()
+            if row and (row[0] or '') > effective_time:
+                return False
+
+            conn.execute(
+                'INSERT OR REPLACE INTO labels (set_id, effective_time, label, fetched_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (set_id, effective_time, json.dumps(label), now, now)
+            )
+
+            for key in keys:
+                # a name shared by several labels points at the most recently revised one
+                current = conn.execute(
+                    'SELECT l.effective_time FROM label_keys k JOIN labels l ON l.set_id = k.set_id '
+                    'WHERE k.name = ? AND k.set_id != ?',
+                    (key, set_id)
+                ).fetchone()
+                if current and (current[0] or '') > effective_time:
+                    continue
+                conn.execute('INSERT OR REPLACE INTO label_keys (name, set_id) VALUES (?, ?)', (key, set_id))
+
+            self._evict(conn)
+        return True
+
+    def seed(self, labels):
+        """Pre-load label records shaped like the openFDA `results` list (see app/data.json)"""
+        return sum(1 for label in labels if self.put(label))
+
+    def invalidate(self, name=None):
+        """Drop the label cached for `name`, or everything when no name is given"""
+        with self._lock, self._connect() as conn:
+            if name is None:
+                conn.execute('DELETE FROM label_keys')
+                conn.execute('DELETE FROM labels')
+                return
+
+            row = conn.execute('SELECT set_id FROM label_keys WHERE name = ?', (normalize_name(name),)).fetchone()
+            if row:
+                self._delete(conn, row[0])
+
+    def __len__(self):
+        with self._lock, self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM labels').fetchone()[0]
+
+    def _delete(self, conn, set_id):
+        conn.execute('DELETE FROM label_keys WHERE set_id = ?', (set_id,))
+        conn.execute('DELETE FROM labels WHERE set_id = ?', (set_id,))
+
+    def _evict(self, conn):
+        if not self.max_entries:
+            return
+        stale = conn.execute(
+            'SELECT set_id FROM labels ORDER BY last_used DESC LIMIT -1 OFFSET ?',
+            (self.max_entries,)
+        ).fetchall()
+        for (set_id,) in stale:
+            self._delete(conn, set_id)
+
+
+# shared cache, configured in create_app()
+label_cache = LabelCache()
@@ -0,0 +1,146 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from app.services.label_cache import normalize_name
+
+# how good a match each kind of name is, lower wins
+NAME_KINDS = {
+    'brand': 0,
+    'generic': 0,
+    'substance': 1,
+    'synonym': 2,
+}
+
+# salt / form words dropped to build synonyms ("metformin hydrochloride" -> "metformin")
+SALT_WORDS = {
+    'hydrochloride', 'hcl', 'sodium', 'potassium', 'calcium', 'magnesium',
+    'sulfate', 'succinate', 'tartrate', 'maleate', 'mesylate', 'besylate',
+    'citrate', 'phosphate', 'acetate', 'hyclate', 'monohydrate', 'dihydrate',
+    'bromide', 'fumarate', 'extended-release', 'er', 'xr', 'sr',
+}
+
+
+def label_name_index(label):
+    """(name, kind) pairs a label record can be looked up by"""
+    openfda = label.get('openfda') or {}
+    names = set()
+    for kind, field in (('brand', 'brand_name'), ('generic', 'generic_name'), ('substance', 'substance_name')):
+        for name in openfda.get(field, []):
+            name = normalize_name(name)
+            if name:
+                names.add((name, kind))
+
+    for name, kind in list(names):
+        words = [word for word in re.split(r'[\s,]+', name) if word]
+        stripped = ' '.join(word for word in words if word not in SALT_WORDS)
+        if stripped and stripped != name:
+            names.add((stripped, 'synonym'))
+    return names
+
+
+class LabelIndex:
+    '''
+        local store of full openFDA label records built from bulk dumps,
+        with a name index over brand, generic and substance names (plus
+        salt-free synonyms) so labels can be resolved without the FDA API.
+        Only the newest `effective_time` of each `set_id` is kept.
+    '''
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def init_app(self, app):
+        self.path = app.config.get('LABEL_INDEX_PATH') or os.path.join(app.instance_path, 'label_index.sqlite3')
+        self._ready = False
+        app.extensions['label_index'] = self
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            if not self._ready:
+                self._create_tables(conn)
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _create_tables(self, conn):
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS labels (
+                set_id TEXT PRIMARY KEY,
+                id TEXT,
+                version TEXT,
+                effective_time TEXT,
+                label TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS label_names (
+                name TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                rank INTEGER NOT NULL,
+                set_id TEXT NOT NULL,
+                PRIMARY KEY (name, set_id)
+            );
+            CREATE INDEX IF NOT EXISTS ix_label_names_name_rank ON label_names (name, rank);
+            CREATE INDEX IF NOT EXISTS ix_label_names_set_id ON label_names (set_id);
+        ''')
+        self._ready = True
+
+    def ingest(self, labels):
+        """Add label records to the store, returns how many were inserted or updated"""
+        count = 0
+        with self._lock, self._connect() as conn:
+            for label in labels:
+                set_id = label.get('set_id')
+                if not set_id:
+                    continue
+
+                effective_time = label.get('effective_time') or ''
+                row = conn.execute('SELECT effective_time FROM labels WHERE set_id = ?', (set_id,)).fetchone()
+                if row and (row[0] or '') > effective_time:
+                    continue
+
+                conn.execute(
+                    'INSERT OR REPLACE INTO labels (set_id, id, version, effective_time, label) VALUES (?, ?, ?, ?, ?)',
+                    (set_id, label.get('id'), label.get('version'), effective_time, json.dumps(label))
+                )
+                conn.execute('DELETE FROM label_names WHERE set_id = ?', (set_id,))
+                conn.executemany(
+                    'INSERT OR REPLACE INTO label_names (name, kind, rank, set_id) VALUES (?, ?, ?, ?)',
+                    [(name, kind, NAME_KINDS[kind], set_id) for name, kind in label_name_index(label)]
+                )
+                count += 1
+        return count
+
+    def lookup(self, medication):
+        """Best label for `medication`: closest kind of name first, then the most recently revised"""
+        key = normalize_name(medication)
+        if not key or not self.path:
+            return None
+
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT l.label FROM label_names n JOIN labels l ON l.set_id = n.set_id '
+                'WHERE n.name = ? ORDER BY n.rank, l.effective_time DESC LIMIT 1',
+                (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get(self, set_id):
+        with self._connect() as conn:
+            row = conn.execute('SELECT label FROM labels WHERE set_id = ?', (set_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute('SELECT COUNT(*) FROM labels').fetchone()[0]
+
+
+# shared index, configured in create_app()
+label_index = LabelIndex()
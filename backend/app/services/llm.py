@@ -0,0 +1,117 @@
+from flask import current_app
+from app.services.context import build_context, count_tokens, token_budget
+from app.services.openai_client import openai_clients
+from app.services.tracing import tracer
+
+# Fixed instructions that open every system prompt
+INSTRUCTIONS = (
+    "You are a medical assistant specialized in medications. Using the following pieces of "
+    "retrieved context, answer the question accurately. Include the following details if they are present in the context: "
+    "1. Side effects\n"
+    "2. Warnings\n"
+    "3. Dosage & administration\n"
+    "4. Missed dose instructions\n"
+    "5. Contraindications\n"
+    "6. Interactions with other medications, foods, or substances\n"
+    "7. Indications / Uses\n"
+    "8. Pregnancy & breastfeeding notes\n"
+    "9. Storage instructions\n"
+    "10. Administration route\n\n"
+    "If the information is not present in the context, say that you don't know. "
+    "Format your answer in clear sections like this:\n\n"
+    "Medication: <name>\n"
+    "Side Effects:\n- ...\n"
+    "Warnings:\n- ...\n"
+    "Dosage & Administration:\n\n- ...\n"
+    "Missed Dose:\n- ...\n"
+    "Contraindications:\n- ...\n"
+    "Interactions:\n- ...\n"
+    "Indications / Uses:\n- ...\n"
+    "Pregnancy & Breastfeeding Notes:\n- ...\n"
+    "Storage Instructions:\n- ...\n"
+    "Administration Route:\n- ...\n"
+    "At the end, include a line stating: "
+    "'The information provided is solely based on the content available in the context provided.'\n\n"
+    "Keep the answer concise, using a maximum of three sentences per section, "
+    "and avoid giving medical advice beyond the provided information.\n\n"
+    "At the end of your answer, clearly state which information came from the provided context "
+    "and whether the answer is based solely on that content or external knowledge.\n\n"
+)
+
+
+def build_messages(question, relevant_chunks, history=None):
+    """
+    (model, chat messages) for answering `question` from the retrieved label
+    chunks, after the conversation's summary and latest turns (a History)
+    """
+    model = current_app.config.get('OPENAI_CHAT_MODEL', 'gpt-3.5-turbo')
+    earlier = "Earlier in this conversation:\n" + history.summary + "\n\n" if history and history.summary else ""
+    turns = history.messages() if history else []
+    # whatever the instructions, the conversation and the question (in the system prompt and
+    # again as the user message) leave of the model's budget goes to label context
+    scaffold = INSTRUCTIONS + earlier + "Context:\n" + "\n\nQuestion:\n" + question
+    budget = max(0, (
+        token_budget(current_app.config, model)
+        - count_tokens(scaffold, model)
+        - sum(count_tokens(turn["content"], model) for turn in turns)
+        - count_tokens(question, model)
+    ))
+    context, context_tokens = build_context(relevant_chunks, budget, model)
+    print(f"==== Sending {context_tokens} context tokens (budget {budget}) ====")
+    if relevant_chunks and not context:
+        print(f"==== No label context fits the prompt budget, {len(relevant_chunks)} chunks dropped ====")
+    
+    prompt = INSTRUCTIONS + earlier + "Context:\n" + context + "\n\nQuestion:\n" + question
+    return model, [
+        {
+            "role": "system",
+            "content": prompt,
+        },
+        *turns,
+        {
+            "role": "user",
+            "content": question,
+        },
+    ]
+
+
+# Function to generate a response from OpenAI
+def generate_response(question, relevant_chunks, history=None):
+    model, messages = build_messages(question, relevant_chunks, history)
+    with tracer.span('llm'):
+        response = openai_clients.client.chat.completions.create(model=model, messages=messages)
+    return response.choices[0].message
+
+
+def stream_response(question, relevant_chunks, history=None):
+    """Yield the answer's text as the model produces it; closing the generator closes the upstream stream"""
+    model, messages = build_messages(question, relevant_chunks, history)
+    # up to the upstream stream opening; a streamed reply has sent its headers by then
+    with tracer.span('llm_stream_open'):
+        stream = openai_clients.client.chat.completions.create(model=model, messages=messages, stream=True)
+    try:
+        for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+    finally:
+        stream.close()
+
+
+async def generate_response_async(question, relevant_chunks, history=None):
+    model, messages = build_messages(question, relevant_chunks, history)
+    with tracer.span('llm'):
+        response = await openai_clients.async_client.chat.completions.create(model=model, messages=messages)
+    return response.choices[0].message
+
+
+async def stream_response_async(question, relevant_chunks, history=None):
+    """stream_response() as an async generator; aclose() closes the upstream stream"""
+    model, messages = build_messages(question, relevant_chunks, history)
+    with tracer.span('llm_stream_open'):
+        stream = await openai_clients.async_client.chat.completions.create(model=model, messages=messages, stream=True)
+    try:
+        async for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+    finally:
+        await stream.close()
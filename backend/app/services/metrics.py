@@ -0,0 +1,43 @@
+import bisect
+import threading
+
+# seconds; roughly log-spaced from a fast cache hit to a slow LLM completion
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    '''
+        thread-safe latency histogram with cumulative buckets,
+        the same shape Prometheus expects
+    '''
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sum += value
+            self._max = max(self._max, value)
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total, largest = self._sum, self._max
+
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            running += count
+            cumulative['+Inf' if bound == float('inf') else str(bound)] = running
+
+        return {
+            'count': running,
+            'sum': round(total, 6),
+            'avg': round(total / running, 6) if running else 0.0,
+            'max': round(largest, 6),
+            'buckets': cumulative,
+        }
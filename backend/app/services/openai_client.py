@@ -0,0 +1,59 @@
+import os
+import threading
+from openai import AsyncOpenAI, OpenAI
+from dotenv import load_dotenv
+from app.services.outbound import outbound
+
+# load environment variables
+load_dotenv()
+
+# get OpenAI API Key
+openai_api_key = os.getenv('OPENAI_API_KEY')
+
+
+class OpenAIClients:
+    '''
+        the OpenAI SDK clients, built on first use on top of the pooled
+        outbound HTTP clients create_app() configured, and built again
+        when outbound replaces a client it closed
+    '''
+
+    def __init__(self):
+        self.timeout = 60.0
+        self.max_retries = 2
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.timeout = app.config.get('OPENAI_TIMEOUT', self.timeout)
+        # the SDK retries its own POSTs with backoff
+        self.max_retries = app.config.get('OUTBOUND_RETRIES', self.max_retries)
+        self._client = self._async_client = None
+        app.extensions['openai'] = self
+
+    @property
+    def client(self):
+        http_client = outbound.client
+        with self._lock:
+            # (outbound HTTP client, SDK client on top of it)
+            if self._client is None or self._client[0] is not http_client:
+                self._client = (http_client, OpenAI(
+                    api_key=openai_api_key, http_client=http_client, timeout=self.timeout, max_retries=self.max_retries
+                ))
+            return self._client[1]
+
+    @property
+    def async_client(self):
+        """The same for the async /prompt path (asgi.py)"""
+        http_client = outbound.async_client
+        with self._lock:
+            if self._async_client is None or self._async_client[0] is not http_client:
+                self._async_client = (http_client, AsyncOpenAI(
+                    api_key=openai_api_key, http_client=http_client, timeout=self.timeout, max_retries=self.max_retries
+                ))
+            return self._async_client[1]
+
+
+# shared OpenAI clients, configured in create_app()
+openai_clients = OpenAIClients()
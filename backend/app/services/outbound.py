@@ -0,0 +1,369 @@
+import asyncio
+import random
+import threading
+import time
+import httpx
+from app.services.metrics import Histogram
+
+# only these are safe to send twice; OpenAI POSTs are retried by the OpenAI client itself
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of calling an upstream whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    '''
+        closed    - requests flow, consecutive failures are counted
+        open      - `failure_threshold` failures in a row, requests are
+                    rejected for `reset_timeout` seconds
+        half-open - after the timeout one trial request is let through,
+                    its outcome closes or re-opens the breaker
+    '''
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+class UpstreamStats:
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.retries = 0
+        self.rejected = 0
+        self.new_connections = 0
+        self.reused_connections = 0
+        self.latency = Histogram()
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        with self._lock:
+            for name, value in counts.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            reuse_base = self.new_connections + self.reused_connections
+            return {
+                'requests': self.requests,
+                'failures': self.failures,
+                'retries': self.retries,
+                'rejected_by_breaker': self.rejected,
+                'new_connections': self.new_connections,
+                'reused_connections': self.reused_connections,
+                'pool_reuse_ratio': round(self.reused_connections / reuse_base, 4) if reuse_base else 0.0,
+                'latency_seconds': self.latency.snapshot(),
+            }
+
+
+class OutboundTransport(httpx.BaseTransport):
+    '''
+        wraps httpx's pooled transport with a circuit breaker per upstream
+        host, bounded retries with exponential backoff for idempotent
+        requests, and per-upstream stats (latency to response headers,
+        new vs reused pool connections)
+    '''
+
+    def __init__(self, outbound, transport):
+        self.outbound = outbound
+        self.transport = transport
+
+    def handle_request(self, request):
+        limit = self.outbound.limit_for(request.url.host)
+        if limit is None:
+            return self._handle(request)
+        # held until the response headers arrive
+        with limit:
+            return self._handle(request)
+
+    def _handle(self, request):
+        upstream = request.url.host
+        stats = self.outbound.stats_for(upstream)
+        breaker = self.outbound.breaker_for(upstream)
+        if not breaker.allow():
+            stats.add(rejected=1)
+            raise CircuitOpenError(f'circuit open for {upstream}', request=request)
+
+        attempts = 1 + (self.outbound.retries if request.method in IDEMPOTENT_METHODS else 0)
+        for attempt in range(attempts):
+            opened = []
+
+            def trace(event_name, info):
+                if event_name == 'connection.connect_tcp.started':
+                    opened.append(True)
+
+            request.extensions = {**request.extensions, 'trace': trace}
+            started = time.monotonic()
+            try:
+                response = self.transport.handle_request(request)
+            except httpx.TransportError:
+                stats.add(requests=1, failures=1, new_connections=1 if opened else 0)
+                if attempt + 1 == attempts:
+                    breaker.record_failure()
+                    raise
+                stats.add(retries=1)
+                self.outbound.backoff(attempt)
+                continue
+
+            stats.latency.observe(time.monotonic() - started)
+            stats.add(requests=1, new_connections=1 if opened else 0, reused_connections=0 if opened else 1)
+
+            if response.status_code in RETRY_STATUSES and attempt + 1 < attempts:
+                response.close()
+                stats.add(retries=1)
+                self.outbound.backoff(attempt)
+                continue
+
+            if response.status_code >= 500:
+                stats.add(failures=1)
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncOutboundTransport(httpx.AsyncBaseTransport):
+    '''
+        OutboundTransport for httpx.AsyncClient: the same breakers, retries
+        and stats (shared per upstream with the sync client), waiting with
+        asyncio.sleep so a backoff never blocks the event loop
+    '''
+
+    def __init__(self, outbound, transport):
+        self.outbound = outbound
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        limit = self.outbound.async_limit_for(request.url.host)
+        if limit is None:
+            return await self._handle(request)
+        async with limit:
+            return await self._handle(request)
+
+    async def _handle(self, request):
+        upstream = request.url.host
+        stats = self.outbound.stats_for(upstream)
+        breaker = self.outbound.breaker_for(upstream)
+        if not breaker.allow():
+            stats.add(rejected=1)
+            raise CircuitOpenError(f'circuit open for {upstream}', request=request)
+
+        attempts = 1 + (self.outbound.retries if request.method in IDEMPOTENT_METHODS else 0)
+        for attempt in range(attempts):
+            opened = []
+
+            async def trace(event_name, info):
+                if event_name == 'connection.connect_tcp.started':
+                    opened.append(True)
+
+            request.extensions = {**request.extensions, 'trace': trace}
+            started = time.monotonic()
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                stats.add(requests=1, failures=1, new_connections=1 if opened else 0)
+                if attempt + 1 == attempts:
+                    breaker.record_failure()
+                    raise
+                stats.add(retries=1)
+                await asyncio.sleep(self.outbound.backoff_delay(attempt))
+                continue
+
+            stats.latency.observe(time.monotonic() - started)
+            stats.add(requests=1, new_connections=1 if opened else 0, reused_connections=0 if opened else 1)
+
+            if response.status_code in RETRY_STATUSES and attempt + 1 < attempts:
+                await response.aclose()
+                stats.add(retries=1)
+                await asyncio.sleep(self.outbound.backoff_delay(attempt))
+                continue
+
+            if response.status_code >= 500:
+                stats.add(failures=1)
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class Outbound:
+    '''
+        the one HTTP client every outbound call goes through (openFDA
+        lookups and the OpenAI SDK), so connections are kept alive and
+        shared instead of paying a fresh TCP+TLS handshake per call
+    '''
+
+    def __init__(self):
+        self.max_connections = 50
+        self.keepalive_connections = 20
+        self.keepalive_expiry = 30.0
+        self.connect_timeout = 3.0
+        self.read_timeout = 30.0
+        self.retries = 2
+        self.backoff_base = 0.2
+        self.backoff_max = 2.0
+        self.breaker_failures = 5
+        self.breaker_reset = 30.0
+        self.concurrency = {}
+        self._client = None
+        self._async_client = None
+        self._breakers = {}
+        self._stats = {}
+        self._semaphores = {}
+        self._async_semaphores = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        config = app.config
+        self.max_connections = config.get('OUTBOUND_MAX_CONNECTIONS', self.max_connections)
+        self.keepalive_connections = config.get('OUTBOUND_KEEPALIVE_CONNECTIONS', self.keepalive_connections)
+        self.connect_timeout = config.get('OUTBOUND_CONNECT_TIMEOUT', self.connect_timeout)
+        self.read_timeout = config.get('OUTBOUND_READ_TIMEOUT', self.read_timeout)
+        self.retries = config.get('OUTBOUND_RETRIES', self.retries)
+        self.backoff_base = config.get('OUTBOUND_BACKOFF', self.backoff_base)
+        self.breaker_failures = config.get('OUTBOUND_BREAKER_FAILURES', self.breaker_failures)
+        self.breaker_reset = config.get('OUTBOUND_BREAKER_RESET', self.breaker_reset)
+        self.concurrency = {}
+        for entry in (config.get('OUTBOUND_CONCURRENCY') or '').split(','):
+            host, _, limit = entry.partition('=')
+            if host.strip() and limit.strip().isdigit():
+                self.concurrency[host.strip()] = int(limit)
+        app.extensions['outbound'] = self
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    transport = OutboundTransport(self, httpx.HTTPTransport(limits=self._limits()))
+                    self._client = httpx.Client(transport=transport, timeout=self._timeout(), follow_redirects=True)
+        return self._client
+
+    @property
+    def async_client(self):
+        """The AsyncClient counterpart for the ASGI entry point; its pool belongs to one event loop"""
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    transport = AsyncOutboundTransport(self, httpx.AsyncHTTPTransport(limits=self._limits()))
+                    self._async_client = httpx.AsyncClient(transport=transport, timeout=self._timeout(), follow_redirects=True)
+        return self._async_client
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+
+    def _timeout(self):
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+    def breaker_for(self, upstream):
+        with self._lock:
+            if upstream not in self._breakers:
+                self._breakers[upstream] = CircuitBreaker(self.breaker_failures, self.breaker_reset)
+            return self._breakers[upstream]
+
+    def limit_for(self, upstream):
+        """Semaphore bounding concurrent requests to `upstream` (OUTBOUND_CONCURRENCY), None if unbounded"""
+        if upstream not in self.concurrency:
+            return None
+        with self._lock:
+            if upstream not in self._semaphores:
+                self._semaphores[upstream] = threading.BoundedSemaphore(self.concurrency[upstream])
+            return self._semaphores[upstream]
+
+    def async_limit_for(self, upstream):
+        # asyncio's own semaphore, a threading one would block the event loop
+        if upstream not in self.concurrency:
+            return None
+        with self._lock:
+            if upstream not in self._async_semaphores:
+                self._async_semaphores[upstream] = asyncio.Semaphore(self.concurrency[upstream])
+            return self._async_semaphores[upstream]
+
+    def stats_for(self, upstream):
+        with self._lock:
+            if upstream not in self._stats:
+                self._stats[upstream] = UpstreamStats()
+            return self._stats[upstream]
+
+    def backoff_delay(self, attempt):
+        # exponential backoff with full jitter
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def backoff(self, attempt):
+        time.sleep(self.backoff_delay(attempt))
+
+    def metrics(self):
+        with self._lock:
+            upstreams = dict(self._stats)
+            breakers = dict(self._breakers)
+        return {
+            upstream: {
+                **stats.snapshot(),
+                'breaker': breakers[upstream].state if upstream in breakers else 'closed',
+                'concurrency_limit': self.concurrency.get(upstream)
+            }
+            for upstream, stats in upstreams.items()
+        }
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+            self._client = None
+
+    async def aclose(self):
+        client, self._async_client = self._async_client, None
+        if client is not None:
+            await client.aclose()
+
+
+# shared outbound client, configured in create_app()
+outbound = Outbound()
@@ -0,0 +1,48 @@
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class PasswordPolicy:
+    '''
+        one werkzeug hash method (algorithm + cost) for every password we
+        store, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000". Hashes made
+        with any other method still verify, and are upgraded the next time
+        their owner logs in with the right password.
+    '''
+
+    def __init__(self, method='scrypt'):
+        self.method = method
+        self._prefix = None
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD') or self.method
+        self._prefix = None
+        app.extensions['password_policy'] = self
+
+    @property
+    def prefix(self):
+        # the method as werkzeug writes it in front of the hash ("pbkdf2" -> "pbkdf2:sha256:1000000")
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', method=self.method).split('$', 1)[0]
+        return self._prefix
+
+    def hash(self, password):
+        return generate_password_hash(password, method=self.method)
+
+    def needs_rehash(self, password_hash):
+        return password_hash.split('$', 1)[0] != self.prefix
+
+    def verify(self, user, password):
+        """
+        Check `password` against `user.password_hash` (one hash computation),
+        replacing the stored hash when it was made with an outdated method.
+        The caller commits the session.
+        """
+        if not password or not check_password_hash(user.password_hash, password):
+            return False
+        if self.needs_rehash(user.password_hash):
+            user.password_hash = self.hash(password)
+        return True
+
+
+# shared password hashing policy, configured in create_app()
+password_policy = PasswordPolicy()
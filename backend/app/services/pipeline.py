@@ -0,0 +1,247 @@
+import asyncio
+import uuid
+from datetime import datetime, timezone
+from flask import current_app
+from app import db
+from app.models.chat import Chat, Conversation
+from app.services.fda import find_label, find_label_async
+from app.services.documents import Document, label_sections
+from app.services.retrieval import retriever
+from app.services.embeddings import embeddings
+from app.services.answer_cache import answer_cache, template_hash
+from app.services.label_cache import normalize_name
+from app.services.llm import INSTRUCTIONS, generate_response, generate_response_async
+from app.services.single_flight import single_flight
+from app.services.tracing import tracer
+
+
+class PromptError(Exception):
+    """A prompt that cannot be answered, with the HTTP status to report it with"""
+
+    def __init__(self, message, status_code=500):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def resolve_label(user_prompt):
+    """The openFDA label a prompt is about, or raises PromptError"""
+    # look the medication up in the offline index / label cache first, then openFDA;
+    # concurrent prompts about the same drug share one lookup
+    label = single_flight.do(f'label:{normalize_name(user_prompt)}', lambda: find_label(user_prompt))
+    if not label:
+        raise PromptError(f"Medication information for '{user_prompt}' not found. Please check the spelling or try the generic name.", 404)
+    return label
+
+
+async def resolve_label_async(user_prompt):
+    label = await single_flight.do_async(f'label:{normalize_name(user_prompt)}', lambda: find_label_async(user_prompt))
+    if not label:
+        raise PromptError(f"Medication information for '{user_prompt}' not found. Please check the spelling or try the generic name.", 404)
+    return label
+
+
+def resolve_prompt_label(user_prompt, history):
+    """
+    (label, medication name) for a prompt. In a conversation about a
+    medication, a prompt is a follow-up ("what about during pregnancy?")
+    answered from that medication's label, unless it names another drug:
+    one whose brand / generic name it contains, found locally or by a
+    whole-name openFDA search.
+    """
+    if history.medication:
+        key = f'named:{normalize_name(user_prompt)}'
+        label = single_flight.do(key, lambda: find_label(user_prompt, named=True))
+        if label:
+            return label, user_prompt
+        return resolve_label(history.medication), history.medication
+    return resolve_label(user_prompt), user_prompt
+
+
+async def resolve_prompt_label_async(user_prompt, history):
+    if history.medication:
+        key = f'named:{normalize_name(user_prompt)}'
+        label = await single_flight.do_async(key, lambda: find_label_async(user_prompt, named=True))
+        if label:
+            return label, user_prompt
+        return await resolve_label_async(history.medication), history.medication
+    return await resolve_label_async(user_prompt), user_prompt
+
+
+def _document(label, question):
+    with tracer.span('clean'):
+        sections = label_sections(label)
+    
+    # Check if we got any meaningful data
+    if sum(len(text) for _, text in sections) < 50:
+        raise PromptError(f"Insufficient medication information found for '{question}'. The FDA database may not have detailed information for this medication.", 404)
+    
+    return Document(
+        label.get('id') or question,
+        sections,
+        metadata={'set_id': label.get('set_id'), 'version': label.get('version')}
+    )
+
+
+def _index_key(document):
+    return f"index:{document.metadata['set_id'] or document.id}|{document.metadata.get('version')}"
+
+
+def _check_context(relevant_chunks):
+    # Validate we have enough context
+    if not relevant_chunks or sum(len(chunk['text'].strip()) for chunk in relevant_chunks) < 50:
+        raise PromptError("Unable to generate response. Insufficient medication data retrieved from FDA.", 500)
+    return relevant_chunks
+
+
+def retrieve_context(label, question):
+    """
+    clean -> chunk -> retrieve for one label, all in memory.
+    Returns the chunks relevant to `question` or raises PromptError.
+    """
+    document = _document(label, question)
+    # chunk and embed this label version once, then pull the sections the question is about
+    single_flight.do(_index_key(document), lambda: retriever.index_document(document))
+    relevant_chunks = retriever.query(question, document.metadata['set_id'] or document.id)
+    return _check_context(relevant_chunks)
+
+
+async def retrieve_context_async(label, question):
+    # cleaning the label's HTML is CPU work, keep it off the event loop
+    document = await asyncio.to_thread(_document, label, question)
+    await single_flight.do_async(_index_key(document), lambda: retriever.index_document_async(document))
+    relevant_chunks = await retriever.query_async(question, document.metadata['set_id'] or document.id)
+    return _check_context(relevant_chunks)
+
+
+def _answer_scope(label):
+    # everything besides the question an answer depends on
+    model = current_app.config.get('OPENAI_CHAT_MODEL', 'gpt-3.5-turbo')
+    return label.get('set_id') or '', label.get('version'), model, template_hash(INSTRUCTIONS)
+
+
+def _question_vector(question):
+    # only the similarity tier needs it; repeated questions hit the embedding cache
+    return embeddings.embed([question])[0] if answer_cache.similarity else None
+
+
+def cached_answer(label, question):
+    """A previously generated answer to this (or a near-identical) question about this label version"""
+    if not answer_cache.enabled:
+        return None
+    with tracer.span('answer_cache'):
+        answer = answer_cache.get(question, *_answer_scope(label), vector=_question_vector(question))
+    if answer is not None:
+        print(f"==== Answer cache hit for '{question}' ====")
+    return answer
+
+
+def remember_answer(label, question, answer):
+    if answer_cache.enabled:
+        answer_cache.put(question, *_answer_scope(label), answer, vector=_question_vector(question), effective_time=label.get('effective_time'))
+
+
+async def _question_vector_async(question):
+    return (await embeddings.embed_async([question]))[0] if answer_cache.similarity else None
+
+
+async def cached_answer_async(label, question):
+    if not answer_cache.enabled:
+        return None
+    with tracer.span('answer_cache'):
+        vector = await _question_vector_async(question)
+        answer = await asyncio.to_thread(answer_cache.get, question, *_answer_scope(label), vector=vector)
+    if answer is not None:
+        print(f"==== Answer cache hit for '{question}' ====")
+    return answer
+
+
+async def remember_answer_async(label, question, answer):
+    if answer_cache.enabled:
+        vector = await _question_vector_async(question)
+        await asyncio.to_thread(answer_cache.put, question, *_answer_scope(label), answer, vector=vector, effective_time=label.get('effective_time'))
+
+
+def _answer_key(label, question):
+    return 'answer:' + answer_cache.key(question, *_answer_scope(label))
+
+
+def answer_question(label, question, history=None):
+    """
+    The generated answer to `question` about `label`; concurrent identical
+    questions share one retrieval + completion
+    """
+    if history:
+        # the answer depends on the conversation too: neither cached nor shared
+        return generate_response(question, retrieve_context(label, question), history).content
+    
+    def generate():
+        # the worker that held the cross-worker lock before us may have just answered it
+        answer = cached_answer(label, question)
+        if answer is not None:
+            return answer
+        answer = generate_response(question, retrieve_context(label, question)).content
+        remember_answer(label, question, answer)
+        return answer
+    
+    return single_flight.do(_answer_key(label, question), generate)
+
+
+async def answer_question_async(label, question, history=None):
+    if history:
+        return (await generate_response_async(question, await retrieve_context_async(label, question), history)).content
+    
+    async def generate():
+        answer = await cached_answer_async(label, question)
+        if answer is not None:
+            return answer
+        answer = (await generate_response_async(question, await retrieve_context_async(label, question))).content
+        await remember_answer_async(label, question, answer)
+        return answer
+    
+    return await single_flight.do_async(_answer_key(label, question), generate)
+
+
+def save_chat(user_id, conversation_id, user_prompt, question, llm_response, medication=None):
+    """
+    Store one question/answer, creating the conversation if needed, and the
+    medication its label came from; returns the conversation id
+    """
+    with tracer.span('save_chat'):
+        return _save_chat(user_id, conversation_id, user_prompt, question, llm_response, medication)
+
+
+def _save_chat(user_id, conversation_id, user_prompt, question, llm_response, medication):
+    # Create or get conversation
+    if not conversation_id:
+        # Create a new conversation with the first prompt as title
+        title = user_prompt[:50] + '...' if len(user_prompt) > 50 else user_prompt
+        conversation = Conversation(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            title=title,
+            medication=medication,
+            created_at=datetime.now(timezone.utc),
+            updated_at=datetime.now(timezone.utc)
+        )
+        db.session.add(conversation)
+        db.session.flush()  # Get the ID without committing
+        conversation_id = conversation.id
+    else:
+        # Update existing conversation's updated_at
+        conversation = Conversation.query.filter_by(id=conversation_id, user_id=user_id).first()
+        if conversation:
+            conversation.updated_at = datetime.now(timezone.utc)
+            if medication:
+                conversation.medication = medication
+    
+    # Save the chat message
+    chat = Chat(
+        user_id=user_id,
+        conversation_id=conversation_id,
+        user_prompt=question,
+        llm_response=llm_response
+    )
+    db.session.add(chat)
+    db.session.commit()
+    return conversation_id
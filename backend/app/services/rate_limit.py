@@ -0,0 +1,269 @@
+import math
+import threading
+import time
+from functools import wraps
+from flask import jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+# "<count>/<period>" units for the *_RATE_LIMIT settings
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(value, setting='rate limit'):
+    """'20/minute' -> (20 token burst, 20/60 tokens refilled per second); None when unset"""
+    if not value:
+        return None
+    count, _, period = value.partition('/')
+    period = period.strip().lower().rstrip('s') or 'second'
+    try:
+        count = float(count)
+        seconds = PERIODS[period] if period in PERIODS else float(period)
+    except ValueError:
+        raise ValueError(f"{setting}={value!r} is not '<count>/<second|minute|hour|day>'") from None
+    # a burst under one request never admits any, a zero period divides by zero
+    if count < 1 or seconds <= 0:
+        raise ValueError(f"{setting}={value!r} must allow at least 1 request per period (leave it empty for no limit)")
+    return count, count / seconds
+
+
+class RateLimited(Exception):
+    """A request turned away, with how many seconds to tell the client to wait (Retry-After)"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.message = message
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class MemoryStore:
+    '''
+        buckets and in-flight counts in this process; with several worker
+        processes each one enforces the limits on its own
+    '''
+
+    # buckets kept before the ones already refilled to full are dropped
+    MAX_KEYS = 10000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._slots = {}
+
+    def take(self, key, capacity, rate, now):
+        """0 when a token was taken, else seconds until the next one"""
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            taken = tokens >= 1
+            if taken:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+
+            if len(self._buckets) > self.MAX_KEYS:
+                for stale in [k for k, (_, _, full_at) in self._buckets.items() if full_at <= now]:
+                    del self._buckets[stale]
+        return 0 if taken else (1 - tokens) / rate
+
+    def acquire(self, key, limit, now, ttl):
+        with self._lock:
+            if self._slots.get(key, 0) >= limit:
+                return None
+            self._slots[key] = self._slots.get(key, 0) + 1
+        return True
+
+    def release(self, key, handle):
+        with self._lock:
+            count = self._slots.get(key, 0) - 1
+            if count > 0:
+                self._slots[key] = count
+            else:
+                self._slots.pop(key, None)
+
+
+class DatabaseStore:
+    '''
+        buckets and in-flight slots in the app database (rate_limit_buckets /
+        rate_limit_slots, SQLite or Postgres), shared by every worker process
+        and host. Each check is a single conditional UPDATE or a primary key
+        INSERT, so concurrent workers never need to lock rows.
+    '''
+
+    def __init__(self, app):
+        self.app = app
+        self._engine = None
+
+    @property
+    def engine(self):
+        # slots are also released after the request context is gone (end of a streamed response)
+        if self._engine is None:
+            from app import db
+            with self.app.app_context():
+                self._engine = db.engine
+        return self._engine
+
+    def take(self, key, capacity, rate, now):
+        from app.models.rate_limit import RateLimitBucket
+
+        table = RateLimitBucket.__table__
+        refilled = table.c.tokens + (now - table.c.updated_at) * rate
+        refilled = case((refilled > capacity, capacity), else_=refilled)
+
+        for _ in range(2):
+            with self.engine.begin() as conn:
+                taken = conn.execute(
+                    update(table).where(table.c.key == key, refilled >= 1).values(tokens=refilled - 1, updated_at=now)
+                ).rowcount
+                if taken:
+                    return 0
+                row = conn.execute(select(table.c.tokens, table.c.updated_at).where(table.c.key == key)).first()
+            if row is not None:
+                tokens = min(capacity, row.tokens + (now - row.updated_at) * rate)
+                return (1 - tokens) / rate
+
+            # first request for this key
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(table).values(key=key, tokens=capacity - 1, updated_at=now))
+                return 0
+            except IntegrityError:
+                # another worker created the bucket first, take from it
+                continue
+        return 1 / rate
+
+    def acquire(self, key, limit, now, ttl):
+        from app.models.rate_limit import RateLimitSlot
+
+        table = RateLimitSlot.__table__
+        with self.engine.begin() as conn:
+            # slots of workers that died mid-request
+            conn.execute(delete(table).where(table.c.key == key, table.c.acquired_at < now - ttl))
+        for slot in range(limit):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(table).values(key=key, slot=slot, acquired_at=now))
+            except IntegrityError:
+                continue
+            # `limit` shrinks while background jobs run, so slots above it may still be held
+            with self.engine.begin() as conn:
+                held = conn.execute(select(func.count()).select_from(table).where(table.c.key == key)).scalar()
+            if held <= limit:
+                return slot, now
+            self.release(key, (slot, now))
+            return None
+        return None
+
+    def release(self, key, handle):
+        from app.models.rate_limit import RateLimitSlot
+
+        table = RateLimitSlot.__table__
+        slot, acquired_at = handle
+        with self.engine.begin() as conn:
+            # unless it was reclaimed (and maybe handed to another request) in the meantime
+            conn.execute(delete(table).where(table.c.key == key, table.c.slot == slot, table.c.acquired_at == acquired_at))
+
+
+# RATE_LIMIT_BACKEND values
+STORES = {
+    'memory': lambda app: MemoryStore(),
+    'database': lambda app: DatabaseStore(app),
+}
+
+
+class RateLimiter:
+    '''
+        per-key token buckets (PROMPT_RATE_LIMIT, LOGIN_RATE_LIMIT) and a
+        cap on requests in flight per key (PROMPT_CONCURRENCY_PER_USER).
+        Keys are the JWT identity for prompts and the client IP for login.
+        Work a request leaves running after it is answered (background
+        prompt jobs) is counted by the `in_progress` callables and takes
+        up part of the cap until it is done.
+    '''
+
+    def __init__(self):
+        self.limits = {}
+        self.concurrency = {}
+        self.in_progress = {}
+        self.slot_ttl = 600
+        self.store = MemoryStore()
+        self.rejected = {}
+
+    def init_app(self, app):
+        self.limits = {
+            'prompt': parse_limit(app.config.get('PROMPT_RATE_LIMIT'), 'PROMPT_RATE_LIMIT'),
+            'login': parse_limit(app.config.get('LOGIN_RATE_LIMIT'), 'LOGIN_RATE_LIMIT'),
+        }
+        self.concurrency = {'prompt': app.config.get('PROMPT_CONCURRENCY_PER_USER', 0)}
+        self.slot_ttl = app.config.get('RATE_LIMIT_SLOT_TTL', self.slot_ttl)
+        self.store = STORES[app.config.get('RATE_LIMIT_BACKEND', 'memory')](app)
+        self.rejected = {}
+        app.extensions['rate_limiter'] = self
+
+    def _reject(self, name, message, retry_after):
+        self.rejected[name] = self.rejected.get(name, 0) + 1
+        raise RateLimited(message, retry_after)
+
+    def admit(self, name, key):
+        """
+        Take one of `key`'s in-flight slots for limit `name`, then a token
+        from its bucket. Returns a callable that gives the slot back when
+        the request is done, raises RateLimited otherwise.
+        """
+        now = time.time()
+        release = lambda: None
+        cap = self.concurrency.get(name)
+        if cap:
+            # a request turned away for being one too many does not use up a token
+            busy = self.in_progress[name](key) if name in self.in_progress else 0
+            handle = self.store.acquire(f'{name}:{key}', cap - busy, now, self.slot_ttl) if busy < cap else None
+            if handle is None:
+                self._reject(name, 'You already have requests in progress. Please wait for them to finish.', 1)
+            release = lambda: self.store.release(f'{name}:{key}', handle)
+
+        limit = self.limits.get(name)
+        if limit:
+            wait = self.store.take(f'{name}:{key}', *limit, now)
+            if wait:
+                release()
+                self._reject(name, 'Too many requests. Please wait a moment and try again.', wait)
+        return release
+
+
+def rate_limited(name, by='user'):
+    """
+    Flask view decorator: answers 429 with Retry-After instead of calling the
+    view once the caller runs out of `name` tokens or in-flight slots.
+    `by` is 'user' (the JWT identity, so it goes under @jwt_required) or 'ip'.
+    A streamed response holds its slot until the stream is closed.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method == 'OPTIONS':
+                return view(*args, **kwargs)
+
+            key = (get_jwt_identity() if by == 'user' else None) or request.remote_addr
+            try:
+                release = rate_limiter.admit(name, key)
+            except RateLimited as e:
+                response = jsonify({'error': e.message})
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response, 429
+
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(release)
+            else:
+                release()
+            return response
+        return wrapper
+    return decorator
+
+
+# shared rate limiter, configured in create_app()
+rate_limiter = RateLimiter()
@@ -0,0 +1,252 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+from array import array
+from contextlib import contextmanager
+from app.services.documents import CHUNKER_VERSION, OTHER_TOPIC, SECTION_TOPICS, in_topic, topics_for_question
+from app.services.embeddings import embeddings
+from app.services.tracing import tracer
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python scoring is fine for a few hundred chunks per label
+    np = None
+
+
+def _cosine_scores(query, vectors):
+    if np is not None:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        q = np.asarray(query, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(q) or 1.0)
+        norms[norms == 0] = 1.0
+        return (matrix @ q / norms).tolist()
+
+    q_norm = math.sqrt(sum(x * x for x in query)) or 1.0
+    scores = []
+    for vector in vectors:
+        norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+        scores.append(sum(a * b for a, b in zip(query, vector)) / (norm * q_norm))
+    return scores
+
+
+class LocalVectorIndex:
+    '''
+        chunk embeddings persisted in SQLite and scored exactly (cosine)
+        within one label's `set_id`, which keeps the candidate set small
+        enough that an approximate index buys nothing
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @contextmanager
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            if not self._ready:
+                conn.executescript('''
+                    CREATE TABLE IF NOT EXISTS chunks (
+                        id TEXT PRIMARY KEY,
+                        set_id TEXT NOT NULL,
+                        version TEXT,
+                        position INTEGER NOT NULL,
+                        section TEXT,
+                        text TEXT NOT NULL,
+                        vector BLOB NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS ix_chunks_set_id ON chunks (set_id, version);
+                ''')
+                # stores created before chunks were tagged with their label section
+                if 'section' not in [column[1] for column in conn.execute('PRAGMA table_info(chunks)')]:
+                    conn.execute('ALTER TABLE chunks ADD COLUMN section TEXT')
+                self._ready = True
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def has(self, set_id, version):
+        with self._connect() as conn:
+            row = conn.execute('SELECT 1 FROM chunks WHERE set_id = ? AND version IS ? LIMIT 1', (set_id, version)).fetchone()
+        return row is not None
+
+    def replace(self, set_id, version, chunks):
+        # a new label version replaces every chunk of the previous one
+        with self._lock, self._connect() as conn:
+            conn.execute('DELETE FROM chunks WHERE set_id = ?', (set_id,))
+            conn.executemany(
+                'INSERT OR REPLACE INTO chunks (id, set_id, version, position, section, text, vector) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (chunk['id'], set_id, version, position, chunk.get('section'), chunk['text'], array('f', chunk['embedding']).tobytes())
+                    for position, chunk in enumerate(chunks)
+                ]
+            )
+
+    def query(self, set_id, vector, n_results, sections=None):
+        """[{"section", "text", "score"}] best first, optionally only from `sections`"""
+        sql = 'SELECT section, text, vector FROM chunks WHERE set_id = ?'
+        params = [set_id]
+        if sections:
+            sql += f' AND section IN ({",".join("?" * len(sections))})'
+            params.extend(sections)
+
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        if not rows:
+            return []
+
+        scores = _cosine_scores(vector, [array('f', blob) for _, _, blob in rows])
+        ranked = sorted(zip(scores, rows), key=lambda item: item[0], reverse=True)[:n_results]
+        return [{'section': section, 'text': text, 'score': score} for score, (section, text, _) in ranked]
+
+
+class ChromaVectorIndex:
+    '''
+        the same interface on top of a persistent Chroma collection
+        (needs `pip install chromadb`)
+    '''
+
+    def __init__(self, path, collection_name='document_qa_collection'):
+        import chromadb
+
+        self.collection = chromadb.PersistentClient(path=path).get_or_create_collection(
+            name=collection_name, metadata={'hnsw:space': 'cosine'}
+        )
+
+    def has(self, set_id, version):
+        found = self.collection.get(where={'$and': [{'set_id': set_id}, {'version': version or ''}]}, limit=1)
+        return bool(found['ids'])
+
+    def replace(self, set_id, version, chunks):
+        self.collection.delete(where={'set_id': set_id})
+        if chunks:
+            self.collection.add(
+                ids=[chunk['id'] for chunk in chunks],
+                documents=[chunk['text'] for chunk in chunks],
+                embeddings=[chunk['embedding'] for chunk in chunks],
+                metadatas=[{'set_id': set_id, 'version': version or '', 'section': chunk.get('section') or ''} for chunk in chunks]
+            )
+
+    def query(self, set_id, vector, n_results, sections=None):
+        where = {'set_id': set_id}
+        if sections:
+            where = {'$and': [where, {'section': {'$in': list(sections)}}]}
+        found = self.collection.query(query_embeddings=[vector], n_results=n_results, where=where)
+        if not found['documents']:
+            return []
+        return [
+            {'section': metadata.get('section'), 'text': text, 'score': 1.0 - distance}
+            for text, metadata, distance in zip(found['documents'][0], found['metadatas'][0], found['distances'][0])
+        ]
+
+
+def wanted_chunks(document, chunk_size=800, chunk_overlap=150):
+    """A document's chunks to embed: every section, those no prompt topic lists fall under OTHER_TOPIC"""
+    return document.chunks(chunk_size, chunk_overlap)
+
+
+class Retriever:
+    '''
+        index each label version's section chunks once, then answer a
+        question with the closest chunk of each label section it is about,
+        topped up with the next closest chunks from those sections
+    '''
+
+    def __init__(self):
+        self.index = None
+        self.chunk_size = 800
+        self.chunk_overlap = 150
+
+    def init_app(self, app):
+        backend = app.config.get('VECTOR_STORE', 'local')
+        if backend == 'chroma':
+            self.index = ChromaVectorIndex(app.config.get('VECTOR_STORE_PATH') or './chroma_persistent_storage')
+        else:
+            self.index = LocalVectorIndex(app.config.get('VECTOR_STORE_PATH') or os.path.join(app.instance_path, 'vectors.sqlite3'))
+        app.extensions['retriever'] = self
+
+    def version_key(self, version):
+        # vectors from another embedding model are not comparable, re-index on a model change too
+        return f"{version}|{embeddings.embedder.model}|{CHUNKER_VERSION}"
+
+    def _unindexed_chunks(self, document):
+        # (set_id, version key, chunks to embed), chunks None when this label version is already indexed
+        set_id = document.metadata.get('set_id') or document.id
+        version = self.version_key(document.metadata.get('version'))
+        if self.index.has(set_id, version):
+            return set_id, version, None
+
+        print("==== Splitting docs into chunks ====")
+        with tracer.span('chunk'):
+            return set_id, version, wanted_chunks(document, self.chunk_size, self.chunk_overlap)
+
+    def store(self, set_id, version, chunks):
+        """Embed already split chunks and make them the indexed chunks of this label version"""
+        embeddings.embed_chunks(chunks)
+        self.index.replace(set_id, version, chunks)
+
+    def index_document(self, document):
+        """Chunk and embed `document` unless this label version is already indexed"""
+        with tracer.span('index'):
+            set_id, version, chunks = self._unindexed_chunks(document)
+            if chunks is None:
+                return False
+            self.store(set_id, version, chunks)
+            return True
+
+    async def index_document_async(self, document):
+        """index_document() with the embedding calls on the event loop, chunking and storage in a worker thread"""
+        with tracer.span('index'):
+            set_id, version, chunks = await asyncio.to_thread(self._unindexed_chunks, document)
+            if chunks is None:
+                return False
+            await embeddings.embed_chunks_async(chunks)
+            await asyncio.to_thread(self.index.replace, set_id, version, chunks)
+            return True
+
+    def _select(self, question, vector, set_id, n_results):
+        topics = topics_for_question(question)
+        if n_results is None:
+            n_results = min(len(topics) + 2, len(SECTION_TOPICS))
+        # every candidate from the wanted sections, scored once; OTHER_TOPIC has no fixed list to filter on
+        if OTHER_TOPIC in topics:
+            candidates = self.index.query(set_id, vector, 1000)
+            candidates = [chunk for chunk in candidates if any(in_topic(chunk['section'], topic) for topic in topics)]
+        else:
+            sections = [section for topic in topics for section in SECTION_TOPICS[topic]]
+            candidates = self.index.query(set_id, vector, 1000, sections=sections)
+
+        chosen = []
+        for topic in topics:
+            best = next((chunk for chunk in candidates if in_topic(chunk['section'], topic)), None)
+            if best and best not in chosen:
+                chosen.append(best)
+        for chunk in candidates:
+            if len(chosen) >= n_results:
+                break
+            if chunk not in chosen:
+                chosen.append(chunk)
+
+        chosen = sorted(chosen[:n_results], key=lambda chunk: chunk['score'], reverse=True)
+        print(f"==== Returning {len(chosen)} relevant chunks from {len({chunk['section'] for chunk in chosen})} sections ====")
+        return chosen
+
+    def query(self, question, set_id, n_results=None):
+        """Up to `n_results` [{"section", "text", "score"}] chunks of label `set_id` for `question`"""
+        with tracer.span('retrieve'):
+            vector = embeddings.embed([question])[0]
+            return self._select(question, vector, set_id, n_results)
+
+    async def query_async(self, question, set_id, n_results=None):
+        with tracer.span('retrieve'):
+            vector = (await embeddings.embed_async([question]))[0]
+            return await asyncio.to_thread(self._select, question, vector, set_id, n_results)
+
+
+# shared retriever, configured in create_app()
+retriever = Retriever()
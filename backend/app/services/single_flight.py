@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # no flock on Windows, coalescing stays per process there
+    fcntl = None
+
+
+class FileLockStore:
+    '''
+        cross-worker exclusion with one flock()ed file per key in a shared
+        directory; the OS drops a dead worker's locks with its file handles
+    '''
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def acquire(self, key, timeout=None):
+        """The locked file for `key`, or None when another worker still holds it after `timeout` seconds"""
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        file = open(os.path.join(self.directory, f'{name}.lock'), 'a')
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return file
+            except BlockingIOError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    file.close()
+                    return None
+                time.sleep(self.POLL_INTERVAL)
+            except BaseException:
+                file.close()
+                raise
+
+    def release(self, file):
+        try:
+            fcntl.flock(file, fcntl.LOCK_UN)
+        finally:
+            file.close()
+
+    @contextmanager
+    def hold(self, key, timeout=None):
+        """Yields whether the lock was taken; held or not, the block runs"""
+        file = self.acquire(key, timeout)
+        try:
+            yield file is not None
+        finally:
+            if file is not None:
+                self.release(file)
+
+
+# what a leader that was cancelled hands its followers: the next in line runs the call
+_LEADER_CANCELLED = object()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    '''
+        concurrent calls with the same key share one execution: the first
+        caller (leader) runs it, callers arriving while it runs wait and get
+        its result, or its exception. A follower that has waited
+        PIPELINE_DEADLINE runs the function itself, and when an async leader
+        is cancelled (its client went away) a follower takes over.
+
+        with a lock store configured the leader also holds the key's lock
+        across workers, so a worker that was waiting on it runs the
+        function after the other worker is done; the functions passed in
+        re-check their cache first and find that worker's result there.
+        A worker waits PIPELINE_DEADLINE for the lock too, then runs the
+        function without it.
+    '''
+
+    def __init__(self):
+        self.enabled = True
+        self.locks = None
+        self.wait_timeout = 90.0
+        self.leaders = 0
+        self.followers = 0
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SINGLE_FLIGHT', True)
+        directory = app.config.get('SINGLE_FLIGHT_LOCK_DIR')
+        if directory and fcntl is None:
+            print("==== SINGLE_FLIGHT_LOCK_DIR needs fcntl, coalescing within this process only ====")
+        self.locks = FileLockStore(directory) if directory and fcntl is not None else None
+        self.wait_timeout = app.config.get('PIPELINE_DEADLINE', self.wait_timeout)
+        app.extensions['single_flight'] = self
+
+    @contextmanager
+    def _exclusive(self, key):
+        if self.locks is None:
+            yield
+        else:
+            with self.locks.hold(key, self.wait_timeout) as held:
+                if not held:
+                    print(f"==== Gave up waiting {self.wait_timeout}s on another worker's '{key}' ====")
+                yield
+
+    def do(self, key, fn):
+        """fn(), or the result of the call already running for `key`"""
+        if not self.enabled:
+            return fn()
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            print(f"==== Joining the in-flight '{key}' ====")
+            if not call.done.wait(self.wait_timeout):
+                print(f"==== Gave up waiting {self.wait_timeout}s on the in-flight '{key}' ====")
+                return fn()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            with self._exclusive(key):
+                call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key, fn):
+        """do() for coroutines: await fn(), or the result of the one already running for `key`"""
+        if not self.enabled:
+            return await fn()
+
+        future = self._async_calls.get(key)
+        if future is not None:
+            self.followers += 1
+            print(f"==== Joining the in-flight '{key}' ====")
+            try:
+                # a follower giving up must not cancel the leader's result for the others
+                result = await asyncio.wait_for(asyncio.shield(future), self.wait_timeout)
+            except asyncio.TimeoutError:
+                print(f"==== Gave up waiting {self.wait_timeout}s on the in-flight '{key}' ====")
+                return await fn()
+            if result is _LEADER_CANCELLED:
+                return await self.do_async(key, fn)
+            return result
+
+        future = self._async_calls[key] = asyncio.get_running_loop().create_future()
+        self.leaders += 1
+        try:
+            file = await self._acquire(key) if self.locks else None
+            if self.locks and file is None:
+                print(f"==== Gave up waiting {self.wait_timeout}s on another worker's '{key}' ====")
+            try:
+                result = await fn()
+            finally:
+                if file is not None:
+                    self.locks.release(file)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # retrieved, so a leader without followers does not log "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._async_calls[key]
+
+    async def _acquire(self, key):
+        # the lock file for `key` (None past the deadline) once acquire() returns in a worker
+        # thread; cancelled meanwhile, a lock the thread still gets is released right away
+        acquiring = asyncio.ensure_future(asyncio.to_thread(self.locks.acquire, key, self.wait_timeout))
+        try:
+            return await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            acquiring.add_done_callback(self._release_acquired)
+            raise
+
+    def _release_acquired(self, acquiring):
+        if not acquiring.cancelled() and acquiring.exception() is None and acquiring.result() is not None:
+            self.locks.release(acquiring.result())
+
+    def metrics(self):
+        return {
+            'leaders': self.leaders,
+            'followers': self.followers,
+            'in_flight': len(self._calls) + len(self._async_calls),
+            'cross_worker': self.locks is not None,
+        }
+
+
+# shared request coalescing, configured in create_app()
+single_flight = SingleFlight()
@@ -0,0 +1,180 @@
+import contextvars
+import threading
+import time
+from contextlib import nullcontext
+from app.services.metrics import Histogram
+
+# the timings of the request being handled; copied into asyncio tasks and
+# asyncio.to_thread() workers, so their spans land on the same request
+_current = contextvars.ContextVar('trace', default=None)
+
+# returned by span() while tracing is off: no clock reads, no allocation
+_NOOP = nullcontext()
+
+
+class Trace:
+    '''
+        one request's time per stage, summed over repeated spans
+        (e.g. every DB query of the request adds to "db")
+    '''
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            total, count = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, count + 1)
+
+    def server_timing(self):
+        """Server-Timing header value: each stage's total milliseconds, then the time so far"""
+        with self._lock:
+            stages = list(self.stages.items())
+        parts = [
+            f'{stage};dur={total * 1000:.1f}' + (f';desc="{count}x"' if count > 1 else '')
+            for stage, (total, count) in stages
+        ]
+        parts.append(f'total;dur={(time.perf_counter() - self.started) * 1000:.1f}')
+        return ', '.join(parts)
+
+
+class _Span:
+    __slots__ = ('tracer', 'stage', 'started')
+
+    def __init__(self, tracer, stage):
+        self.tracer = tracer
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class Tracer:
+    '''
+        latency per pipeline stage (openfda, clean, embed, retrieve, llm,
+        db, ...) as histograms for GET /metrics and, for the request being
+        handled, a Server-Timing header. Spans nest: "index" includes the
+        "embed" calls made while indexing. Off unless TRACING is set, in
+        which case span() is a shared no-op and no DB hooks are installed.
+    '''
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('TRACING', False)
+        app.extensions['tracer'] = self
+        if not self.enabled:
+            return
+
+        app.before_request(self._begin_request)
+        app.after_request(self._end_request)
+        app.teardown_request(lambda exc: self.end())
+        _listen_for_queries()
+
+    def _histogram(self, table, key):
+        histogram = table.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = table.setdefault(key, Histogram())
+        return histogram
+
+    def span(self, stage):
+        """with tracer.span('embed'): ... times the block as one `stage` span"""
+        return _Span(self, stage) if self.enabled else _NOOP
+
+    def record(self, stage, seconds):
+        self._histogram(self.stages, stage).observe(seconds)
+        trace = _current.get()
+        if trace is not None:
+            trace.add(stage, seconds)
+
+    def begin(self):
+        """Start timing a request in the current context; returns the token end() takes"""
+        if not self.enabled:
+            return None
+        return _current.set(Trace())
+
+    def end(self, token=None, route=None):
+        """Stop timing the current request, recording its total under `route`"""
+        trace = _current.get()
+        if trace is None:
+            return
+        if route:
+            self._histogram(self.requests, route).observe(time.perf_counter() - trace.started)
+        if token is not None:
+            _current.reset(token)
+        else:
+            _current.set(None)
+
+    def server_timing(self):
+        """Server-Timing value for the current request, None when not tracing"""
+        trace = _current.get()
+        return trace.server_timing() if trace is not None else None
+
+    def _begin_request(self):
+        self.begin()
+
+    def _end_request(self, response):
+        from flask import request
+
+        timing = self.server_timing()
+        if timing:
+            response.headers['Server-Timing'] = timing
+            # streamed bodies are still being produced; only their headers are timed
+            self.end(route=f'{request.method} {request.url_rule.rule if request.url_rule else "unmatched"}')
+        return response
+
+    def prometheus(self):
+        """Every histogram in the Prometheus text exposition format"""
+        lines = []
+        for name, label, table, help_text in (
+            ('mediwise_stage_seconds', 'stage', self.stages, 'Time spent in each prompt pipeline stage (spans nest).'),
+            ('mediwise_request_seconds', 'route', self.requests, 'Time spent handling each request, per route.'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            with self._lock:
+                items = sorted(table.items())
+            for key, histogram in items:
+                snapshot = histogram.snapshot()
+                key = key.replace('\\', '\\\\').replace('"', '\\"')
+                for bound, count in snapshot['buckets'].items():
+                    lines.append(f'{name}_bucket{{{label}="{key}",le="{bound}"}} {count}')
+                lines.append(f'{name}_sum{{{label}="{key}"}} {snapshot["sum"]}')
+                lines.append(f'{name}_count{{{label}="{key}"}} {snapshot["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _listen_for_queries():
+    # every SQL statement on any SQLAlchemy engine is a "db" span
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    if event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['trace_query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('trace_query_started', None)
+    if started is not None:
+        tracer.record('db', time.perf_counter() - started)
+
+
+# shared tracer, configured in create_app()
+tracer = Tracer()
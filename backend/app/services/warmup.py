@@ -0,0 +1,111 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from flask import current_app
+from app.services.documents import Document, label_sections
+from app.services.fda import find_label
+from app.services.label_cache import label_cache
+from app.services.retrieval import retriever, wanted_chunks
+
+
+def prepare_label(label, chunk_size=800, chunk_overlap=150):
+    """
+    Clean and chunk one label record: (set_id, version, chunks), chunks
+    None when the label has too little text to answer from. Runs in a
+    worker process, so it only takes and returns plain data.
+    """
+    sections = label_sections(label)
+    set_id = label.get('set_id') or label.get('id')
+    # the same floor the /prompt pipeline applies before indexing a label
+    if sum(len(text) for _, text in sections) < 50:
+        return set_id, label.get('version'), None
+
+    document = Document(label.get('id') or set_id, sections, metadata={'set_id': set_id, 'version': label.get('version')})
+    return set_id, label.get('version'), wanted_chunks(document, chunk_size, chunk_overlap)
+
+
+def resolve_names(names, threads=8):
+    """{name: label or None} looked up like /prompt does (offline index, label cache, then openFDA)"""
+    app = current_app._get_current_object()
+
+    def lookup(name):
+        with app.app_context():
+            return find_label(name)
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return dict(zip(names, pool.map(lookup, names)))
+
+
+def _newest(labels):
+    # one record per set_id, the most recently revised
+    newest = {}
+    for label in labels:
+        set_id = label.get('set_id') or label.get('id')
+        if not set_id:
+            continue
+        if set_id not in newest or (label.get('effective_time') or '') > (newest[set_id].get('effective_time') or ''):
+            newest[set_id] = label
+    return list(newest.values())
+
+
+def warm_labels(labels, processes=None):
+    '''
+        precompute what the first prompt about each label would otherwise pay
+        for: HTML cleaning and chunking run in a pool of `processes` worker
+        processes (CPU bound), while this process embeds and stores each
+        label's chunks as soon as its worker hands them back.
+        Label versions already in the vector store are skipped.
+        Returns {"indexed", "skipped", "empty", "chunks", "seconds"}.
+    '''
+    started = time.monotonic()
+    stats = {'indexed': 0, 'skipped': 0, 'empty': 0, 'chunks': 0}
+
+    todo = []
+    for label in _newest(labels):
+        set_id = label.get('set_id') or label.get('id')
+        if retriever.index.has(set_id, retriever.version_key(label.get('version'))):
+            stats['skipped'] += 1
+        else:
+            todo.append(label)
+
+    def store(set_id, version, chunks):
+        if chunks is None:
+            stats['empty'] += 1
+            return
+        retriever.store(set_id, retriever.version_key(version), chunks)
+        stats['indexed'] += 1
+        stats['chunks'] += len(chunks)
+
+    processes = processes or os.cpu_count() or 1
+    if processes == 1 or len(todo) < 2:
+        for label in todo:
+            store(*prepare_label(label, retriever.chunk_size, retriever.chunk_overlap))
+    else:
+        print(f"==== Warming {len(todo)} labels with {processes} worker processes ====")
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [pool.submit(prepare_label, label, retriever.chunk_size, retriever.chunk_overlap) for label in todo]
+            for future in as_completed(futures):
+                store(*future.result())
+
+    stats['seconds'] = round(time.monotonic() - started, 2)
+    return stats
+
+
+def warm(names=(), labels=(), processes=None):
+    """
+    Warm the local stores for drug `names` and/or label records: records
+    are added to the label cache (looked up names are cached by find_label)
+    so the name lookup stays local, and every label is chunked and embedded
+    into the vector store. Returns warm_labels() stats plus "missing", the
+    names no label was found for.
+    """
+    labels = list(labels)
+    label_cache.seed(labels)
+
+    found = resolve_names(list(names)) if names else {}
+    missing = [name for name, label in found.items() if not label]
+    labels.extend(label for label in found.values() if label)
+
+    stats = warm_labels(labels, processes=processes)
+    stats['missing'] = missing
+    return stats
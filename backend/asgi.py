@@ -0,0 +1,13 @@
+# import create_app function from the app module
+from app import create_app
+from app.asgi import create_asgi_app
+
+# create Flask app
+app = create_app()
+
+'''
+    ASGI entry point: POST /prompt runs async, every other route is the Flask app
+        uvicorn asgi:application --port 8000
+    main.py stays the WSGI entry point (flask run / gunicorn main:app)
+'''
+application = create_asgi_app(app)
@@ -0,0 +1,109 @@
+'''
+    GET /conversations: query count and latency vs. conversation count
+
+    compares the old per-conversation preview lookup (N+1 queries) with the
+    current single-query listing, on a throwaway SQLite database.
+
+    usage (from backend/):  python -m benchmarks.conversation_listing [--sizes 10,100,500,1000]
+'''
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# point the app at a throwaway database before config.py is imported
+_db_dir = tempfile.mkdtemp(prefix='mediwise-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ.setdefault('JWT_SECRET_KEY', 'bench')
+os.environ.setdefault('OPENAI_API_KEY', 'sk-bench')  # the app builds its OpenAI client at import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.chat import Chat, Conversation
+from app.models.user import User
+
+
+def legacy_listing(user_id):
+    # the listing as it was: one preview query per conversation
+    conversations = Conversation.query.filter_by(user_id=user_id).order_by(Conversation.updated_at.desc()).all()
+    result = []
+    for conv in conversations:
+        first_message = Chat.query.filter_by(conversation_id=conv.id).first()
+        preview = first_message.user_prompt[:50] + '...' if first_message and len(first_message.user_prompt) > 50 else (first_message.user_prompt if first_message else '')
+        result.append({'id': conv.id, 'title': conv.title, 'preview': preview})
+    return result
+
+
+def seed(user_id, count, chats_per_conversation=4):
+    now = datetime.now(timezone.utc)
+    conversations, chats = [], []
+    for i in range(count):
+        conversation = Conversation(user_id=user_id, title=f'Conversation {i}', created_at=now, updated_at=now - timedelta(minutes=i))
+        conversations.append(conversation)
+    db.session.add_all(conversations)
+    db.session.flush()
+    for conversation in conversations:
+        for j in range(chats_per_conversation):
+            chats.append(Chat(
+                user_id=user_id, conversation_id=conversation.id,
+                user_prompt=f'what are the side effects of drug number {j} when taken with food?',
+                llm_response='...', created_at=now + timedelta(seconds=j)
+            ))
+    db.session.add_all(chats)
+    db.session.commit()
+
+
+def measure(fn, repeat):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        timings = []
+        for _ in range(repeat):
+            db.session.expire_all()
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return len(statements) // repeat, statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10,100,500,1000', help='conversation counts to test')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    client = app.test_client()
+    print(f"{'conversations':>13} | {'legacy queries':>14} {'legacy ms':>10} | {'listing queries':>15} {'listing ms':>10}")
+
+    with app.app_context():
+        for size in [int(size) for size in args.sizes.split(',')]:
+            db.drop_all()
+            db.create_all()
+            user = User(first_name='Bench', last_name='User', email='bench@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.commit()
+            seed(user.id, size)
+
+            client.set_cookie('access_token_cookie', create_access_token(identity=str(user.id)))
+
+            def listing():
+                response = client.get('/conversations')
+                assert response.status_code == 200 and len(response.json['conversations']) == size
+
+            legacy_queries, legacy_ms = measure(lambda: legacy_listing(str(user.id)), args.repeat)
+            queries, ms = measure(listing, args.repeat)
+            print(f"{size:>13} | {legacy_queries:>14} {legacy_ms:>10.1f} | {queries:>15} {ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+'''
+    shared pieces of the benchmarks: stub openFDA / OpenAI servers, the app
+    served from a subprocess (sync WSGI or async ASGI) against a throwaway
+    SQLite database, and a closed-loop load generator that reports
+    throughput and latency percentiles.
+
+    python -m benchmarks.harness --serve-sync PORT [--threads 8]   (started by the runners)
+'''
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, unquote, urlparse
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+
+def load_labels(path=None):
+    """Label records of app/data.json (or `path`) to seed the openFDA stub with"""
+    with open(path or os.path.join(BACKEND, 'app', 'data.json'), 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    return data.get('results', []) if isinstance(data, dict) else data
+
+
+def _label_for(labels, search):
+    # the first label whose brand or generic name appears in the openFDA search term
+    search = unquote(search).lower()
+    for label in labels:
+        openfda = label.get('openfda') or {}
+        names = openfda.get('brand_name', []) + openfda.get('generic_name', [])
+        if any(name.lower() in search for name in names):
+            return label
+    return None
+
+
+def stub_handler(labels, fda_latency=0.2, embedding_latency=0.05, chat_latency=1.0, answer='Medication: stub answer', requests=None):
+    """
+    One handler for both stubs: GET is openFDA (labels found by brand /
+    generic name, 404 otherwise), POST is OpenAI embeddings and chat
+    completions with a canned `answer` (streamed word by word for
+    stream=True); each sleeps its latency first. When given a list,
+    `requests` collects the (method, path, JSON body) of every request.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def reply(self, data, status=200):
+            body = json.dumps(data).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def stream(self, events):
+            # server-sent events in HTTP/1.1 chunks, ended by OpenAI's [DONE]
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for event in [json.dumps(event) for event in events] + ['[DONE]']:
+                data = f'data: {event}\n\n'.encode()
+                self.wfile.write(f'{len(data):x}\r\n'.encode() + data + b'\r\n')
+                self.wfile.flush()
+            self.wfile.write(b'0\r\n\r\n')
+
+        def do_GET(self):
+            if requests is not None:
+                requests.append(('GET', self.path, None))
+            time.sleep(fda_latency)
+            search = parse_qs(urlparse(self.path).query).get('search', [''])[0]
+            label = _label_for(labels, search)
+            if label:
+                self.reply({'results': [label]})
+            else:
+                self.reply({'error': {'code': 'NOT_FOUND', 'message': 'No matches found!'}}, 404)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            if requests is not None:
+                requests.append(('POST', self.path, body))
+            if self.path.endswith('/embeddings'):
+                time.sleep(embedding_latency)
+                texts = [body['input']] if isinstance(body['input'], str) else body['input']
+                self.reply({
+                    'object': 'list', 'model': body['model'],
+                    'data': [{'object': 'embedding', 'index': i, 'embedding': [len(text) % 7 + 1.0, 1.0, 0.5]} for i, text in enumerate(texts)],
+                    'usage': {'prompt_tokens': 1, 'total_tokens': 1},
+                })
+            elif body.get('stream'):
+                time.sleep(chat_latency)
+                chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': 0, 'model': body['model']}
+                self.stream(
+                    [{**chunk, 'choices': [{'index': 0, 'delta': {'role': 'assistant', 'content': word}, 'finish_reason': None}]}
+                     for word in re.findall(r'\S+\s*', answer)]
+                    + [{**chunk, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}]
+                )
+            else:
+                time.sleep(chat_latency)
+                self.reply({
+                    'id': 'stub', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': answer}}],
+                    'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2},
+                })
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(handler):
+    """Serve `handler` on a free local port in a daemon thread; returns the port"""
+    server = StubServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def app_env(workdir, fda_port, openai_port, **overrides):
+    """Environment for an app process on a throwaway SQLite database, talking to the stubs"""
+    env = {
+        **os.environ,
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'SECRET_KEY': 'bench', 'JWT_SECRET_KEY': 'bench', 'OPENAI_API_KEY': 'sk-bench',
+        'OPENAI_BASE_URL': f'http://127.0.0.1:{openai_port}/v1',
+        'FDA_LABEL_URL': f'http://127.0.0.1:{fda_port}/drug/label.json',
+        'LABEL_LOOKUP_MODE': 'network',
+        'LABEL_CACHE_PATH': os.path.join(workdir, 'labels.sqlite3'),
+        'LABEL_INDEX_PATH': os.path.join(workdir, 'label_index.sqlite3'),
+        'EMBEDDING_CACHE_PATH': os.path.join(workdir, 'embeddings.sqlite3'),
+        'VECTOR_STORE_PATH': os.path.join(workdir, 'vectors.sqlite3'),
+        'ANSWER_CACHE_PATH': os.path.join(workdir, 'answers.sqlite3'),
+        # one benchmark user / address sends everything
+        'PROMPT_RATE_LIMIT': '', 'LOGIN_RATE_LIMIT': '', 'PROMPT_CONCURRENCY_PER_USER': '0',
+        'PYTHONPATH': BACKEND,
+    }
+    env.update({key: str(value) for key, value in overrides.items()})
+    return env
+
+
+def serve_sync(port, threads):
+    """main.py's Flask app on a WSGI server with a fixed pool of request threads"""
+    from werkzeug.serving import BaseWSGIServer
+    from main import app
+
+    class PooledWSGIServer(BaseWSGIServer):
+        pool = ThreadPoolExecutor(max_workers=threads)
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self.process_request_thread, request, client_address)
+
+        def process_request_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer('127.0.0.1', port, app).serve_forever()
+
+
+def wait_for_port(port, timeout=30):
+    ends_at = time.monotonic() + timeout
+    while time.monotonic() < ends_at:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def app_server(mode, env, threads=8):
+    """
+    The app in a subprocess, yielding its port: 'sync' is the pooled WSGI
+    server with `threads` request threads (like gunicorn -w 4 --threads 2),
+    'async' is uvicorn serving asgi.py
+    """
+    port = free_port()
+    commands = {
+        'sync': [sys.executable, '-m', 'benchmarks.harness', '--serve-sync', str(port), '--threads', str(threads)],
+        'async': [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', str(port), '--log-level', 'warning', '--backlog', '4096'],
+    }
+    server = subprocess.Popen(commands[mode], cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        yield port
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'seconds': round(elapsed, 2),
+        'req_per_sec': round(count / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1) if count else None,
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1) if count else None,
+        'max_ms': round(latencies[-1] * 1000, 1) if count else None,
+    }
+
+
+async def fire(port, send, concurrency, total=None, seconds=None, cookies=None, expected=200):
+    """
+    Closed-loop load: `concurrency` clients each send one request after the
+    other, `total` requests in all or until `seconds` have passed.
+    `send(client, base_url, i)` makes request number i and returns the response.
+    """
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    base_url = f'http://127.0.0.1:{port}'
+    latencies, errors = [], 0
+    counter = iter(range(total)) if total is not None else itertools.count()
+
+    async with httpx.AsyncClient(limits=limits, timeout=300, cookies=cookies) as client:
+        started = time.perf_counter()
+        ends_at = started + seconds if seconds else None
+
+        async def worker():
+            nonlocal errors
+            for i in counter:
+                if ends_at and time.perf_counter() >= ends_at:
+                    return
+                sent = time.perf_counter()
+                try:
+                    response = await send(client, base_url, i)
+                    if response.status_code != expected:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - sent)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return summarize(latencies, errors, elapsed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--serve-sync', type=int, required=True)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+    serve_sync(args.serve_sync, args.threads)
@@ -0,0 +1,94 @@
+'''
+    label HTML -> text cleaning: CPU time per label over app/data.json
+
+    compares the old cleaning (every field through BeautifulSoup's
+    html.parser) with the current one (plain fields passed through, markup
+    through the streaming TextExtractor), and the memoized label_sections()
+    for a label version seen before. Also checks both give the same text.
+
+    usage (from backend/):  python -m benchmarks.label_cleaning [--rounds 5] [--data app/data.json]
+'''
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+from app.services import documents
+from app.services.documents import METADATA_FIELDS, _clean_sections, label_sections, section_name
+
+
+def legacy_sections(label):
+    # label_sections() as it was: BeautifulSoup on every field
+    sections = {}
+    for field, values in label.items():
+        if field in METADATA_FIELDS or not isinstance(values, list):
+            continue
+        text = BeautifulSoup(" ".join(value for value in values if isinstance(value, str)), "html.parser").get_text(separator="\n", strip=True)
+        if text:
+            name = section_name(field)
+            sections[name] = f'{sections[name]}\n{text}' if name in sections else text
+
+    route = (label.get('openfda') or {}).get('route')
+    if route:
+        sections['route'] = 'Route of administration: ' + ', '.join(route)
+    return list(sections.items())
+
+
+def timed(fn, labels, rounds):
+    # median seconds per label over `rounds` passes
+    samples = []
+    for _ in range(rounds):
+        for label in labels:
+            started = time.perf_counter()
+            fn(label)
+            samples.append(time.perf_counter() - started)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--data', default=os.path.join('app', 'data.json'))
+    args = parser.parse_args()
+
+    with open(args.data, 'r', encoding='utf-8') as file:
+        labels = json.load(file)
+    if isinstance(labels, dict):
+        labels = labels.get('results', [])
+
+    size = sum(len(json.dumps(label)) for label in labels) / len(labels)
+    marked = sum(
+        1 for label in labels for field, values in label.items()
+        if field not in METADATA_FIELDS and isinstance(values, list)
+        and any('<' in value or '&' in value for value in values if isinstance(value, str))
+    )
+    fields = sum(1 for label in labels for field, values in label.items() if field not in METADATA_FIELDS and isinstance(values, list))
+    print(f'{len(labels)} labels, {size / 1024:.0f} KB each on average, {marked} of {fields} text fields carry markup')
+
+    mismatched = [label.get('id') for label in labels if legacy_sections(label) != _clean_sections(label)]
+    print(f'same text as BeautifulSoup: {"yes" if not mismatched else "NO, differs for " + ", ".join(mismatched)}')
+
+    # every label version seen once, so label_sections() answers from its memo
+    documents._sections_cache.clear()
+    for label in labels:
+        label_sections(label)
+
+    print(f'{"cleaning":<28}{"median ms/label":>18}{"max ms":>10}')
+    baseline = None
+    for name, fn in (
+        ('BeautifulSoup (old)', legacy_sections),
+        ('TextExtractor', _clean_sections),
+        ('label_sections, memoized', label_sections),
+    ):
+        median, worst = timed(fn, labels, args.rounds)
+        baseline = baseline or median
+        print(f'{name:<28}{median * 1000:>18.2f}{worst * 1000:>10.2f}   x{baseline / median:.0f}')
+
+
+if __name__ == '__main__':
+    main()
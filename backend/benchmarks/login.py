@@ -0,0 +1,81 @@
+'''
+    POST /auth/login: logins/sec on one core per password hash method
+
+    for each method, signs a user up through /auth/signup and times
+    successful and wrong-password logins through the Flask test client in
+    this single process (one core), on a throwaway SQLite database. Also
+    checks that a hash made with another method is upgraded on login.
+
+    usage (from backend/):  python -m benchmarks.login [--methods scrypt,pbkdf2:sha256:600000] [--seconds 3]
+'''
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# point the app at a throwaway database before config.py is imported
+_db_dir = tempfile.mkdtemp(prefix='mediwise-bench-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault('SECRET_KEY', 'bench')
+os.environ.setdefault('JWT_SECRET_KEY', 'bench')
+os.environ.setdefault('OPENAI_API_KEY', 'sk-bench')  # the app builds its OpenAI client at import time
+# every login comes from the same address
+os.environ['LOGIN_RATE_LIMIT'] = ''
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.security import generate_password_hash
+from app import create_app, db
+from app.models.user import User
+from app.services.passwords import password_policy
+
+
+def rate(client, email, password, seconds, expected):
+    # logins/sec for `seconds` of back-to-back requests
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        response = client.post('/auth/login', json={'email': email, 'password': password})
+        assert response.status_code == expected, response.get_json()
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--methods', default='scrypt,scrypt:16384:8:1,pbkdf2:sha256:600000,pbkdf2:sha256:100000')
+    parser.add_argument('--seconds', type=float, default=3)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+
+    print(f'{"method":<26}{"ok logins/s":>14}{"bad password/s":>16}')
+    for i, method in enumerate(args.methods.split(',')):
+        password_policy.method, password_policy._prefix = method, None
+        email = f'bench{i}@example.com'
+        response = client.post('/auth/signup', json={'first_name': 'Bench', 'last_name': 'User', 'email': email, 'password': 'correct horse'})
+        assert response.status_code == 201, response.get_json()
+
+        ok = rate(client, email, 'correct horse', args.seconds, 200)
+        bad = rate(client, email, 'wrong horse', args.seconds, 401)
+        print(f'{method:<26}{ok:>14.1f}{bad:>16.1f}')
+
+    # a duplicate signup is answered by the unique index, not a lookup first
+    response = client.post('/auth/signup', json={'first_name': 'Bench', 'last_name': 'User', 'email': 'bench0@example.com', 'password': 'x'})
+    print(f'duplicate signup -> {response.status_code}')
+
+    # an account hashed with an older method is moved to the current one by its next login
+    with app.app_context():
+        db.session.add(User(first_name='Old', last_name='Hash', email='old@example.com',
+                            password_hash=generate_password_hash('correct horse', method='pbkdf2:sha256:1000')))
+        db.session.commit()
+    client.post('/auth/login', json={'email': 'old@example.com', 'password': 'correct horse'})
+    with app.app_context():
+        stored = User.query.filter_by(email='old@example.com').first().password_hash
+    print(f'rehashed on login: pbkdf2:sha256:1000 -> {stored.split("$", 1)[0]}')
+
+
+if __name__ == '__main__':
+    main()
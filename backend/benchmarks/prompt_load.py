@@ -0,0 +1,78 @@
+'''
+    /prompt load test: sync (WSGI, main.py) vs async (ASGI, asgi.py)
+
+    starts stub openFDA and OpenAI servers with fixed latencies, serves the
+    app both ways in a subprocess each and fires `--requests` prompts with
+    `--concurrency` in flight, reporting throughput and latency.
+
+    the sync server gives each request a thread from a pool of
+    `--sync-threads` (like gunicorn -w 4 --threads 2 with the default 8), so
+    at most that many prompts wait on upstreams at once; the async server
+    holds every in-flight prompt as a coroutine.
+
+    usage (from backend/):  python -m benchmarks.prompt_load [--concurrency 200 --requests 400]
+'''
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import app_env, app_server, fire, load_labels, start_stub, stub_handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--sync-threads', type=int, default=8)
+    parser.add_argument('--fda-latency', type=float, default=0.2)
+    parser.add_argument('--embedding-latency', type=float, default=0.05)
+    parser.add_argument('--chat-latency', type=float, default=3.0)
+    parser.add_argument('--modes', default='sync,async')
+    args = parser.parse_args()
+
+    handler = stub_handler(load_labels()[:1], args.fda_latency, args.embedding_latency, args.chat_latency)
+    fda_port, openai_port = start_stub(handler), start_stub(handler)
+
+    workdir = tempfile.mkdtemp(prefix='mediwise-load-')
+    env = app_env(
+        workdir, fda_port, openai_port,
+        # every prompt reaches the chat model
+        ANSWER_CACHE_MAX_ENTRIES=0,
+        # let the outbound pool hold as many upstream calls as there are prompts in flight
+        OUTBOUND_MAX_CONNECTIONS=args.concurrency * 2,
+        OUTBOUND_KEEPALIVE_CONNECTIONS=args.concurrency * 2,
+        DB_POOL_SIZE=10, DB_MAX_OVERFLOW=20,
+    )
+    os.environ.update(env)
+
+    from app import create_app, db
+    from app.models.user import User
+    from flask_jwt_extended import create_access_token
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(first_name='Load', last_name='Test', email='load@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.id), expires_delta=False)
+
+    def prompt(client, base_url, i):
+        return client.post(f'{base_url}/prompt', json={'user_prompt': 'Xarelto'})
+
+    cookies = {'access_token_cookie': token}
+    print(f"==== {args.requests} prompts, {args.concurrency} in flight, chat {args.chat_latency}s / openFDA {args.fda_latency}s / embeddings {args.embedding_latency}s ====")
+    for mode in args.modes.split(','):
+        with app_server(mode, env, threads=args.sync_threads) as port:
+            # first prompt fetches and indexes the label, keep it out of the numbers
+            asyncio.run(fire(port, prompt, 1, total=1, cookies=cookies))
+            result = asyncio.run(fire(port, prompt, args.concurrency, total=args.requests, cookies=cookies))
+        print(f"{mode:>6}: " + ', '.join(f'{key}={value}' for key, value in result.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+'''
+    query-plan check for the conversation routes
+
+    seeds a large fixture, calls every conversation route through the test
+    client, EXPLAINs each SELECT/UPDATE/DELETE they ran and exits non-zero
+    if any of them scans a whole table instead of using an index.
+
+    usage (from backend/):
+        python -m benchmarks.query_plans                                   # throwaway SQLite
+        python -m benchmarks.query_plans --database-url postgresql://...   # a scratch Postgres (tables are dropped!)
+'''
+import argparse
+import os
+import re
+import sys
+import tempfile
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# SQLite: "SCAN chats [USING ... INDEX]" reads every row (or index entry), "SEARCH chats USING INDEX ..." does not
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?(?!CONSTANT ROW)(\w+)')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+def seed(users=200, conversations_per_user=50, chats_per_conversation=6):
+    """Bulk-insert the fixture; returns the id of a user in the middle of it"""
+    from sqlalchemy import text
+    from app import db
+    from app.models.chat import Chat, Conversation
+    from app.models.user import User
+
+    now = datetime.now(timezone.utc)
+    users = [
+        {'id': i + 1, 'first_name': 'Plan', 'last_name': str(i), 'email': f'plan{i}@example.com', 'password_hash': 'x', 'created_at': now}
+        for i in range(users)
+    ]
+    conversations, chats = [], []
+    for user in users:
+        for c in range(conversations_per_user):
+            conversation_id = str(uuid.uuid4())
+            conversations.append({
+                'id': conversation_id, 'user_id': user['id'], 'title': f'Conversation {c}',
+                'created_at': now, 'updated_at': now - timedelta(minutes=c)
+            })
+            for m in range(chats_per_conversation):
+                chats.append({
+                    'conversation_id': conversation_id, 'user_id': user['id'],
+                    'user_prompt': f'question {m} about drug {c}', 'llm_response': 'answer',
+                    'created_at': now + timedelta(seconds=m)
+                })
+    db.session.execute(User.__table__.insert(), users)
+    db.session.execute(Conversation.__table__.insert(), conversations)
+    db.session.execute(Chat.__table__.insert(), chats)
+    db.session.commit()
+    # planner statistics, so Postgres has a reason to prefer the indexes
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
+    return users[len(users) // 2]['id']
+
+
+def explain(statement, parameters):
+    """(plan lines, tables read in full) of one statement"""
+    from app import db
+
+    dialect = db.engine.dialect.name
+    with db.engine.connect() as conn:
+        if dialect == 'sqlite':
+            rows = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+            plan = [row[-1] for row in rows]
+            scans = [m.group(1) for m in map(SQLITE_SCAN.match, plan) if m]
+        else:
+            rows = conn.exec_driver_sql('EXPLAIN ' + statement, parameters).fetchall()
+            plan = [row[0] for row in rows]
+            scans = [m.group(1) for line in plan for m in [POSTGRES_SCAN.search(line)] if m]
+    return plan, scans
+
+
+def route_plans(client):
+    """
+    Call every conversation route as the seeded user logged in on `client`
+    and EXPLAIN what each ran: [(method, path, status, [(statement, plan, scans)])]
+    """
+    from sqlalchemy import event
+    from app import db
+
+    listing = client.get('/conversations?limit=10').json
+    conversation_id = listing['conversations'][0]['id']
+    history = client.get(f'/conversations/{conversation_id}?limit=2').json
+    routes = [
+        ('GET', '/conversations?limit=10', None),
+        ('GET', f"/conversations?limit=10&cursor={listing['next_cursor']}", None),
+        ('GET', f'/conversations/{conversation_id}?limit=2', None),
+        ('GET', f"/conversations/{conversation_id}?limit=2&cursor={history['next_cursor']}", None),
+        ('PUT', f'/conversations/{conversation_id}/title', {'title': 'Renamed'}),
+        ('DELETE', f'/conversations/{conversation_id}', None),
+    ]
+
+    results = []
+    for method, path, body in routes:
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'UPDATE', 'DELETE'):
+                statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            response = client.open(path, method=method, json=body)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        results.append((method, path, response.status_code, [(statement, *explain(statement, parameters)) for statement, parameters in statements]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='scratch database to run against (default: a temp SQLite file)')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--conversations', type=int, default=50, help='conversations per user')
+    parser.add_argument('--chats', type=int, default=6, help='chats per conversation')
+    args = parser.parse_args()
+
+    # point the app at the scratch database before config.py is imported
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='mediwise-plans-'), 'plans.db')}"
+    os.environ.setdefault('SECRET_KEY', 'plans')
+    os.environ.setdefault('JWT_SECRET_KEY', 'plans')
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-plans')  # the app builds its OpenAI client at import time
+
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db
+
+    app = create_app()
+    client = app.test_client()
+    failures = 0
+
+    with app.app_context():
+        dialect = db.engine.dialect.name
+        db.drop_all()
+        db.create_all()
+        user_id = seed(args.users, args.conversations, args.chats)
+        client.set_cookie('access_token_cookie', create_access_token(identity=str(user_id)))
+
+        for method, path, status, statements in route_plans(client):
+            print(f"==== {method} {path} -> {status}, {len(statements)} queries ====")
+            if status >= 400:
+                failures += 1
+            for statement, plan, scans in statements:
+                if scans:
+                    failures += 1
+                    print(f"  FULL SCAN of {', '.join(scans)}:\n    " + ' '.join(statement.split()))
+                    print('    ' + '\n    '.join(plan))
+
+    print(f"==== {'OK' if not failures else f'{failures} problem(s)'} ({dialect}) ====")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+'''
+    benchmark suite: throughput and p50 / p99 latency of the main routes at
+    several concurrency levels, stored per commit so regressions show up
+
+    boots create_app() on a throwaway SQLite database built by the Alembic
+    migrations (as `flask db upgrade` would) and seeded with one user and
+    `--conversations` conversations, with openFDA and OpenAI replaced by
+    local stubs (labels from app/data.json, canned completions, latencies
+    below), and serves it from a subprocess (--server async = uvicorn
+    asgi.py, sync = pooled WSGI threads). Each scenario runs closed-loop for
+    `--seconds` at every `--concurrency` level:
+
+        prompt         POST /prompt, every prompt through the whole pipeline
+                       (answer cache and request coalescing off)
+        conversations  GET /conversations
+        conversation   GET /conversations/<id>, cycling over the seeded ones
+        login          POST /auth/login (PASSWORD_HASH_METHOD, or --hash-method)
+
+    results go to benchmarks/results/<time>-<commit>.json and are compared
+    with the newest earlier run of the same server mode; req/s drops or p99
+    rises beyond --threshold, and new errors, are flagged (and fail the run
+    with --fail-on-regression).
+
+    usage (from backend/):  python -m benchmarks.suite [--scenarios prompt,login --concurrency 1,8,32 --seconds 5]
+'''
+import argparse
+import asyncio
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import BACKEND, app_env, app_server, fire, load_labels, start_stub, stub_handler
+
+SCENARIOS = ('prompt', 'conversations', 'conversation', 'login')
+RESULTS_DIR = os.path.join(BACKEND, 'benchmarks', 'results')
+PASSWORD = 'correct horse battery staple'
+
+
+def git_commit():
+    # (short commit, whether the tree has uncommitted changes)
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BACKEND, capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def seed(conversations, chats_per_conversation):
+    """The benchmark user, its access token and conversation ids"""
+    from flask_jwt_extended import create_access_token
+    from flask_migrate import upgrade
+    from app import create_app, db
+    from app.models.chat import Chat, Conversation
+    from app.models.user import User
+    from app.services.passwords import password_policy
+
+    app = create_app()
+    with app.app_context():
+        # the schema the migrations build, as deployed
+        upgrade(directory=os.path.join(BACKEND, 'migrations'))
+        user = User(first_name='Bench', last_name='User', email='bench@example.com', password_hash=password_policy.hash(PASSWORD))
+        db.session.add(user)
+        db.session.flush()
+
+        now = datetime.now(timezone.utc)
+        rows = [Conversation(user_id=user.id, title=f'Conversation {i}', created_at=now, updated_at=now - timedelta(minutes=i)) for i in range(conversations)]
+        db.session.add_all(rows)
+        db.session.flush()
+        db.session.add_all([
+            Chat(user_id=user.id, conversation_id=conversation.id, user_prompt=f'what are the side effects of xarelto, question {j}?',
+                 llm_response='Medication: Xarelto\n\nSide Effects: ...', created_at=now + timedelta(seconds=j))
+            for conversation in rows for j in range(chats_per_conversation)
+        ])
+        db.session.commit()
+        return create_access_token(identity=str(user.id), expires_delta=False), [conversation.id for conversation in rows]
+
+
+def requests_for(scenario, conversation_ids):
+    # scenario -> (send(client, base_url, i), expected status)
+    return {
+        'prompt': (lambda client, base_url, i: client.post(f'{base_url}/prompt', json={'user_prompt': 'Xarelto'}), 200),
+        'conversations': (lambda client, base_url, i: client.get(f'{base_url}/conversations'), 200),
+        'conversation': (lambda client, base_url, i: client.get(f'{base_url}/conversations/{conversation_ids[i % len(conversation_ids)]}'), 200),
+        'login': (lambda client, base_url, i: client.post(f'{base_url}/auth/login', json={'email': 'bench@example.com', 'password': PASSWORD}), 200),
+    }[scenario]
+
+
+def previous_run(results_dir, server, exclude):
+    runs = sorted(glob.glob(os.path.join(results_dir, '*.json')))
+    for path in reversed(runs):
+        if os.path.abspath(path) == os.path.abspath(exclude):
+            continue
+        with open(path, 'r', encoding='utf-8') as file:
+            run = json.load(file)
+        if run.get('settings', {}).get('server') == server:
+            return path, run
+    return None, None
+
+
+def compare(run, previous, threshold):
+    """Print each result against the previous run's; returns the regressed (scenario, concurrency) pairs"""
+    before = {(r['scenario'], r['concurrency']): r for r in previous['results']}
+    regressions = []
+    print(f'{"scenario":<15}{"conc":>6}{"req/s":>10}{"was":>10}{"p99 ms":>10}{"was":>10}')
+    for result in run['results']:
+        key = (result['scenario'], result['concurrency'])
+        old = before.get(key)
+        if not old:
+            continue
+        flags = []
+        if old['req_per_sec'] and result['req_per_sec'] < old['req_per_sec'] * (1 - threshold):
+            flags.append('req/s')
+        if old['p99_ms'] and result['p99_ms'] and result['p99_ms'] > old['p99_ms'] * (1 + threshold):
+            flags.append('p99')
+        if result['errors'] > old['errors']:
+            flags.append('errors')
+        if flags:
+            regressions.append(key)
+        print(f'{key[0]:<15}{key[1]:>6}{result["req_per_sec"]:>10}{old["req_per_sec"]:>10}{result["p99_ms"]!s:>10}{old["p99_ms"]!s:>10}'
+              + (f'   REGRESSION ({", ".join(flags)})' if flags else ''))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--concurrency', default='1,8,32', help='comma separated levels')
+    parser.add_argument('--seconds', type=float, default=5, help='per scenario and level')
+    parser.add_argument('--server', choices=('async', 'sync'), default='async')
+    parser.add_argument('--sync-threads', type=int, default=8)
+    parser.add_argument('--conversations', type=int, default=200)
+    parser.add_argument('--chats', type=int, default=10, help='per conversation')
+    parser.add_argument('--fda-latency', type=float, default=0.2)
+    parser.add_argument('--embedding-latency', type=float, default=0.05)
+    parser.add_argument('--chat-latency', type=float, default=1.0)
+    parser.add_argument('--hash-method', help='PASSWORD_HASH_METHOD for the login scenario (default: the app\'s)')
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--threshold', type=float, default=0.15, help='relative change flagged as a regression')
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    scenarios = [scenario for scenario in args.scenarios.split(',') if scenario]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    handler = stub_handler(load_labels(), args.fda_latency, args.embedding_latency, args.chat_latency)
+    fda_port, openai_port = start_stub(handler), start_stub(handler)
+
+    overrides = {
+        # measure the pipeline, not the answer cache / coalescing of identical prompts
+        'ANSWER_CACHE_MAX_ENTRIES': 0, 'SINGLE_FLIGHT': 'false',
+        'OUTBOUND_MAX_CONNECTIONS': max(levels) * 2, 'OUTBOUND_KEEPALIVE_CONNECTIONS': max(levels) * 2,
+        'DB_POOL_SIZE': 10, 'DB_MAX_OVERFLOW': 20,
+    }
+    if args.hash_method:
+        overrides['PASSWORD_HASH_METHOD'] = args.hash_method
+    env = app_env(tempfile.mkdtemp(prefix='mediwise-suite-'), fda_port, openai_port, **overrides)
+    os.environ.update(env)
+
+    token, conversation_ids = seed(args.conversations, args.chats)
+    cookies = {'access_token_cookie': token}
+
+    commit, dirty = git_commit()
+    run = {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'settings': {key: value for key, value in vars(args).items() if key not in ('results_dir', 'threshold', 'fail_on_regression')},
+        'results': [],
+    }
+
+    print(f"==== {args.server} server at {commit}{' (uncommitted changes)' if dirty else ''}, {args.seconds}s per level ====")
+    with app_server(args.server, env, threads=args.sync_threads) as port:
+        # first prompt fetches and indexes the label, keep it out of the numbers
+        asyncio.run(fire(port, requests_for('prompt', conversation_ids)[0], 1, total=1, cookies=cookies))
+
+        for scenario in scenarios:
+            send, expected = requests_for(scenario, conversation_ids)
+            for level in levels:
+                result = asyncio.run(fire(port, send, level, seconds=args.seconds, cookies=cookies, expected=expected))
+                run['results'].append({'scenario': scenario, 'concurrency': level, **result})
+                print(f"{scenario:<15}c={level:<4} " + ', '.join(f'{key}={value}' for key, value in result.items()))
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir, f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{commit}.json")
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(run, file, indent=2)
+    print(f'==== saved {os.path.relpath(path)} ====')
+
+    previous_path, previous = previous_run(args.results_dir, args.server, exclude=path)
+    if not previous:
+        return
+    print(f"==== compared with {os.path.basename(previous_path)} ({previous['commit']}) ====")
+    regressions = compare(run, previous, args.threshold)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
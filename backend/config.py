@@ -11,5 +11,132 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL')
     # stop tracking every changes in objects
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # database connection pool, per worker process (see app/services/db_pool.py)
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    # extra connections allowed past DB_POOL_SIZE under load, closed when returned
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    # whole seconds a request waits for a free connection before failing
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    # seconds before a connection is replaced, keep it under the server/proxy idle timeout
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    # test each connection on checkout so ones the server dropped are replaced, not failed on
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    # milliseconds a single statement may run on Postgres (0 = no limit)
+    DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
     # Get Secret Key
     SECRET_KEY=os.getenv('SECRET_KEY')
+    # werkzeug hash method (algorithm and cost) for stored passwords, e.g. "scrypt:32768:8:1"
+    # or "pbkdf2:sha256:600000"; hashes made with another method are upgraded at the next login
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')
+    
+    # local cache of openFDA drug labels (defaults to instance/label_cache.sqlite3)
+    LABEL_CACHE_PATH = os.getenv('LABEL_CACHE_PATH')
+    # seconds before a cached label is fetched again from openFDA
+    LABEL_CACHE_TTL = int(os.getenv('LABEL_CACHE_TTL', 7 * 24 * 3600))
+    # least recently used labels are evicted past this many entries
+    LABEL_CACHE_MAX_ENTRIES = int(os.getenv('LABEL_CACHE_MAX_ENTRIES', 500))
+    
+    # offline label index built with `flask labels ingest` (defaults to instance/label_index.sqlite3)
+    LABEL_INDEX_PATH = os.getenv('LABEL_INDEX_PATH')
+    # where /prompt looks labels up:
+    #   local-first - offline index, then the label cache, then openFDA
+    #   offline     - offline index only, never calls openFDA
+    #   network     - label cache, then openFDA
+    LABEL_LOOKUP_MODE = os.getenv('LABEL_LOOKUP_MODE', 'local-first')
+    
+    # openFDA drug label endpoint (point it at a stub server for local testing)
+    FDA_LABEL_URL = os.getenv('FDA_LABEL_URL', 'https://api.fda.gov/drug/label.json')
+    # seconds allowed for a single openFDA request
+    FDA_REQUEST_TIMEOUT = float(os.getenv('FDA_REQUEST_TIMEOUT', 5))
+    # seconds allowed for the whole lookup, all search strategies included
+    FDA_LOOKUP_DEADLINE = float(os.getenv('FDA_LOOKUP_DEADLINE', 8))
+    
+    # shared outbound HTTP client (openFDA and OpenAI)
+    OUTBOUND_MAX_CONNECTIONS = int(os.getenv('OUTBOUND_MAX_CONNECTIONS', 50))
+    OUTBOUND_KEEPALIVE_CONNECTIONS = int(os.getenv('OUTBOUND_KEEPALIVE_CONNECTIONS', 20))
+    OUTBOUND_CONNECT_TIMEOUT = float(os.getenv('OUTBOUND_CONNECT_TIMEOUT', 3))
+    OUTBOUND_READ_TIMEOUT = float(os.getenv('OUTBOUND_READ_TIMEOUT', 30))
+    # retries for idempotent requests, base seconds of the exponential backoff
+    OUTBOUND_RETRIES = int(os.getenv('OUTBOUND_RETRIES', 2))
+    OUTBOUND_BACKOFF = float(os.getenv('OUTBOUND_BACKOFF', 0.2))
+    # consecutive failures that open an upstream's circuit, seconds before it is retried
+    OUTBOUND_BREAKER_FAILURES = int(os.getenv('OUTBOUND_BREAKER_FAILURES', 5))
+    OUTBOUND_BREAKER_RESET = float(os.getenv('OUTBOUND_BREAKER_RESET', 30))
+    # most requests in flight to one upstream host at a time, e.g. "api.openai.com=8,api.fda.gov=4";
+    # the openFDA host's limit is also how many sync label lookups run at once (4 threads each),
+    # without one OUTBOUND_MAX_CONNECTIONS / 4
+    OUTBOUND_CONCURRENCY = os.getenv('OUTBOUND_CONCURRENCY', '')
+    # seconds allowed for an OpenAI call
+    OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 60))
+    
+    # chunk embeddings, cached by hash of model + chunk text (defaults to instance/embeddings.sqlite3)
+    EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'text-embedding-3-small')
+    EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 256))
+    EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH')
+    # openai (EMBEDDING_MODEL via the API) or hashing (deterministic, local, no network)
+    EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'openai')
+    
+    # where chunk vectors live: local (SQLite, defaults to instance/vectors.sqlite3)
+    # or chroma (needs chromadb, defaults to ./chroma_persistent_storage)
+    VECTOR_STORE = os.getenv('VECTOR_STORE', 'local')
+    VECTOR_STORE_PATH = os.getenv('VECTOR_STORE_PATH')
+    
+    # chat completion model used for answers
+    OPENAI_CHAT_MODEL = os.getenv('OPENAI_CHAT_MODEL', 'gpt-3.5-turbo')
+    # system prompt token budget (instructions + label context + question);
+    # PROMPT_TOKEN_BUDGETS="gpt-4o-mini=6000,gpt-3.5-turbo=2500" sets it per model
+    PROMPT_TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 2500))
+    PROMPT_TOKEN_BUDGETS = os.getenv('PROMPT_TOKEN_BUDGETS', '')
+    
+    # conversation history sent with a prompt: the latest turns verbatim (at most this many,
+    # and tokens), older ones folded into a rolling summary of at most SUMMARY_TOKENS
+    CONVERSATION_HISTORY_TURNS = int(os.getenv('CONVERSATION_HISTORY_TURNS', 4))
+    CONVERSATION_HISTORY_TOKENS = int(os.getenv('CONVERSATION_HISTORY_TOKENS', 1000))
+    CONVERSATION_SUMMARY_TOKENS = int(os.getenv('CONVERSATION_SUMMARY_TOKENS', 250))
+    
+    # generated answers, reused for the same question about the same label version
+    # (defaults to instance/answers.sqlite3; ANSWER_CACHE_MAX_ENTRIES=0 disables it)
+    ANSWER_CACHE_PATH = os.getenv('ANSWER_CACHE_PATH')
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 2000))
+    # also reuse answers to near-duplicate questions at or above this cosine
+    # similarity of question embeddings, e.g. 0.95 (0 = exact matches only)
+    ANSWER_CACHE_SIMILARITY = float(os.getenv('ANSWER_CACHE_SIMILARITY', 0))
+
+    # concurrent prompts for the same drug / question share one openFDA lookup,
+    # label indexing and answer generation; with SINGLE_FLIGHT_LOCK_DIR set
+    # (a directory every worker can reach) that holds across worker processes too
+    SINGLE_FLIGHT = os.getenv('SINGLE_FLIGHT', 'true').lower() in ('1', 'true', 'yes')
+    SINGLE_FLIGHT_LOCK_DIR = os.getenv('SINGLE_FLIGHT_LOCK_DIR')
+    # seconds one prompt's pipeline (label lookup, indexing, answer) is given; a
+    # prompt waiting on another's shared work that long runs it itself instead
+    PIPELINE_DEADLINE = float(os.getenv('PIPELINE_DEADLINE', 90))
+
+    # background prompt jobs ({"background": true} on /prompt, polled at /jobs/<id>)
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1))
+    # seconds a running job may go without finishing before it is queued again, and how often
+    JOB_STALE_AFTER = int(os.getenv('JOB_STALE_AFTER', 600))
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    # /jobs/<id>/events: seconds between keepalive comments (a write is what notices a client
+    # that went away), and the longest one stream stays open before the client has to reconnect
+    JOB_EVENTS_PING_INTERVAL = float(os.getenv('JOB_EVENTS_PING_INTERVAL', 15))
+    JOB_EVENTS_MAX_SECONDS = float(os.getenv('JOB_EVENTS_MAX_SECONDS', 600))
+
+    # token bucket limits, "<requests>/<second|minute|hour|day>" with a burst of the whole
+    # count (empty = unlimited): /prompt per logged-in user, /auth/login per client IP
+    PROMPT_RATE_LIMIT = os.getenv('PROMPT_RATE_LIMIT', '20/minute')
+    LOGIN_RATE_LIMIT = os.getenv('LOGIN_RATE_LIMIT', '10/minute')
+    # prompts one user may have in flight at once, queued or running background jobs included (0 = no cap)
+    PROMPT_CONCURRENCY_PER_USER = int(os.getenv('PROMPT_CONCURRENCY_PER_USER', 2))
+    # memory (each worker process counts on its own) or database (rate_limit_* tables,
+    # shared by every worker); seconds before a slot left by a dead worker is reclaimed
+    RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_SLOT_TTL = int(os.getenv('RATE_LIMIT_SLOT_TTL', 600))
+
+    # per-stage timings of each request: histograms at GET /metrics (Prometheus text
+    # format) and a Server-Timing response header; off = no timing code runs at all
+    TRACING = os.getenv('TRACING', 'false').lower() in ('1', 'true', 'yes')
+
+    # conversation / message list pages (?limit= is capped at PAGE_SIZE_MAX)
+    PAGE_SIZE = int(os.getenv('PAGE_SIZE', 50))
+    PAGE_SIZE_MAX = int(os.getenv('PAGE_SIZE_MAX', 200))
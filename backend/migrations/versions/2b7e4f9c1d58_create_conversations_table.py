@@ -0,0 +1,70 @@
+"""Create conversations table and chats.conversation_id
+
+Revision ID: 2b7e4f9c1d58
+Revises: b88e5bea358a
+Create Date: 2026-10-18 11:02:45.310962
+
+"""
+import uuid
+from datetime import datetime, timezone
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b7e4f9c1d58'
+down_revision = 'b88e5bea358a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the Conversation model and Chat.conversation_id were added without a migration;
+    # databases built with db.create_all() already have them (--sql scripts assume neither exists)
+    offline = context.is_offline_mode()
+    inspector = None if offline else sa.inspect(op.get_bind())
+    if offline or not inspector.has_table('conversations'):
+        op.create_table('conversations',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+    if not offline and 'conversation_id' in {column['name'] for column in inspector.get_columns('chats')}:
+        return
+
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('conversation_id', sa.String(length=36), nullable=True))
+
+    if not offline:
+        _adopt_loose_chats(op.get_bind())
+
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.alter_column('conversation_id', existing_type=sa.String(length=36), nullable=False)
+        batch_op.create_foreign_key('fk_chats_conversation_id_conversations', 'conversations', ['conversation_id'], ['id'], ondelete='CASCADE')
+
+
+def _adopt_loose_chats(conn):
+    # chats from before conversations existed go into one conversation per user
+    now = datetime.now(timezone.utc)
+    conversations = sa.table('conversations',
+        sa.column('id', sa.String), sa.column('user_id', sa.Integer), sa.column('title', sa.String),
+        sa.column('created_at', sa.DateTime), sa.column('updated_at', sa.DateTime))
+    chats = sa.table('chats', sa.column('user_id', sa.Integer), sa.column('conversation_id', sa.String))
+    loose = conn.execute(sa.select(chats.c.user_id).where(chats.c.conversation_id.is_(None)).distinct()).fetchall()
+    for (user_id,) in loose:
+        conversation_id = str(uuid.uuid4())
+        conn.execute(conversations.insert().values(id=conversation_id, user_id=user_id, title='Earlier chats', created_at=now, updated_at=now))
+        conn.execute(chats.update().where(chats.c.user_id == user_id, chats.c.conversation_id.is_(None)).values(conversation_id=conversation_id))
+
+
+def downgrade():
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_chats_conversation_id_conversations', type_='foreignkey')
+        batch_op.drop_column('conversation_id')
+
+    op.drop_table('conversations')
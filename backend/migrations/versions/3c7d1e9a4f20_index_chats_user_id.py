@@ -0,0 +1,28 @@
+"""Index chats.user_id
+
+Revision ID: 3c7d1e9a4f20
+Revises: 6a38e047b693
+Create Date: 2026-10-18 04:12:41.518302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c7d1e9a4f20'
+down_revision = '6a38e047b693'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # chats.conversation_id and conversations.user_id lead the indexes from 6a38e047b693;
+    # chats.user_id was the last foreign key without one
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.create_index('ix_chats_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.drop_index('ix_chats_user_id_created_at')
@@ -0,0 +1,33 @@
+"""Add conversation listing indexes
+
+Revision ID: 6a38e047b693
+Revises: 2b7e4f9c1d58
+Create Date: 2026-10-18 03:06:19.793427
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6a38e047b693'
+down_revision = '2b7e4f9c1d58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # GET /conversations: a user's conversations newest first, each with its first chat as preview
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.create_index('ix_conversations_user_id_updated_at', ['user_id', 'updated_at', 'id'], unique=False)
+
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.create_index('ix_chats_conversation_id_created_at', ['conversation_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.drop_index('ix_chats_conversation_id_created_at')
+
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_index('ix_conversations_user_id_updated_at')
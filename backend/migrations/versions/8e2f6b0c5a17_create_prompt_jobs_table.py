@@ -0,0 +1,46 @@
+"""Create prompt jobs table
+
+Revision ID: 8e2f6b0c5a17
+Revises: 3c7d1e9a4f20
+Create Date: 2026-10-18 05:02:37.226914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e2f6b0c5a17'
+down_revision = '3c7d1e9a4f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('prompt_jobs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('conversation_id', sa.String(length=36), nullable=True),
+    sa.Column('user_prompt', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('response', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('prompt_jobs', schema=None) as batch_op:
+        batch_op.create_index('ix_prompt_jobs_status_created_at', ['status', 'created_at'], unique=False)
+        batch_op.create_index('ix_prompt_jobs_user_id', ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('prompt_jobs', schema=None) as batch_op:
+        batch_op.drop_index('ix_prompt_jobs_user_id')
+        batch_op.drop_index('ix_prompt_jobs_status_created_at')
+
+    op.drop_table('prompt_jobs')
@@ -0,0 +1,55 @@
+"""Make conversations.updated_at and chats.created_at not null
+
+Revision ID: a7c3e5f1b9d2
+Revises: f3b8d61a2c94
+Create Date: 2026-10-18 16:40:12.528310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e5f1b9d2'
+down_revision = 'f3b8d61a2c94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the (timestamp, id) keyset cursors of the conversation and message listings skip
+    # rows with a NULL timestamp; backfill them (plain UPDATEs, so --sql scripts get them too)
+    conversations = sa.table('conversations',
+        sa.column('id', sa.String), sa.column('created_at', sa.DateTime), sa.column('updated_at', sa.DateTime))
+    chats = sa.table('chats', sa.column('conversation_id', sa.String), sa.column('created_at', sa.DateTime))
+
+    op.execute(
+        conversations.update()
+        .where(conversations.c.updated_at.is_(None))
+        .values(updated_at=sa.func.coalesce(conversations.c.created_at, sa.func.now()))
+    )
+    # a chat without a time sorts at its conversation's start, by id among the others
+    conversation_started = (
+        sa.select(conversations.c.created_at)
+        .where(conversations.c.id == chats.c.conversation_id)
+        .scalar_subquery()
+    )
+    op.execute(
+        chats.update()
+        .where(chats.c.created_at.is_(None))
+        .values(created_at=sa.func.coalesce(conversation_started, sa.func.now()))
+    )
+
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('chats', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(timezone=True), nullable=True)
+
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(timezone=True), nullable=True)
@@ -0,0 +1,36 @@
+"""Create rate limit tables
+
+Revision ID: d4a91c2e7b36
+Revises: 8e2f6b0c5a17
+Create Date: 2026-10-18 07:41:12.508321
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a91c2e7b36'
+down_revision = '8e2f6b0c5a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('rate_limit_buckets',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('tokens', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    op.create_table('rate_limit_slots',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('slot', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('acquired_at', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('key', 'slot')
+    )
+
+
+def downgrade():
+    op.drop_table('rate_limit_slots')
+    op.drop_table('rate_limit_buckets')
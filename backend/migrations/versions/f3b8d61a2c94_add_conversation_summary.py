@@ -0,0 +1,30 @@
+"""Add conversation medication and rolling summary
+
+Revision ID: f3b8d61a2c94
+Revises: d4a91c2e7b36
+Create Date: 2026-10-18 09:12:37.184206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d61a2c94'
+down_revision = 'd4a91c2e7b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('medication', sa.String(length=255), nullable=True))
+        batch_op.add_column(sa.Column('summary', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('summarized_through', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('conversations', schema=None) as batch_op:
+        batch_op.drop_column('summarized_through')
+        batch_op.drop_column('summary')
+        batch_op.drop_column('medication')
@@ -0,0 +1,117 @@
+'''
+    shared fixtures: the app on a throwaway SQLite database built by the
+    Alembic migrations, with openFDA and OpenAI replaced by the benchmark
+    stubs (labels from app/data.json, a canned answer) and the hashing
+    embedder, so the suite needs no network or API key.
+
+    run from backend/:  python -m pytest -q
+'''
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.harness import BACKEND, app_env, load_labels, start_stub, stub_handler
+
+ANSWER = 'Medication: Xarelto\n\nSide Effects:\n- bleeding'
+
+# app/data.json only has Xarelto labels; openFDA also knows a second drug by another name
+OTHER_LABEL = {**load_labels()[0], 'set_id': 'test-eliquis', 'id': 'test-eliquis', 'openfda': {'brand_name': ['Eliquis'], 'generic_name': ['APIXABAN']}}
+
+# an OTC label: drug facts fields, none of the prescription (PLR) ones
+OTC_LABEL = {
+    'set_id': 'test-advil', 'id': 'test-advil', 'version': '1', 'effective_time': '20240101',
+    'openfda': {'brand_name': ['Advil'], 'generic_name': ['IBUPROFEN'], 'route': ['ORAL']},
+    'active_ingredient': ['Active ingredient (in each tablet) Ibuprofen 200 mg (NSAID)'],
+    'purpose': ['Purpose Pain reliever/fever reducer'],
+    'do_not_use': ['Do not use if you have ever had an allergic reaction to any other pain reliever/fever reducer'],
+    'ask_doctor': ['Ask a doctor before use if you have stomach bleeding, high blood pressure or kidney disease'],
+    'when_using': ['When using this product take with food or milk if stomach upset occurs'],
+    'stop_use': ['Stop use and ask a doctor if you feel faint, vomit blood or have bloody or black stools'],
+    'pregnancy_or_breast_feeding': ['If pregnant or breast-feeding, ask a health professional before use. '
+                                    'It is especially important not to use ibuprofen during the last 3 months of pregnancy'],
+    'keep_out_of_reach_of_children': ['Keep out of reach of children. In case of overdose, get medical help right away'],
+    'directions': ['Directions adults and children 12 years and over: take 1 tablet every 4 to 6 hours while symptoms persist, '
+                   'do not exceed 6 tablets in 24 hours'],
+    'storage_and_handling': ['Store at 20-25°C (68-77°F)'],
+}
+
+# (method, path, JSON body) of every request the stubs served
+UPSTREAM = []
+STUB_PORT = start_stub(stub_handler(load_labels() + [OTHER_LABEL, OTC_LABEL], 0, 0, 0, answer=ANSWER, requests=UPSTREAM))
+WORKDIR = tempfile.mkdtemp(prefix='mediwise-tests-')
+
+# config.py reads the environment when app is first imported
+os.environ.update(app_env(
+    WORKDIR, STUB_PORT, STUB_PORT,
+    LABEL_LOOKUP_MODE='local-first', EMBEDDING_BACKEND='hashing', JOB_WORKERS=0,
+    SINGLE_FLIGHT_LOCK_DIR=os.path.join(WORKDIR, 'locks'), OUTBOUND_RETRIES=0,
+))
+
+
+@pytest.fixture(scope='session')
+def app():
+    from flask_migrate import upgrade
+    from app import create_app
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        upgrade(directory=os.path.join(BACKEND, 'migrations'))
+    return app
+
+
+@pytest.fixture(autouse=True)
+def clean(app):
+    """Every test starts with empty tables, caches and stub request log"""
+    from app import db
+    from app.services.answer_cache import answer_cache
+    from app.services.label_cache import label_cache
+
+    UPSTREAM.clear()
+    yield
+    with app.app_context():
+        db.session.rollback()
+        for table in reversed(db.metadata.sorted_tables):
+            db.session.execute(table.delete())
+        db.session.commit()
+    label_cache.invalidate()
+    answer_cache.invalidate()
+
+
+@pytest.fixture
+def upstream():
+    """The requests the stub openFDA / OpenAI served during the test"""
+    return UPSTREAM
+
+
+@pytest.fixture
+def user(app):
+    """A saved user's id"""
+    from app import db
+    from app.models.user import User
+
+    with app.app_context():
+        user = User(first_name='Test', last_name='User', email='test@example.com', password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def client(app, user):
+    """A test client logged in as `user`"""
+    from flask_jwt_extended import create_access_token
+
+    client = app.test_client()
+    with app.app_context():
+        client.set_cookie('access_token_cookie', create_access_token(identity=str(user)))
+    return client
+
+
+def fda_searches(requests):
+    """The openFDA searches among stub `requests`"""
+    return [path for method, path, _ in requests if method == 'GET']
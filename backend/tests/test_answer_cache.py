@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from app.services.answer_cache import AnswerCache
+
+SCOPE = ('model', 'template')
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(str(tmp_path / 'answers.sqlite3'))
+
+
+def test_older_revision_answered_after_a_newer_one_is_kept(cache):
+    # the offline index's copy of a label answered after openFDA's newer one
+    cache.put('side effects', 'set', '2', *SCOPE, 'new answer', effective_time='20250101')
+    cache.put('dosage', 'set', '1', *SCOPE, 'old dosage', effective_time='20230101')
+
+    for _ in range(2):
+        assert cache.get('side effects', 'set', '2', *SCOPE) == 'new answer'
+        assert cache.get('dosage', 'set', '1', *SCOPE) == 'old dosage'
+
+
+def test_newer_revision_answered_after_an_older_one_drops_its_answers(cache):
+    cache.put('dosage', 'set', '1', *SCOPE, 'old dosage', effective_time='20230101')
+    cache.put('side effects', 'set', '2', *SCOPE, 'new answer', effective_time='20250101')
+
+    assert cache.get('dosage', 'set', '1', *SCOPE) is None
+    assert cache.get('side effects', 'set', '2', *SCOPE) == 'new answer'
+
+
+def test_first_answer_about_a_newer_revision_drops_older_ones(cache):
+    cache.put('side effects', 'set', '1', *SCOPE, 'old answer', effective_time='20230101')
+    cache.put('side effects', 'other', '1', *SCOPE, 'other label', effective_time='20230101')
+    assert cache.get('side effects', 'set', '1', *SCOPE) == 'old answer'
+
+    cache.put('dosage', 'set', '2', *SCOPE, 'new dosage', effective_time='20250101')
+    assert cache.get('side effects', 'set', '1', *SCOPE) is None
+    assert cache.get('dosage', 'set', '2', *SCOPE) == 'new dosage'
+    assert cache.get('side effects', 'other', '1', *SCOPE) == 'other label'
+
+
+def test_store_without_revisions_is_upgraded(tmp_path):
+    path = str(tmp_path / 'answers.sqlite3')
+    conn = sqlite3.connect(path)
+    conn.execute(
+        'CREATE TABLE answers (key TEXT PRIMARY KEY, set_id TEXT NOT NULL, version TEXT, model TEXT NOT NULL, template TEXT NOT NULL, '
+        'question TEXT NOT NULL, vector BLOB, answer TEXT NOT NULL, created_at REAL NOT NULL, last_used REAL NOT NULL)'
+    )
+    conn.close()
+
+    cache = AnswerCache(path)
+    cache.put('side effects', 'set', '1', *SCOPE, 'answer', effective_time='20230101')
+    assert cache.get('side effects', 'set', '1', *SCOPE) == 'answer'
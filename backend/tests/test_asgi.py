@@ -0,0 +1,20 @@
+import os
+
+import httpx
+
+from benchmarks.harness import app_server
+
+
+def test_kept_alive_connection_serves_every_request(app, user):
+    from flask_jwt_extended import create_access_token
+
+    with app.app_context():
+        token = create_access_token(identity=str(user))
+
+    # uvicorn serving asgi.py on the test database; Flask routes go through WsgiToAsgi
+    with app_server('async', dict(os.environ)) as port:
+        with httpx.Client(base_url=f'http://127.0.0.1:{port}', cookies={'access_token_cookie': token}, timeout=30) as client:
+            statuses = [client.get('/conversations').status_code for _ in range(40)]
+            statuses += [client.get('/metrics').status_code for _ in range(10)]
+
+    assert statuses == [200] * 50
@@ -0,0 +1,29 @@
+import time
+
+from test_prompt import events
+
+
+def test_job_events_ping_and_stop_at_the_max_duration(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOB_EVENTS_PING_INTERVAL', 0.2)
+    monkeypatch.setitem(app.config, 'JOB_EVENTS_MAX_SECONDS', 1)
+    job = client.post('/prompt', json={'user_prompt': 'Xarelto', 'background': True}).json
+
+    # no workers in the tests, the job stays queued
+    started = time.monotonic()
+    body = client.get(job['events_url']).get_data(as_text=True)
+    assert time.monotonic() - started < 3
+
+    assert ': ping\n\n' in body
+    received = [(event, data) for event, data in events(body) if data is not None]
+    assert [event for event, _ in received] == ['status', 'timeout']
+    assert received[-1][1]['job']['status'] == 'queued'
+
+
+def test_job_events_end_with_the_answer(app, client):
+    from app.services.jobs import job_queue
+
+    job = client.post('/prompt', json={'user_prompt': 'Xarelto', 'background': True}).json
+    with app.app_context():
+        assert job_queue.work_once()
+    received = events(client.get(job['events_url']).get_data(as_text=True))
+    assert received[-1][0] == 'done'
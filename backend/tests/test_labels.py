@@ -0,0 +1,98 @@
+import time
+
+from benchmarks.harness import load_labels, start_stub, stub_handler
+from conftest import STUB_PORT, fda_searches
+
+FDA_URL = f'http://127.0.0.1:{STUB_PORT}/drug/label.json'
+
+
+def test_seeded_cache_answers_without_openfda(app, upstream):
+    from app.services.fda import find_label
+    from app.services.label_cache import label_cache
+
+    assert label_cache.seed(load_labels()) > 0
+    with app.app_context():
+        label = find_label('Xarelto')
+    assert 'rivaroxaban' in [name.lower() for name in label['openfda']['generic_name']]
+    assert fda_searches(upstream) == []
+
+
+def test_cache_keeps_the_newest_label_version(tmp_path):
+    from app.services.label_cache import LabelCache
+
+    cache = LabelCache(str(tmp_path / 'labels.sqlite3'))
+    newer = load_labels()[0]
+    older = {**newer, 'effective_time': '20000101'}
+    assert cache.put(newer)
+    assert not cache.put(older)
+    assert cache.get('xarelto')['effective_time'] == newer['effective_time']
+
+
+def test_cache_expires_and_evicts(tmp_path):
+    from app.services.label_cache import LabelCache
+
+    labels = load_labels()
+    cache = LabelCache(str(tmp_path / 'labels.sqlite3'), ttl=60, max_entries=2)
+    for label in labels[:3]:
+        cache.put(label)
+    assert len(cache) == 2
+
+    expiring = LabelCache(str(tmp_path / 'expiring.sqlite3'), ttl=0.01)
+    expiring.put(labels[0])
+    time.sleep(0.05)
+    assert expiring.get('xarelto') is None
+
+
+def test_openfda_hit_is_cached(app, upstream):
+    from app.services.fda import find_label
+
+    with app.app_context():
+        assert find_label('Xarelto') is not None
+        searches = len(fda_searches(upstream))
+        assert searches >= 1
+        assert find_label('xarelto ') is not None
+    assert len(fda_searches(upstream)) == searches
+
+
+def test_strategies_run_concurrently():
+    from app.services.fda import fetch_label, search_terms
+
+    # every strategy misses, so the lookup waits for all of them
+    port = start_stub(stub_handler([], fda_latency=0.3))
+    started = time.monotonic()
+    assert fetch_label('nosuchdrug', base_url=f'http://127.0.0.1:{port}/drug/label.json') is None
+    assert time.monotonic() - started < 0.3 * len(search_terms('nosuchdrug')) * 0.75
+
+
+def test_lookup_deadline():
+    from app.services.fda import fetch_label
+
+    port = start_stub(stub_handler(load_labels(), fda_latency=2))
+    started = time.monotonic()
+    assert fetch_label('xarelto', base_url=f'http://127.0.0.1:{port}/drug/label.json', timeout=5, deadline=0.3) is None
+    assert time.monotonic() - started < 1.5
+
+
+def test_best_ranked_strategy_wins():
+    from app.services.fda import fetch_label
+
+    label = fetch_label('XARELTO', base_url=FDA_URL)
+    assert label['set_id'] == load_labels()[0]['set_id']
+
+
+def test_concurrent_lookups_each_get_their_strategies():
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services.fda import _pool, fetch_label, search_terms
+    from app.services.outbound import outbound
+
+    port = start_stub(stub_handler([], fda_latency=0.3))
+    url = f'http://127.0.0.1:{port}/drug/label.json'
+    lookups = outbound.max_connections // len(search_terms(''))
+    assert _pool(url)._max_workers == lookups * len(search_terms(''))
+
+    # concurrent missing-drug lookups finish in one round trip, none queue for threads
+    # (a couple short of the pool size: losing strategies of earlier tests may still hold theirs)
+    started = time.monotonic()
+    with ThreadPoolExecutor(lookups - 2) as prompts:
+        assert not any(prompts.map(lambda i: fetch_label(f'nosuchdrug{i}', base_url=url), range(lookups - 2)))
+    assert time.monotonic() - started < 0.3 * 1.9
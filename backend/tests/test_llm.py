@@ -0,0 +1,33 @@
+from benchmarks.harness import load_labels
+
+
+def chunks():
+    from app.services.pipeline import _document
+
+    return [{**chunk, 'score': 1.0} for chunk in _document(load_labels()[0], 'side effects').chunks()[:20]]
+
+
+def test_everything_sent_fits_the_budget(app, monkeypatch):
+    from app.services.context import count_tokens
+    from app.services.llm import INSTRUCTIONS, build_messages
+
+    question = 'what are the side effects of xarelto and what should i do if i miss a dose of it? ' * 3
+    budget = count_tokens(INSTRUCTIONS) + 400
+    monkeypatch.setitem(app.config, 'PROMPT_TOKEN_BUDGET', budget)
+    with app.app_context():
+        model, messages = build_messages(question, chunks())
+    assert 'Context:\n[' in messages[0]['content']
+    # the question goes out twice, in the system prompt and as the user message
+    assert sum(count_tokens(message['content'], model) for message in messages) <= budget
+
+
+def test_budget_left_for_no_context(app, monkeypatch, capsys):
+    from app.services.llm import build_messages
+
+    monkeypatch.setitem(app.config, 'PROMPT_TOKEN_BUDGET', 100)
+    with app.app_context():
+        _, messages = build_messages('side effects?', chunks())
+    assert 'Context:\n\n\nQuestion:' in messages[0]['content']
+    output = capsys.readouterr().out
+    assert '(budget 0)' in output
+    assert 'No label context fits the prompt budget' in output
@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from conftest import ANSWER
+
+
+def events(body):
+    """(event, data) of each server-sent event in a response body"""
+    found = []
+    for block in body.strip().split('\n\n'):
+        event, data = 'message', None
+        for line in block.split('\n'):
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                data = json.loads(line[len('data: '):])
+        found.append((event, data))
+    return found
+
+
+def test_prompt_answers_and_saves_the_chat(client):
+    response = client.post('/prompt', json={'user_prompt': 'Xarelto'})
+    assert response.status_code == 200
+    assert response.json['response'] == ANSWER
+
+    conversation = client.get(f"/conversations/{response.json['conversation_id']}").json
+    assert [message['content'] for message in conversation['messages']] == ['xarelto', ANSWER]
+
+
+def test_prompt_streams_tokens(client, upstream):
+    response = client.post('/prompt', json={'user_prompt': 'Xarelto', 'stream': True})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    received = events(response.get_data(as_text=True))
+    deltas = [data['delta'] for event, data in received if event == 'message']
+    assert len(deltas) > 1
+    assert ''.join(deltas) == ANSWER
+    event, done = received[-1]
+    assert event == 'done' and done['response'] == ANSWER
+
+    # the model was asked for a stream, and the streamed answer was saved
+    chats = [body for method, path, body in upstream if path.endswith('/chat/completions')]
+    assert chats[-1]['stream'] is True
+    conversation = client.get(f"/conversations/{done['conversation_id']}").json
+    assert conversation['messages'][-1]['content'] == ANSWER
+
+
+def test_unknown_medication_is_a_404(client):
+    response = client.post('/prompt', json={'user_prompt': 'nosuchdrug'})
+    assert response.status_code == 404
+
+
+def conversation_medication(app, conversation_id):
+    from app import db
+    from app.models.chat import Conversation
+
+    with app.app_context():
+        return db.session.get(Conversation, conversation_id).medication
+
+
+def test_follow_up_uses_the_conversations_medication(app, client):
+    first = client.post('/prompt', json={'user_prompt': 'Xarelto'}).json
+    conversation_id = first['conversation_id']
+
+    # names no medication: answered from Xarelto's label
+    response = client.post('/prompt', json={'user_prompt': 'what about during pregnancy?', 'conversation_id': conversation_id})
+    assert response.status_code == 200
+    assert conversation_medication(app, conversation_id) == 'Xarelto'
+
+    # names another medication, one no local store has seen yet
+    response = client.post('/prompt', json={'user_prompt': 'Eliquis', 'conversation_id': conversation_id})
+    assert response.status_code == 200
+    assert conversation_medication(app, conversation_id) == 'Eliquis'
+
+
+def test_async_follow_up_and_switch(app):
+    import asyncio
+    from app.services.history import History
+    from app.services.pipeline import PromptError, resolve_prompt_label_async
+
+    async def resolve(prompt, medication):
+        label, name = await resolve_prompt_label_async(prompt, History(medication=medication))
+        return label['set_id'], name
+
+    async def prompts():
+        # one event loop, the pooled async client stays bound to it
+        xarelto = await resolve('Xarelto', None)
+        assert await resolve('what about during pregnancy?', 'Xarelto') == xarelto
+        assert await resolve('Eliquis', 'Xarelto') == ('test-eliquis', 'Eliquis')
+        with pytest.raises(PromptError) as error:
+            await resolve('what about during pregnancy?', None)
+        assert error.value.status_code == 404
+
+    with app.app_context():
+        asyncio.run(prompts())
+
+
+def test_follow_up_ignores_a_label_it_does_not_name(app, upstream, monkeypatch):
+    from benchmarks.harness import start_stub, stub_handler
+    from conftest import OTHER_LABEL
+    from app.services.history import History
+    from app.services.label_cache import label_cache
+    from app.services.pipeline import resolve_prompt_label
+
+    with app.app_context():
+        xarelto, _ = resolve_prompt_label('Xarelto', History())
+    upstream.clear()
+
+    # like real openFDA with unquoted terms, this one matches any search to some label
+    class AnyMatch(stub_handler([], 0, 0, 0, requests=upstream)):
+        def do_GET(self):
+            upstream.append(('GET', self.path, None))
+            self.reply({'results': [OTHER_LABEL]})
+
+    monkeypatch.setitem(app.config, 'FDA_LABEL_URL', f'http://127.0.0.1:{start_stub(AnyMatch)}/drug/label.json')
+    follow_up = 'what about during pregnancy?'
+    with app.app_context():
+        label, medication = resolve_prompt_label(follow_up, History(medication='Xarelto'))
+    assert (label['set_id'], medication) == (xarelto['set_id'], 'Xarelto')
+
+    # only whole-name searches, and the spurious hit is not remembered for the prompt
+    searches = [path for method, path, _ in upstream if method == 'GET']
+    assert searches and all('%22' in path or '"' in path for path in searches)
+    assert label_cache.get(follow_up) is None
+
+    # a prompt that does name the drug still switches to it
+    with app.app_context():
+        label, medication = resolve_prompt_label('eliquis', History(medication='Xarelto'))
+    assert (label['set_id'], medication) == ('test-eliquis', 'eliquis')
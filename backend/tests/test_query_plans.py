@@ -0,0 +1,18 @@
+from benchmarks import query_plans
+
+
+def test_conversation_routes_use_indexes(app):
+    from flask_jwt_extended import create_access_token
+
+    client = app.test_client()
+    with app.app_context():
+        user_id = query_plans.seed(users=20, conversations_per_user=20, chats_per_conversation=4)
+        client.set_cookie('access_token_cookie', create_access_token(identity=str(user_id)))
+        routes = query_plans.route_plans(client)
+
+    assert len(routes) == 6
+    for method, path, status, statements in routes:
+        assert status == 200, f'{method} {path}'
+        assert statements, f'{method} {path}'
+        for statement, plan, scans in statements:
+            assert not scans, f"{method} {path} scans {', '.join(scans)}:\n{statement}\n" + '\n'.join(plan)
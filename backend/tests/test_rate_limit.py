@@ -0,0 +1,51 @@
+import pytest
+
+
+def test_limits_that_admit_nothing_are_config_errors():
+    from app.services.rate_limit import parse_limit
+
+    assert parse_limit('20/minute') == (20, 20 / 60)
+    assert parse_limit('') is None
+    for value in ('0/minute', '-5/hour', '20/0', 'many/minute'):
+        with pytest.raises(ValueError, match='PROMPT_RATE_LIMIT'):
+            parse_limit(value, 'PROMPT_RATE_LIMIT')
+
+
+@pytest.fixture(params=['memory', 'database'])
+def limiter(request, app, monkeypatch):
+    """The rate limiter on a fresh store of each backend"""
+    from app.services.rate_limit import STORES, rate_limiter
+
+    monkeypatch.setattr(rate_limiter, 'store', STORES[request.param](app))
+    return rate_limiter
+
+
+def test_background_jobs_hold_their_concurrency_slot(app, client, limiter, monkeypatch):
+    from app.services.jobs import job_queue
+
+    monkeypatch.setitem(limiter.concurrency, 'prompt', 1)
+    first = client.post('/prompt', json={'user_prompt': 'Xarelto', 'background': True})
+    assert first.status_code == 202
+
+    # the job is still queued (no workers in the tests), so it still counts
+    assert client.post('/prompt', json={'user_prompt': 'Xarelto', 'background': True}).status_code == 429
+    assert client.post('/prompt', json={'user_prompt': 'Xarelto'}).status_code == 429
+
+    with app.app_context():
+        assert job_queue.work_once()
+    assert client.post('/prompt', json={'user_prompt': 'Xarelto', 'background': True}).status_code == 202
+
+
+def test_requests_turned_away_for_concurrency_keep_their_tokens(app, client, limiter, monkeypatch):
+    from app.services.jobs import job_queue
+
+    monkeypatch.setitem(limiter.concurrency, 'prompt', 1)
+    # two tokens, refilled once a day
+    monkeypatch.setitem(limiter.limits, 'prompt', (2, 2 / 86400))
+    assert client.post('/prompt', json={'user_prompt': 'Xarelto', 'background': True}).status_code == 202
+    for _ in range(3):
+        assert client.post('/prompt', json={'user_prompt': 'Xarelto', 'background': True}).status_code == 429
+
+    with app.app_context():
+        assert job_queue.work_once()
+    assert client.post('/prompt', json={'user_prompt': 'Xarelto', 'background': True}).status_code == 202
@@ -0,0 +1,55 @@
+from benchmarks.harness import load_labels
+from conftest import OTC_LABEL
+
+
+def test_hashing_embedder_is_deterministic():
+    from app.services.embeddings import HashingEmbedder
+
+    first, second = HashingEmbedder(), HashingEmbedder()
+    text = 'Do not take Xarelto while pregnant'
+    assert first.embed([text]) == second.embed([text])
+    assert first.embed([text])[0] != first.embed(['store at room temperature'])[0]
+
+
+def test_question_retrieves_its_sections(app, upstream):
+    from app.services.pipeline import retrieve_context
+
+    label = load_labels()[0]
+    with app.app_context():
+        chunks = retrieve_context(label, 'can i take xarelto while pregnant?')
+    assert chunks
+    assert chunks[0]['section'] in ('pregnancy', 'lactation', 'use_in_specific_populations')
+    # the hashing embedder never calls OpenAI
+    assert [path for method, path, _ in upstream if path.endswith('/embeddings')] == []
+
+
+def test_label_version_is_indexed_once(app):
+    from app.services.retrieval import retriever
+    from app.services.pipeline import _document
+
+    label = load_labels()[0]
+    with app.app_context():
+        retriever.index_document(_document(label, 'side effects'))
+        assert not retriever.index_document(_document(label, 'side effects'))
+        results = retriever.query('what are the side effects?', label['set_id'])
+    assert results and {chunk['section'] for chunk in results} & {'adverse_reactions'}
+
+
+def test_otc_label_sections_are_retrieved(app):
+    from app.services.pipeline import retrieve_context
+
+    with app.app_context():
+        dosage = retrieve_context(OTC_LABEL, 'how much advil can i take?')
+        pregnancy = retrieve_context(OTC_LABEL, 'can i take advil while breastfeeding?')
+    # drug facts fields are indexed under the topics their PLR counterparts answer
+    assert 'directions' in {chunk['section'] for chunk in dosage}
+    assert 'pregnancy_or_breast_feeding' in {chunk['section'] for chunk in pregnancy}
+
+
+def test_sections_no_topic_lists_are_indexed(app):
+    from app.services.pipeline import retrieve_context
+
+    label = load_labels()[0]
+    with app.app_context():
+        chunks = retrieve_context(label, 'what happens if i overdose on xarelto?')
+    assert 'overdosage' in {chunk['section'] for chunk in chunks}
@@ -0,0 +1,141 @@
+import asyncio
+import gc
+import subprocess
+import sys
+import threading
+import time
+import warnings
+
+import pytest
+
+from app.services.single_flight import FileLockStore, SingleFlight
+from benchmarks.harness import BACKEND
+
+
+def test_followers_share_the_leaders_result():
+    flight, calls = SingleFlight(), []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'answer'
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async('key', fn) for _ in range(5)))
+
+    assert asyncio.run(main()) == ['answer'] * 5
+    assert len(calls) == 1
+
+
+def test_followers_take_over_from_a_cancelled_leader():
+    flight, calls = SingleFlight(), []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return 'answer'
+
+    async def main():
+        leader = asyncio.create_task(flight.do_async('key', fn))
+        await asyncio.sleep(0.01)
+        followers = [asyncio.create_task(flight.do_async('key', fn)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == ['answer'] * 3
+    # the cancelled leader's run, then one follower's for all three
+    assert len(calls) == 2
+
+
+def test_leader_cancelled_while_locking_releases_the_lock(tmp_path):
+    flight = SingleFlight()
+    flight.locks = FileLockStore(str(tmp_path))
+    held = flight.locks.acquire('key')
+
+    async def fn():
+        return 'answer'
+
+    async def main():
+        leader = asyncio.create_task(flight.do_async('key', fn))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # the worker thread now gets the lock, and hands it back
+        flight.locks.release(held)
+        await asyncio.sleep(0.1)
+        acquired = await asyncio.wait_for(asyncio.to_thread(flight.locks.acquire, 'key'), 2)
+        flight.locks.release(acquired)
+
+    # released, not left for the garbage collector to close
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', ResourceWarning)
+        asyncio.run(main())
+        gc.collect()
+    leaked = [str(warning.message) for warning in caught if issubclass(warning.category, ResourceWarning) and str(tmp_path) in str(warning.message)]
+    assert not leaked
+
+
+def test_follower_stops_waiting_at_the_deadline():
+    flight = SingleFlight()
+    flight.wait_timeout = 0.1
+    leader = threading.Thread(target=flight.do, args=('key', lambda: time.sleep(1) or 'leader'))
+    leader.start()
+    time.sleep(0.02)
+
+    started = time.monotonic()
+    assert flight.do('key', lambda: 'follower') == 'follower'
+    assert time.monotonic() - started < 0.5
+    leader.join()
+
+
+def test_async_follower_stops_waiting_at_the_deadline():
+    flight = SingleFlight()
+    flight.wait_timeout = 0.1
+
+    async def slow():
+        await asyncio.sleep(1)
+        return 'leader'
+
+    async def fast():
+        return 'follower'
+
+    async def main():
+        leader = asyncio.create_task(flight.do_async('key', slow))
+        await asyncio.sleep(0.01)
+        follower = await flight.do_async('key', fast)
+        leader.cancel()
+        return follower
+
+    assert asyncio.run(main()) == 'follower'
+
+
+def test_lock_held_by_another_worker_is_waited_on_until_the_deadline(tmp_path):
+    # another worker process stuck holding the key's lock
+    holder = subprocess.Popen(
+        [sys.executable, '-c', 'import sys, time\n'
+         'from app.services.single_flight import FileLockStore\n'
+         f'held = FileLockStore({str(tmp_path)!r}).acquire("key")\n'
+         'print("held", flush=True)\n'
+         'time.sleep(30)'],
+        cwd=BACKEND, stdout=subprocess.PIPE, text=True,
+    )
+    try:
+        assert holder.stdout.readline().strip() == 'held'
+        flight = SingleFlight()
+        flight.locks = FileLockStore(str(tmp_path))
+        flight.wait_timeout = 0.2
+
+        async def fn():
+            return 'async'
+
+        started = time.monotonic()
+        assert flight.do('key', lambda: 'sync') == 'sync'
+        assert asyncio.run(flight.do_async('key', fn)) == 'async'
+        assert time.monotonic() - started < 2
+    finally:
+        holder.kill()
+        holder.wait()
@@ -8,7 +8,10 @@ const Sidebar = ({
   onNewConversation,
   onDeleteConversation,
   isOpen,
-  onToggle
+  onToggle,
+  hasMore = false,
+  onLoadMore,
+  loadingMore = false
 }) => {
   const [deletingId, setDeletingId] = useState(null);
 
@@ -164,6 +167,17 @@ const Sidebar = ({
                   </div>
                 </div>
               ))}
+
+              {/* older conversations come a page at a time */}
+              {hasMore && (
+                <button
+                  onClick={onLoadMore}
+                  disabled={loadingMore}
+                  className="w-full p-2 mt-1 text-sm text-gray-400 hover:text-white hover:bg-gray-800 rounded-lg transition-colors disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading..." : "Load more"}
+                </button>
+              )}
             </div>
           )}
         </div>
@@ -16,13 +16,23 @@ const Chat = () => {
   const [currentConversationId, setCurrentConversationId] = useState(null);
   const [sidebarOpen, setSidebarOpen] = useState(false);
   const [loadingConversations, setLoadingConversations] = useState(true);
+  // both lists come in pages; a cursor is where the next (older) page starts, null at the end
+  const [conversationsCursor, setConversationsCursor] = useState(null);
+  const [messagesCursor, setMessagesCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const messagesEndRef = useRef(null);
+  // earlier messages are added above the ones on screen, don't jump to the bottom for them
+  const skipScrollRef = useRef(false);
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
   useEffect(() => {
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false;
+      return;
+    }
     scrollToBottom();
   }, [messages]);
 
@@ -36,6 +46,7 @@ const Chat = () => {
       setLoadingConversations(true);
       const data = await conversationAPI.getConversations();
       setConversations(data.conversations || []);
+      setConversationsCursor(data.next_cursor || null);
     } catch (error) {
       console.error("Error loading conversations:", error);
     } finally {
@@ -43,11 +54,31 @@ const Chat = () => {
     }
   };
 
+  const loadMoreConversations = async () => {
+    if (!conversationsCursor || loadingMore) {
+      return;
+    }
+    try {
+      setLoadingMore(true);
+      const data = await conversationAPI.getConversations(conversationsCursor);
+      setConversations((prev) => {
+        const seen = new Set(prev.map((c) => c.id));
+        return [...prev, ...(data.conversations || []).filter((c) => !seen.has(c.id))];
+      });
+      setConversationsCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error("Error loading more conversations:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const loadConversation = async (conversationId) => {
     try {
       setLoading(true);
       const data = await conversationAPI.getConversation(conversationId);
       setMessages(data.messages || []);
+      setMessagesCursor(data.next_cursor || null);
       setCurrentConversationId(conversationId);
       setSidebarOpen(false); // Close sidebar on mobile after selection
     } catch (error) {
@@ -57,8 +88,26 @@ const Chat = () => {
     }
   };
 
+  const loadEarlierMessages = async () => {
+    if (!messagesCursor || !currentConversationId || loadingMore) {
+      return;
+    }
+    try {
+      setLoadingMore(true);
+      const data = await conversationAPI.getConversation(currentConversationId, messagesCursor);
+      skipScrollRef.current = true;
+      setMessages((prev) => [...(data.messages || []), ...prev]);
+      setMessagesCursor(data.next_cursor || null);
+    } catch (error) {
+      console.error("Error loading earlier messages:", error);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleNewConversation = () => {
     setMessages([]);
+    setMessagesCursor(null);
     setCurrentConversationId(null);
     setSidebarOpen(false);
   };
@@ -166,6 +215,9 @@ const Chat = () => {
         onSelectConversation={loadConversation}
         onNewConversation={handleNewConversation}
         onDeleteConversation={handleDeleteConversation}
+        hasMore={Boolean(conversationsCursor)}
+        onLoadMore={loadMoreConversations}
+        loadingMore={loadingMore}
         isOpen={sidebarOpen}
         onToggle={() => setSidebarOpen(!sidebarOpen)}
       />
@@ -204,6 +256,18 @@ const Chat = () => {
         {/* Chat Messages Area */}
         <div className="flex-1 overflow-y-auto px-4 py-6">
           <div className="max-w-3xl mx-auto space-y-6">
+            {messagesCursor && (
+              <div className="text-center">
+                <button
+                  onClick={loadEarlierMessages}
+                  disabled={loadingMore}
+                  className="text-sm text-blue-600 hover:underline disabled:opacity-50"
+                >
+                  {loadingMore ? "Loading..." : "Load earlier messages"}
+                </button>
+              </div>
+            )}
+
             {messages.length === 0 ? (
               <div className="text-center py-12">
                 <div className="inline-block p-4 bg-blue-100 rounded-full mb-4">
@@ -100,13 +100,14 @@ export const promptAPI = {
 
 // Conversation API calls
 export const conversationAPI = {
-  getConversations: async () => {
-    const response = await api.get('/conversations');
+  // pages: pass back the previous response's next_cursor for the next page
+  getConversations: async (cursor) => {
+    const response = await api.get('/conversations', { params: { cursor } });
     return response.data;
   },
 
-  getConversation: async (conversationId) => {
-    const response = await api.get(`/conversations/${conversationId}`);
+  getConversation: async (conversationId, cursor) => {
+    const response = await api.get(`/conversations/${conversationId}`, { params: { cursor } });
     return response.data;
   },
 